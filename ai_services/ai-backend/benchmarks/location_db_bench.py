@@ -0,0 +1,304 @@
+"""
+LocationDBLookup Benchmark
+
+Generates synthetic tourist spot databases clustered like real cities, runs
+reproducible query workloads against every registered lookup engine and
+writes machine-readable results, so changes to the geo lookup can be judged
+by numbers.
+
+For every database size and engine, it measures the load time and retained
+memory, and the latency percentiles and throughput of `find_nearest`,
+`find_nearby`, `find_top_k` and `get_spot_by_name`.
+
+Usage:
+    python benchmarks/location_db_bench.py --output results.json
+    python benchmarks/location_db_bench.py --sizes 100 1000 10000 --compare baseline.json
+"""
+
+import argparse
+import gc
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from location_db_lookup import LocationDBLookup  # noqa: E402
+
+# Lookup engines to compare. Each factory takes the database path.
+ENGINES: Dict[str, Callable[[str], Any]] = {
+    "linear": LocationDBLookup,
+}
+
+# Cities the synthetic spots cluster around: (name, latitude, longitude, relative size)
+CITIES = [
+    ("銀座", 35.6717, 139.7650, 1.0),
+    ("浅草", 35.7148, 139.7967, 0.8),
+    ("新宿", 35.6896, 139.7006, 0.9),
+    ("京都", 35.0116, 135.7681, 1.0),
+    ("大阪", 34.6937, 135.5023, 0.9),
+    ("札幌", 43.0618, 141.3545, 0.6),
+    ("福岡", 33.5902, 130.4017, 0.6),
+    ("仙台", 38.2682, 140.8694, 0.5),
+    ("金沢", 36.5613, 136.6562, 0.4),
+    ("那覇", 26.2124, 127.6809, 0.4),
+]
+# Bounding box of the background (non-clustered) spots and random queries
+BBOX = (26.0, 127.5, 45.5, 145.8)
+BACKGROUND_RATIO = 0.1
+
+METHODS = ("find_nearest", "find_nearby", "find_top_k", "get_spot_by_name")
+
+
+def generate_spots(count: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Generate spots clustered around cities.
+
+    Each city has a dense core (~500 m) and a wider district (~3 km), and
+    10% of the spots are spread uniformly over Japan.
+    """
+    rng = random.Random(seed)
+    weights = [size for _, _, _, size in CITIES]
+    spots = []
+    for i in range(count):
+        if rng.random() < BACKGROUND_RATIO:
+            city = "郊外"
+            latitude = rng.uniform(BBOX[0], BBOX[2])
+            longitude = rng.uniform(BBOX[1], BBOX[3])
+        else:
+            city, city_lat, city_lon, _ = rng.choices(CITIES, weights=weights)[0]
+            spread_km = 0.5 if rng.random() < 0.6 else 3.0
+            latitude = city_lat + rng.gauss(0, spread_km / 111.0)
+            longitude = city_lon + rng.gauss(0, spread_km / (111.0 * math.cos(math.radians(city_lat))))
+        spots.append({
+            "no": i + 1,
+            "name": f"{city}スポット{i + 1:07d}",
+            "latitude": round(latitude, 6),
+            "longitude": round(longitude, 6),
+            "address": f"{city} {i % 9 + 1}丁目",
+            "description": f"{city}にある観光スポット。",
+        })
+    return spots
+
+
+def write_database(spots: List[Dict[str, Any]], directory: Path, seed: int) -> str:
+    path = directory / f"spots_{len(spots)}_{seed}.json"
+    if not path.exists():
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"tourist_spots": spots}, f, ensure_ascii=False)
+    return str(path)
+
+
+def generate_workload(
+    spots: List[Dict[str, Any]], queries: int, seed: int
+) -> Dict[str, List[Tuple]]:
+    """
+    Generate query arguments for each method.
+
+    80% of the coordinate queries are within ~200 m of a spot (a user
+    standing at a landmark), 20% are anywhere in Japan. 80% of the name
+    queries hit an existing spot by a partial name, 20% miss.
+    """
+    rng = random.Random(seed + 1)
+    points = []
+    for _ in range(queries):
+        if rng.random() < 0.8:
+            spot = rng.choice(spots)
+            points.append((
+                spot["latitude"] + rng.gauss(0, 0.2 / 111.0),
+                spot["longitude"] + rng.gauss(0, 0.2 / 91.0),
+            ))
+        else:
+            points.append((rng.uniform(BBOX[0], BBOX[2]), rng.uniform(BBOX[1], BBOX[3])))
+
+    names = []
+    for _ in range(queries):
+        if rng.random() < 0.8:
+            names.append((rng.choice(spots)["name"][-9:],))
+        else:
+            names.append((f"存在しないスポット{rng.randrange(10**6)}",))
+
+    return {
+        "find_nearest": points,
+        "find_nearby": [(lat, lon, 1.0) for lat, lon in points],
+        "find_top_k": [(lat, lon, 5) for lat, lon in points],
+        "get_spot_by_name": names,
+    }
+
+
+def measure_load(factory: Callable[[str], Any], db_path: str) -> Tuple[Any, Dict[str, float]]:
+    """Load the database, measuring time and the memory retained by the engine."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    engine = factory(db_path)
+    load_seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return engine, {
+        "load_seconds": round(load_seconds, 6),
+        "retained_bytes": retained,
+        "peak_load_bytes": peak,
+    }
+
+
+def measure_method(
+    method: Callable, args_list: List[Tuple], max_seconds: float, min_queries: int
+) -> Dict[str, float]:
+    """Run queries until all are done or the time budget is spent."""
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        query_start = time.perf_counter()
+        method(*args)
+        latencies.append(time.perf_counter() - query_start)
+        if len(latencies) >= min_queries and time.perf_counter() - start > max_seconds:
+            break
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def quantile(q: float) -> float:
+        return latencies[min(max(math.ceil(q * len(latencies)) - 1, 0), len(latencies) - 1)]
+
+    return {
+        "queries": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 4),
+        "p50_ms": round(quantile(0.5) * 1000, 4),
+        "p95_ms": round(quantile(0.95) * 1000, 4),
+        "p99_ms": round(quantile(0.99) * 1000, 4),
+        "qps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    engines = {name: ENGINES[name] for name in args.engines}
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(args.data_dir) if args.data_dir else Path(tmp)
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        for size in args.sizes:
+            spots = generate_spots(size, args.seed)
+            db_path = write_database(spots, data_dir, args.seed)
+            workload = generate_workload(spots, args.queries, args.seed)
+            del spots
+
+            for engine_name, factory in engines.items():
+                engine, load = measure_load(factory, db_path)
+                print(
+                    f"[{engine_name}] {size:>8} spots: load {load['load_seconds'] * 1000:.1f}ms, "
+                    f"retained {load['retained_bytes'] / 1e6:.1f}MB"
+                )
+                for method_name in METHODS:
+                    stats = measure_method(
+                        getattr(engine, method_name),
+                        workload[method_name],
+                        args.max_seconds,
+                        args.min_queries,
+                    )
+                    print(
+                        f"    {method_name:18s} p50 {stats['p50_ms']:10.4f}ms  p99 {stats['p99_ms']:10.4f}ms  "
+                        f"{stats['qps']:>10.1f} qps  ({stats['queries']} queries)"
+                    )
+                    results.append({
+                        "engine": engine_name,
+                        "size": size,
+                        "method": method_name,
+                        **stats,
+                        **load,
+                    })
+                del engine
+                gc.collect()
+
+    return {
+        "benchmark": "location_db_lookup",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "queries": args.queries,
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """
+    Print p50 latency ratios against a baseline run.
+
+    Returns:
+        True if no (engine, size, method) got slower than the tolerance
+    """
+    base = {(r["engine"], r["size"], r["method"]): r for r in baseline["results"]}
+    ok = True
+    print(f"\nComparison with baseline {baseline.get('git_commit', '?')} (p50, tolerance {tolerance:.0%})")
+    for result in current["results"]:
+        key = (result["engine"], result["size"], result["method"])
+        if key not in base or not base[key]["p50_ms"]:
+            continue
+        ratio = result["p50_ms"] / base[key]["p50_ms"]
+        regressed = ratio > 1 + tolerance
+        ok = ok and not regressed
+        print(
+            f"  {'REGRESSION' if regressed else 'ok':10s} {key[0]:8s} {key[1]:>8} {key[2]:18s} "
+            f"{base[key]['p50_ms']:10.4f}ms -> {result['p50_ms']:10.4f}ms ({ratio:.2f}x)"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LocationDBLookup engines on synthetic databases")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000, 1000000],
+        help="Database sizes (number of spots)",
+    )
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--queries", type=int, default=1000, help="Queries per method")
+    parser.add_argument("--min-queries", type=int, default=20, help="Minimum queries per method")
+    parser.add_argument(
+        "--max-seconds", type=float, default=5.0,
+        help="Time budget per method; stops early after --min-queries",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", help="Keep the generated databases in this directory for reuse")
+    parser.add_argument("--output", default="location_db_bench.json", help="Results JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown for --compare")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
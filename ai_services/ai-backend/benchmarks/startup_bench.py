@@ -0,0 +1,148 @@
+"""
+Startup Benchmark
+
+Measures the backend's cold start the way a scale-to-zero platform sees it:
+each run starts a fresh interpreter that imports `main` and runs the app's
+lifespan up to the point where it would accept requests, and reports the
+startup phases recorded by `startup_timing`. One extra run with
+`python -X importtime` attributes the import time to top-level packages.
+
+The median time to ready is compared against --budget-ms (or
+STARTUP_BUDGET_MS); the script exits with 1 when it is over the budget, so
+it can guard deployments in CI.
+
+Usage:
+    python benchmarks/startup_bench.py --runs 5 --budget-ms 1500
+    LOCATION_DB_ARTIFACT=../../GinzaDB/ginzaDB.lookup.pickle python benchmarks/startup_bench.py
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# Runs in the child process: import the app, run its lifespan and print the startup report
+CHILD_SCRIPT = """
+import asyncio, json, sys
+sys.path.insert(0, {src!r})
+import main
+from startup_timing import startup_timer
+
+async def start():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(start())
+print("STARTUP_REPORT " + json.dumps(startup_timer.report()))
+"""
+
+
+def run_once(env: Dict[str, str], importtime: bool = False) -> subprocess.CompletedProcess:
+    """Start a fresh interpreter that imports the app and runs its lifespan."""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD_SCRIPT.format(src=str(SRC_DIR))]
+    result = subprocess.run(command, env=env, capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{result.stderr[-2000:]}")  # noqa: TRY003
+    return result
+
+
+def parse_report(stdout: str) -> Dict[str, Any]:
+    for line in stdout.splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            return json.loads(line[len("STARTUP_REPORT "):])
+    raise RuntimeError("No startup report in the child output")  # noqa: TRY003
+
+
+def import_breakdown(stderr: str, top: int) -> List[Dict[str, Any]]:
+    """
+    Sum the `-X importtime` self time of the modules of each top-level package,
+    so every package is charged for its own modules, not for its dependencies.
+    """
+    totals: Dict[str, int] = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        totals[name.strip().split(".")[0]] += int(self_us)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": package, "ms": round(us / 1000, 1)} for package, us in ranked]
+
+
+def summarize(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    phases: Dict[str, List[float]] = defaultdict(list)
+    for report in reports:
+        for name, ms in report["phases_ms"].items():
+            phases[name].append(ms)
+    ready = [report["ready_ms"] for report in reports if report["ready_ms"] is not None]
+    return {
+        "phases_median_ms": {name: round(statistics.median(values), 1) for name, values in phases.items()},
+        "ready_median_ms": round(statistics.median(ready), 1) if ready else None,
+        "ready_max_ms": round(max(ready), 1) if ready else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend's cold start")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-process runs")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Time-to-ready budget (default: STARTUP_BUDGET_MS)")
+    parser.add_argument("--top", type=int, default=10, help="Packages to list in the import breakdown")
+    parser.add_argument("--output", default="startup_bench.json", help="Results JSON file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Pre-warming happens in the background and would only measure the network
+    env.setdefault("PREWARM_UPSTREAMS", "false")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    run_once(env)  # populate the bytecode cache, as in a built image
+    reports = [parse_report(run_once(env).stdout) for _ in range(args.runs)]
+    imports = import_breakdown(run_once(env, importtime=True).stderr, args.top)
+
+    budget = args.budget_ms
+    if budget is None and os.getenv("STARTUP_BUDGET_MS"):
+        budget = float(os.environ["STARTUP_BUDGET_MS"])
+    summary = summarize(reports)
+    over_budget = bool(budget and summary["ready_median_ms"] and summary["ready_median_ms"] > budget)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "location_db_artifact": env.get("LOCATION_DB_ARTIFACT"),
+        "budget_ms": budget,
+        "over_budget": over_budget,
+        **summary,
+        "imports_by_package": imports,
+        "reports": reports,
+    }
+    Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"Ready after {summary['ready_median_ms']}ms (median of {args.runs}), budget {budget}")
+    for name, ms in summary["phases_median_ms"].items():
+        print(f"  {name:<16} {ms:8.1f}ms")
+    print("Imports by package:")
+    for item in imports:
+        print(f"  {item['package']:<16} {item['ms']:8.1f}ms")
+    print(f"Results written to {args.output}")
+
+    if over_budget:
+        print(f"Over the startup budget: {summary['ready_median_ms']}ms > {budget}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Fake Upstream Servers
+
+Stand-ins for the VLM server and the Sakura AI Engine used to load test the
+AI backend without a GPU or API quota. A single server implements:
+
+- `POST /inference`: the VLM server contract (multipart image + generation
+  parameters -> `{"generated_text", "success", "error_message"}`)
+- `POST /v1/documents/chat/`: the Sakura RAG API contract (`{"answer", "sources"}`
+  in the 【施設/場所の名前】/【観光ガイド情報】 format the backend parses)
+- `POST /v1/chat/completions`: the OpenAI-compatible chat API used by the
+  local RAG engine
+
+Each upstream has its own latency distribution and error rate. The VLM
+server generates one request at a time on its GPU, so VLM calls are
+serialized by default (`--vlm-concurrency`) to reproduce its queueing.
+
+Latency specs (seconds):
+    const:1.5             always 1.5
+    uniform:0.5,2.0       uniform between 0.5 and 2.0
+    normal:1.5,0.3        mean 1.5, standard deviation 0.3 (clipped at 0)
+    lognormal:1.5,0.4     median 1.5, sigma 0.4 (long right tail)
+
+Usage:
+    python loadtest/fake_upstreams.py --port 9000 --vlm-latency lognormal:1.8,0.35 --rag-error-rate 0.02
+
+    # Point the backend at it
+    VLM_BASE_URL=http://127.0.0.1:9000 SAKURA_API_BASE_URL=http://127.0.0.1:9000/v1 \
+        SAKURA_OPENAI_API_TOKEN=dummy uv run uvicorn src.main:app --port 8000
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import re
+import time
+from typing import Callable, Optional
+
+import uvicorn
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+LatencySampler = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> LatencySampler:
+    """
+    Parse a latency distribution spec ("kind:param,param") into a sampler.
+
+    Raises:
+        ValueError: If the kind or its parameters are invalid
+    """
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",")] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}") from None  # noqa: TRY003
+
+    if kind == "const" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(rng.gauss(values[0], values[1]), 0.0)
+    if kind == "lognormal" and len(values) == 2 and values[0] > 0:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Invalid latency spec: {spec}")  # noqa: TRY003
+
+
+class Upstream:
+    """Latency, error rate and concurrency limit of one fake upstream."""
+
+    def __init__(self, name: str, latency: str, error_rate: float, concurrency: int, rng: random.Random):
+        """
+        Args:
+            name: Upstream name (for logs and /stats)
+            latency: Latency distribution spec
+            error_rate: Fraction of requests answered with HTTP 500
+            concurrency: Requests served at the same time (0 for unlimited)
+            rng: Random source shared by the upstreams
+        """
+        self.name = name
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.concurrency = concurrency
+        self.rng = rng
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {"requests": 0, "errors": 0, "queued": 0, "busy_seconds": 0.0}
+
+    async def respond(self) -> bool:
+        """
+        Wait for a slot and the sampled latency.
+
+        Returns:
+            False if this request should fail
+        """
+        self.stats["requests"] += 1
+        if self.concurrency > 0:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+            self.stats["queued"] += 1
+            async with self._semaphore:
+                self.stats["queued"] -= 1
+                return await self._serve()
+        return await self._serve()
+
+    async def _serve(self) -> bool:
+        start = time.perf_counter()
+        await asyncio.sleep(self.sample_latency(self.rng))
+        self.stats["busy_seconds"] += time.perf_counter() - start
+        if self.rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return False
+        return True
+
+
+def _spot_from_prompt(prompt: str) -> Optional[str]:
+    """First spot of the "最寄りの観光地 TOP-k" list the backend puts in prompts."""
+    match = re.search(r"^\s*1\. (.+)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+
+def create_app(vlm: Upstream, rag: Upstream, chat: Upstream) -> FastAPI:
+    app = FastAPI(title="Fake VLM / Sakura AI Engine")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            upstream.name: {"latency": upstream.latency_spec, "error_rate": upstream.error_rate, **upstream.stats}
+            for upstream in (vlm, rag, chat)
+        }
+
+    @app.post("/inference")
+    async def inference(
+        image: UploadFile = File(...),  # noqa: B008
+        text: str = Form("画像を説明してください。"),  # noqa: B008
+        temperature: float = Form(0.7),  # noqa: B008
+        top_p: float = Form(0.99),  # noqa: B008
+        max_new_tokens: int = Form(128),  # noqa: B008
+        repetition_penalty: float = Form(1.05),  # noqa: B008
+    ):
+        await image.read()
+        if not await vlm.respond():
+            return JSONResponse(status_code=500, content={"detail": "Fake VLM error"})
+        spot = _spot_from_prompt(text) or "銀座の街並み"
+        return {
+            "generated_text": (
+                f"画像には{spot}が写っています。建物の外観と周辺の通りが見えます。"
+                "多くの人が行き交う賑やかな場所です。"
+            ),
+            "success": True,
+            "error_message": None,
+        }
+
+    @app.post("/v1/documents/chat/")
+    async def documents_chat(request: Request):
+        payload = await request.json()
+        if not await rag.respond():
+            return JSONResponse(status_code=500, content={"detail": "Fake RAG error"})
+        # The query embeds the fake VLM caption, so answer about the same spot
+        match = re.search(r"画像には(.+?)が写って", payload.get("query", ""))
+        spot = match.group(1) if match else "銀座四丁目交差点"
+        return {
+            "answer": _guide_answer(spot),
+            "sources": [{"document": {"name": spot}, "score": 0.9}],
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        if not await chat.respond():
+            return JSONResponse(status_code=500, content={"detail": "Fake chat error"})
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "model": payload.get("model", "gpt-oss-120b"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": _guide_answer("銀座四丁目交差点")},
+                "finish_reason": "stop",
+            }],
+        }
+
+    return app
+
+
+def _guide_answer(spot: str) -> str:
+    return (
+        f"【施設/場所の名前】\n{spot}\n\n"
+        "【観光ガイド情報】\n"
+        f"{spot}は銀座を代表する観光スポットです。\n"
+        "周辺には老舗の百貨店やカフェが立ち並びます。\n"
+        "夕方のライトアップの時間帯がおすすめです。"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake VLM server and Sakura AI Engine for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--vlm-latency", default="lognormal:1.8,0.35", help="VLM /inference latency spec")
+    parser.add_argument("--vlm-error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--vlm-concurrency", type=int, default=1,
+        help="VLM requests generated at the same time (the real server has one worker; 0 for unlimited)",
+    )
+    parser.add_argument("--rag-latency", default="lognormal:2.5,0.4", help="Sakura RAG /documents/chat/ latency spec")
+    parser.add_argument("--rag-error-rate", type=float, default=0.0)
+    parser.add_argument("--rag-concurrency", type=int, default=0, help="0 for unlimited")
+    parser.add_argument("--chat-latency", default="lognormal:2.0,0.4", help="/chat/completions latency spec")
+    parser.add_argument("--chat-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for latencies and errors")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = create_app(
+        Upstream("vlm", args.vlm_latency, args.vlm_error_rate, args.vlm_concurrency, rng),
+        Upstream("sakura_rag", args.rag_latency, args.rag_error_rate, args.rag_concurrency, rng),
+        Upstream("chat", args.chat_latency, args.chat_error_rate, 0, rng),
+    )
+    print(f"Fake upstreams on http://{args.host}:{args.port}")
+    print(f"  VLM_BASE_URL=http://{args.host}:{args.port}")
+    print(f"  SAKURA_API_BASE_URL=http://{args.host}:{args.port}/v1")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
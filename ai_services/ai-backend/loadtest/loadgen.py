@@ -0,0 +1,371 @@
+"""
+AI Backend Load Generator
+
+Reproduces the iOS app's traffic against the backend's `/inference`
+endpoint. Each simulated client behaves like `HUDViewModel`: it posts one
+multipart JPEG frame (1280x720, quality 0.8) with its location and user
+profile, waits for the answer, retries a failed request after 1 s up to 3
+times, then waits 4 s before capturing the next frame (a closed loop, so a
+slow backend also slows its clients down like it does on the device).
+
+The number of clients is ramped in steps. For each step, it reports the
+backend throughput, the latency percentiles, the error rate and the
+per-stage times from the `Server-Timing` header, and the saturation point:
+the last step that still scaled (throughput grew by at least half of the
+added clients' demand, p95 within the SLO and errors under the threshold).
+
+Run it against the fake upstreams (loadtest/fake_upstreams.py) to measure
+the backend alone without GPU time or Sakura quota:
+
+    python loadtest/loadgen.py --url http://127.0.0.1:8000 --clients 1 2 4 8 16 32 --step-seconds 60
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+# Ginza, used for random locations when the location DB is not available
+FALLBACK_CENTER = (35.6717, 139.7650)
+
+# User profiles with their share of the traffic (values from UserPreferences.swift)
+PROFILES: List[Tuple[float, Dict[str, Any]]] = [
+    (0.30, {"user_age_group": "20s", "user_budget_level": "budget", "user_interests": ["food", "shopping"],
+            "user_activity_level": "active", "user_language": "japanese"}),
+    (0.20, {"user_age_group": "30-40s", "user_budget_level": "mid-range", "user_interests": ["history", "architecture"],
+            "user_activity_level": "moderate", "user_language": "english"}),
+    (0.15, {"user_age_group": "family_with_kids", "user_budget_level": "mid-range", "user_interests": ["nature", "food"],
+            "user_activity_level": "relaxed", "user_language": "chinese"}),
+    (0.10, {"user_age_group": "50s+", "user_budget_level": "luxury", "user_interests": ["art", "history"],
+            "user_activity_level": "relaxed", "user_language": "korean"}),
+    (0.10, {"user_age_group": "20s", "user_budget_level": "budget", "user_interests": ["nightlife", "food"],
+            "user_activity_level": "active", "user_language": "thai"}),
+    (0.05, {"user_age_group": "30-40s", "user_budget_level": "luxury", "user_interests": ["shopping", "art"],
+            "user_activity_level": "moderate", "user_language": "french"}),
+    (0.05, {"user_age_group": "50s+", "user_budget_level": "mid-range", "user_interests": ["architecture"],
+            "user_activity_level": "moderate", "user_language": "german"}),
+    (0.05, {"user_age_group": "20s", "user_budget_level": "mid-range", "user_interests": ["nature"],
+            "user_activity_level": "active", "user_language": "spanish"}),
+]
+
+
+def make_jpeg(width: int, height: int, seed: int) -> bytes:
+    """Generate a camera-sized JPEG (quality 80, like the app) with enough detail for a realistic size."""
+    rng = random.Random(seed)
+    image = Image.effect_noise((width, height), 48).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        x, y = rng.randrange(width), rng.randrange(height)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + rng.randrange(40, 300), y + rng.randrange(40, 300)), fill=color)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def load_locations() -> List[Tuple[float, float, str]]:
+    """Spot locations from the location DB, or random points around Ginza."""
+    try:
+        from location_db_lookup import LocationDBLookup
+
+        spots = LocationDBLookup().spots
+        locations = [
+            (spot["latitude"], spot["longitude"], spot.get("address") or spot["name"])
+            for spot in spots
+            if spot.get("latitude") is not None and spot.get("longitude") is not None
+        ]
+        if locations:
+            return locations
+    except Exception as e:
+        print(f"Warning: Could not load the location DB, using random locations around Ginza: {e}")
+    rng = random.Random(0)
+    return [
+        (FALLBACK_CENTER[0] + rng.gauss(0, 0.005), FALLBACK_CENTER[1] + rng.gauss(0, 0.006), "東京都中央区銀座")
+        for _ in range(200)
+    ]
+
+
+def quantile(values: List[float], q: float) -> float:
+    """Nearest-rank quantile (0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Parse a `Server-Timing` header into {stage: milliseconds}."""
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+class StepRecorder:
+    """Outcomes of the requests of one ramp step."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.attempts = 0
+        self.frames = 0
+        self.failed_frames = 0
+        self.stages: Dict[str, List[float]] = {}
+
+    def success(self, latency: float, server_timing: str) -> None:
+        self.attempts += 1
+        self.latencies.append(latency)
+        for name, milliseconds in parse_server_timing(server_timing).items():
+            self.stages.setdefault(name, []).append(milliseconds)
+
+    def error(self, kind: str) -> None:
+        self.attempts += 1
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self, clients: int, elapsed: float) -> Dict[str, Any]:
+        errors = sum(self.errors.values())
+        return {
+            "clients": clients,
+            "duration_seconds": round(elapsed, 2),
+            "attempts": self.attempts,
+            "successes": len(self.latencies),
+            "errors": self.errors,
+            "error_rate": round(errors / self.attempts, 4) if self.attempts else 0.0,
+            "frames": self.frames,
+            "failed_frames": self.failed_frames,
+            "throughput_rps": round(len(self.latencies) / elapsed, 3) if elapsed > 0 else 0.0,
+            "latency_seconds": {
+                "mean": round(statistics.fmean(self.latencies), 3) if self.latencies else 0.0,
+                "p50": round(quantile(self.latencies, 0.5), 3),
+                "p95": round(quantile(self.latencies, 0.95), 3),
+                "p99": round(quantile(self.latencies, 0.99), 3),
+                "max": round(max(self.latencies), 3) if self.latencies else 0.0,
+            },
+            "server_timing_p50_ms": {
+                name: round(quantile(values, 0.5), 1) for name, values in sorted(self.stages.items())
+            },
+        }
+
+
+class LoadGenerator:
+    """Closed-loop iOS clients posting frames to the backend."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.url = args.url.rstrip("/") + "/inference"
+        self.rng = random.Random(args.seed)
+        self.images = [make_jpeg(args.width, args.height, args.seed + i) for i in range(4)]
+        self.locations = load_locations()
+
+    def _new_client(self) -> Tuple[Dict[str, Any], Tuple[float, float, str]]:
+        weights = [weight for weight, _ in PROFILES]
+        profile = self.rng.choices([profile for _, profile in PROFILES], weights=weights)[0]
+        return profile, self.rng.choice(self.locations)
+
+    def _form(self, profile: Dict[str, Any], location: Tuple[float, float, str]) -> Dict[str, Any]:
+        latitude, longitude, address = location
+        # The user walks around: a few meters of GPS jitter around the spot.
+        # List values (user_interests) are sent as repeated fields like the app does.
+        return {
+            "address": address,
+            "latitude": f"{latitude + self.rng.gauss(0, 0.0002):.6f}",
+            "longitude": f"{longitude + self.rng.gauss(0, 0.0002):.6f}",
+            **profile,
+        }
+
+    async def _client(self, client: httpx.AsyncClient, deadline: float, recorder: StepRecorder) -> None:
+        args = self.args
+        profile, location = self._new_client()
+        # Clients do not start in lockstep
+        await asyncio.sleep(self.rng.uniform(0, args.interval))
+
+        while time.monotonic() < deadline:
+            recorder.frames += 1
+            files = {"image": ("image.jpg", self.rng.choice(self.images), "image/jpeg")}
+            data = self._form(profile, location)
+            for attempt in range(args.max_retries + 1):
+                start = time.perf_counter()
+                try:
+                    response = await client.post(self.url, files=files, data=data)
+                    latency = time.perf_counter() - start
+                    if response.status_code == 200:
+                        recorder.success(latency, response.headers.get("server-timing", ""))
+                        break
+                    recorder.error(f"http_{response.status_code}")
+                except httpx.TimeoutException:
+                    recorder.error("timeout")
+                except httpx.HTTPError:
+                    recorder.error("connection")
+                if attempt == args.max_retries:
+                    recorder.failed_frames += 1
+                elif time.monotonic() < deadline:
+                    await asyncio.sleep(args.retry_delay)
+                else:
+                    break
+            await asyncio.sleep(args.interval)
+
+    async def run_step(self, clients: int) -> Dict[str, Any]:
+        recorder = StepRecorder()
+        limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+        timeout = httpx.Timeout(self.args.timeout)
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            start = time.monotonic()
+            deadline = start + self.args.step_seconds
+            # Requests still in flight at the deadline are allowed to finish
+            await asyncio.gather(*(self._client(client, deadline, recorder) for _ in range(clients)))
+            elapsed = time.monotonic() - start
+        return recorder.summary(clients, elapsed)
+
+
+def find_saturation(steps: List[Dict[str, Any]], slo_p95: float, max_error_rate: float) -> Dict[str, Any]:
+    """
+    Find the last step before the backend saturated.
+
+    A step is saturated when its p95 exceeds the SLO, its error rate exceeds
+    the threshold, or its throughput grew by less than half of what the
+    added clients would add to an unsaturated backend.
+    """
+    saturated_at = None
+    for i, step in enumerate(steps):
+        reasons = []
+        if step["latency_seconds"]["p95"] > slo_p95:
+            reasons.append(f"p95 {step['latency_seconds']['p95']:.2f}s > SLO {slo_p95:.2f}s")
+        if step["error_rate"] > max_error_rate:
+            reasons.append(f"error rate {step['error_rate']:.1%} > {max_error_rate:.1%}")
+        if i > 0 and steps[i - 1]["throughput_rps"] > 0:
+            previous = steps[i - 1]
+            expected = previous["throughput_rps"] * step["clients"] / previous["clients"]
+            gain = step["throughput_rps"] - previous["throughput_rps"]
+            if gain < 0.5 * (expected - previous["throughput_rps"]):
+                reasons.append(
+                    f"throughput {previous['throughput_rps']:.2f} -> {step['throughput_rps']:.2f} rps "
+                    f"(linear scaling: {expected:.2f})"
+                )
+        step["saturated"] = bool(reasons)
+        step["saturation_reasons"] = reasons
+        if reasons and saturated_at is None:
+            saturated_at = i
+
+    if saturated_at is None:
+        last = steps[-1] if steps else None
+        return {
+            "saturated": False,
+            "max_clients": last["clients"] if last else 0,
+            "max_throughput_rps": last["throughput_rps"] if last else 0.0,
+            "reasons": [],
+        }
+    sustainable = steps[saturated_at - 1] if saturated_at > 0 else None
+    return {
+        "saturated": True,
+        "saturated_at_clients": steps[saturated_at]["clients"],
+        "max_clients": sustainable["clients"] if sustainable else 0,
+        "max_throughput_rps": sustainable["throughput_rps"] if sustainable else 0.0,
+        "reasons": steps[saturated_at]["saturation_reasons"],
+    }
+
+
+def print_step(step: Dict[str, Any]) -> None:
+    latency = step["latency_seconds"]
+    print(
+        f"{step['clients']:>5} clients  {step['throughput_rps']:7.2f} rps  "
+        f"p50 {latency['p50']:6.2f}s  p95 {latency['p95']:6.2f}s  p99 {latency['p99']:6.2f}s  "
+        f"errors {step['error_rate']:6.1%}  ({step['successes']} ok / {step['attempts']} attempts)"
+    )
+    if step["server_timing_p50_ms"]:
+        stages = ", ".join(f"{name} {ms:.0f}ms" for name, ms in step["server_timing_p50_ms"].items())
+        print(f"       stages p50: {stages}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    generator = LoadGenerator(args)
+    print(
+        f"Target {generator.url}, {len(generator.locations)} locations, "
+        f"frame {args.width}x{args.height} ({len(generator.images[0]) / 1024:.0f} KB)"
+    )
+    steps = []
+    for clients in args.clients:
+        step = await generator.run_step(clients)
+        print_step(step)
+        steps.append(step)
+        if args.stop_on_saturation and find_saturation(steps, args.slo_p95, args.max_error_rate)["saturated"]:
+            break
+        if args.cooldown > 0:
+            await asyncio.sleep(args.cooldown)
+
+    saturation = find_saturation(steps, args.slo_p95, args.max_error_rate)
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "url": generator.url,
+        "config": {
+            "interval_seconds": args.interval,
+            "timeout_seconds": args.timeout,
+            "max_retries": args.max_retries,
+            "step_seconds": args.step_seconds,
+            "slo_p95_seconds": args.slo_p95,
+            "max_error_rate": args.max_error_rate,
+            "seed": args.seed,
+        },
+        "steps": steps,
+        "saturation": saturation,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI backend with simulated iOS clients")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Client counts to ramp through")
+    parser.add_argument("--step-seconds", type=float, default=60.0, help="Duration of each step")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="Pause between steps")
+    parser.add_argument("--interval", type=float, default=4.0, help="Wait between frames of one client (app: 4 s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout (app: 30 s)")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries of a failed frame (app: 3)")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="Wait before a retry (app: 1 s)")
+    parser.add_argument("--width", type=int, default=1280, help="Frame width (app: 1280)")
+    parser.add_argument("--height", type=int, default=720, help="Frame height (app: 720)")
+    parser.add_argument("--slo-p95", type=float, default=10.0, help="p95 latency SLO in seconds")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate treated as saturation")
+    parser.add_argument("--stop-on-saturation", action="store_true", help="Stop the ramp at the first saturated step")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="loadgen_results.json", help="Results JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    saturation = report["saturation"]
+    if saturation["saturated"]:
+        print(
+            f"\nSaturated at {saturation['saturated_at_clients']} clients: {'; '.join(saturation['reasons'])}"
+            f"\nSustainable: {saturation['max_clients']} clients, {saturation['max_throughput_rps']:.2f} rps"
+        )
+    else:
+        print(
+            f"\nNot saturated up to {saturation['max_clients']} clients "
+            f"({saturation['max_throughput_rps']:.2f} rps)"
+        )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
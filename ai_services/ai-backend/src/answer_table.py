@@ -0,0 +1,271 @@
+"""
+Answer Table Module
+
+This module provides a precomputed table of RAG guides for the default
+prompt. For busy landmarks most `/inference` requests end in the same guide
+for a given user profile and language, so the guides are generated offline
+for every spot in the database and every common profile/language
+combination, and the backend serves them without calling the RAG API.
+
+Each spot's answers are stored with a content hash of the spot record, and
+the table with a hash of the RAG prompt template. When a spot changes, only
+its answers become stale. When the prompt changes, the whole table does.
+Stale answers are dropped on load and regenerated by the next precompute run.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+# Bump when the table layout changes so old tables are rejected
+ANSWER_TABLE_FORMAT = 1
+
+# Form fields that make up a user profile (see /inference)
+PROFILE_FIELDS = ("user_age_group", "user_budget_level", "user_interests", "user_activity_level")
+
+LANGUAGES = ("japanese", "english", "chinese", "korean", "spanish", "french", "german", "thai")
+
+# Generator of one answer: (spot, profile, language) -> (facility name, guide) or None on failure
+AnswerGenerator = Callable[[Dict[str, Any], Dict[str, Any], str], Awaitable[Optional[Tuple[str, str]]]]
+
+
+def profile_key(profile: Dict[str, Any], language: str) -> str:
+    """
+    Canonical key of a user profile and language.
+
+    Missing fields and None are treated alike, and interests are order-independent.
+    """
+    values = [
+        profile.get("user_age_group"),
+        profile.get("user_budget_level"),
+        sorted(profile.get("user_interests") or []),
+        profile.get("user_activity_level"),
+        language,
+    ]
+    return json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+
+
+def spot_content_hash(spot: Dict[str, Any]) -> str:
+    """Content hash of a spot record, used to detect stale answers."""
+    canonical = json.dumps(spot, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", text)).casefold()
+
+
+def caption_mentions_spot(caption: str, spot_name: str) -> bool:
+    """
+    Check whether a VLM caption names the spot.
+
+    The spot name is also matched without a parenthesized suffix
+    (e.g. "銀座和光（和光本館）" matches a caption mentioning "銀座和光").
+    """
+    normalized_caption = _normalize(caption)
+    names = {_normalize(spot_name), _normalize(re.sub(r"[（(].*?[）)]", "", spot_name))}
+    return any(len(name) >= 2 and name in normalized_caption for name in names)
+
+
+class AnswerTable:
+    """Precomputed guides by spot name and profile key."""
+
+    def __init__(self, prompt_hash: str, spots: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Initialize the table.
+
+        Args:
+            prompt_hash: Hash of the RAG prompt template the answers were generated with
+            spots: Entries by spot name: {"content_hash": ..., "answers": {profile key: {"name", "description"}}}
+        """
+        self.prompt_hash = prompt_hash
+        self.spots = spots or {}
+
+    @classmethod
+    def load(cls, path: str, spots: List[Dict[str, Any]], prompt_hash: str) -> "AnswerTable":
+        """
+        Load a table, keeping only the answers that are fresh for the given spots.
+
+        Args:
+            path: Table file written by `save`
+            spots: Current tourist spots (same records as LocationDBLookup.spots)
+            prompt_hash: Hash of the current RAG prompt template
+
+        Returns:
+            AnswerTable with the fresh answers (empty if the prompt has changed)
+
+        Raises:
+            ValueError: If the file has another format
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get("format") != ANSWER_TABLE_FORMAT:
+            raise ValueError(f"Unsupported answer table: {path}")  # noqa: TRY003
+
+        table = cls(prompt_hash)
+        if data["prompt_hash"] != prompt_hash:
+            print("Answer table was generated with another RAG prompt, ignoring it")
+            return table
+
+        stale = 0
+        current_hashes = {spot["name"]: spot_content_hash(spot) for spot in spots}
+        for name, entry in data["spots"].items():
+            if current_hashes.get(name) == entry["content_hash"]:
+                table.spots[name] = entry
+            else:
+                stale += 1
+        if stale:
+            print(f"Answer table: dropped {stale} stale or removed spot(s)")
+        return table
+
+    def save(self, path: str) -> None:
+        """Write the table as JSON (atomically, so a running backend never reads a partial file)."""
+        data = {"format": ANSWER_TABLE_FORMAT, "prompt_hash": self.prompt_hash, "spots": self.spots}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    def get(self, spot_name: str, key: str) -> Optional[Tuple[str, str]]:
+        """Return the (facility name, guide) for a spot and profile key, recording a cache hit or miss."""
+        answer = self.spots.get(spot_name, {}).get("answers", {}).get(key)
+        metrics.record_cache("answer_table", hit=answer is not None)
+        if answer is None:
+            return None
+        return answer["name"], answer["description"]
+
+    def put(self, spot: Dict[str, Any], key: str, name: str, description: str) -> None:
+        entry = self.spots.get(spot["name"])
+        content_hash = spot_content_hash(spot)
+        if entry is None or entry["content_hash"] != content_hash:
+            entry = self.spots[spot["name"]] = {"content_hash": content_hash, "answers": {}}
+        entry["answers"][key] = {"name": name, "description": description}
+
+    def __len__(self) -> int:
+        return sum(len(entry["answers"]) for entry in self.spots.values())
+
+
+def expand_profiles(profiles: Iterable[Dict[str, Any]], languages: Iterable[str]) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    Pair profiles with languages.
+
+    A profile with `user_language` is used for that language only; the
+    others are paired with every language.
+    """
+    languages = list(languages)
+    combinations = []
+    for profile in profiles:
+        language = profile.get("user_language")
+        for lang in [language] if language else languages:
+            combinations.append(({field: profile.get(field) for field in PROFILE_FIELDS}, lang))
+    return combinations
+
+
+async def precompute(
+    table: AnswerTable,
+    spots: List[Dict[str, Any]],
+    combinations: List[Tuple[Dict[str, Any], str]],
+    generate: AnswerGenerator,
+    concurrency: int = 4,
+) -> Dict[str, int]:
+    """
+    Fill the table with the missing answers for every spot and profile/language combination.
+
+    Answers already in the table (fresh, since `load` drops stale ones) are kept.
+    Failed generations are left out, so the next run retries them.
+
+    Returns:
+        Counts of reused, generated and failed answers
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"reused": 0, "generated": 0, "failed": 0}
+
+    async def fill(spot: Dict[str, Any], profile: Dict[str, Any], language: str) -> None:
+        key = profile_key(profile, language)
+        async with semaphore:
+            answer = await generate(spot, profile, language)
+        if answer is None:
+            counts["failed"] += 1
+            return
+        table.put(spot, key, *answer)
+        counts["generated"] += 1
+
+    tasks = []
+    for spot in spots:
+        existing = table.spots.get(spot["name"], {}).get("answers", {})
+        for profile, language in combinations:
+            if profile_key(profile, language) in existing:
+                counts["reused"] += 1
+            else:
+                tasks.append(fill(spot, profile, language))
+    await asyncio.gather(*tasks)
+    return counts
+
+
+def main():
+    """Generate (or refresh) the answer table for the configured database."""
+    import argparse
+
+    import main as backend
+    from location_db_lookup import LocationDBLookup
+
+    parser = argparse.ArgumentParser(description="Precompute RAG guides for every spot and common profile")
+    parser.add_argument("--db-path", default=None, help="Tourist spots database JSON file")
+    parser.add_argument("--output", default=None, help="Table path (default: next to the database, .answers.json)")
+    parser.add_argument(
+        "--profiles",
+        default=None,
+        help="JSON file with a list of profiles (user_age_group, user_budget_level, user_interests, "
+        "user_activity_level, optional user_language). Default: a single profile without attributes",
+    )
+    parser.add_argument("--languages", nargs="+", default=list(LANGUAGES), choices=LANGUAGES)
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent RAG requests")
+    args = parser.parse_args()
+
+    api_token = os.getenv("SAKURA_OPENAI_API_TOKEN")
+    if not api_token:
+        parser.error("SAKURA_OPENAI_API_TOKEN environment variable not set")
+
+    location_db = LocationDBLookup(args.db_path)
+    backend.local_rag_engine = backend.load_local_rag_engine(location_db)
+    # The Sakura RAG index cannot be restricted to one spot and returns passages of neighbouring
+    # spots, so generate_spot_guide would reject most guides and leave the table nearly empty
+    if backend.local_rag_engine is None:
+        parser.error("precomputing guides requires the local RAG engine (set RAG_BACKEND=local)")
+    output = args.output or str(Path(location_db.db_path).with_suffix(".answers.json"))
+
+    profiles = [{}]
+    if args.profiles:
+        with open(args.profiles, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+
+    prompt_hash = backend.rag_prompt_hash()
+    table = AnswerTable(prompt_hash)
+    if Path(output).exists():
+        try:
+            table = AnswerTable.load(output, location_db.spots, prompt_hash)
+        except ValueError as e:
+            print(f"Warning: {e}, regenerating")
+
+    async def generate(spot: Dict[str, Any], profile: Dict[str, Any], language: str) -> Optional[Tuple[str, str]]:
+        return await backend.generate_spot_guide(api_token, spot, profile, language)
+
+    combinations = expand_profiles(profiles, args.languages)
+    counts = asyncio.run(precompute(table, location_db.spots, combinations, generate, args.concurrency))
+    table.save(output)
+    print(json.dumps(
+        {"table_path": output, "spots": len(location_db.spots), "combinations": len(combinations),
+         "answers": len(table), **counts},
+        ensure_ascii=False,
+    ))
+
+
+if __name__ == "__main__":
+    main()
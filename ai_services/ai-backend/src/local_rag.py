@@ -0,0 +1,551 @@
+"""
+Local RAG Engine Module
+
+This module provides an offline retrieval backend for RAG guide generation.
+Spot descriptions from the tourist spots database are embedded once into an
+on-disk vector index, retrieval runs locally (optionally restricted to the
+geo top-k candidates), and only the retrieved passages are sent to the chat
+model. With a location DB attached, retrieval is first narrowed to the
+spots within a radius of the user so that the vector search only ranks a
+handful of nearby candidates. The response mimics the Sakura AI Engine `/v1/documents/chat/` payload
+so callers can treat both backends the same way.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Protocol
+
+import httpx
+import numpy as np
+
+import metrics
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from location_db_lookup import LocationDBLookup
+
+# Overridable to point at a local stand-in (e.g. loadtest/fake_upstreams.py)
+SAKURA_API_BASE_URL = os.getenv("SAKURA_API_BASE_URL", "https://api.ai.sakura.ad.jp/v1").rstrip("/")
+
+
+class Embedder(Protocol):
+    """Interface for text embedders used by the local RAG engine."""
+
+    name: str
+
+    def embed_passages(self, texts: List[str]) -> np.ndarray:
+        """Embed document passages into a (n, dim) float32 array."""
+        ...
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query into a (dim,) float32 array."""
+        ...
+
+
+class HashingEmbedder:
+    """
+    Deterministic character n-gram hashing embedder.
+
+    Needs no model or network access, which makes it suitable for offline
+    development and tests. Character bigrams work reasonably well for
+    Japanese text where whitespace tokenization does not apply.
+    """
+
+    def __init__(self, dim: int = 512, ngram: int = 2):
+        self.dim = dim
+        self.ngram = ngram
+        self.name = f"hashing-{ngram}gram-{dim}"
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        normalized = re.sub(r"\s+", "", text.lower())
+        for i in range(max(len(normalized) - self.ngram + 1, 1)):
+            gram = normalized[i:i + self.ngram]
+            digest = hashlib.md5(gram.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        return vector
+
+    def embed_passages(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.stack([self._embed(text) for text in texts])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed(text)
+
+
+class SakuraEmbedder:
+    """
+    Embedder backed by the Sakura AI Engine OpenAI-compatible embeddings API.
+
+    multilingual-e5 models expect "passage: " / "query: " prefixes, which are
+    added automatically.
+    """
+
+    def __init__(
+        self,
+        api_token: str,
+        model: str = "multilingual-e5-large",
+        base_url: str = SAKURA_API_BASE_URL,
+        batch_size: int = 32,
+        timeout: float = 30.0,
+    ):
+        self.api_token = api_token
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.name = f"sakura-{model}"
+
+    def _request(self, inputs: List[str]) -> np.ndarray:
+        response = httpx.post(
+            f"{self.base_url}/embeddings",
+            json={"model": self.model, "input": inputs},
+            headers={
+                "Authorization": f"Bearer {self.api_token}",
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+            },
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return np.asarray([item["embedding"] for item in data], dtype=np.float32)
+
+    def embed_passages(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            # The model's dimension is only known from a response, and an empty index is never searched
+            return np.empty((0, 0), dtype=np.float32)
+        batches = [
+            self._request([f"passage: {text}" for text in texts[i:i + self.batch_size]])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        return np.concatenate(batches, axis=0)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._request([f"query: {text}"])[0]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize vectors along the last axis (zero vectors stay zero)."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on normalized vectors. Returns (nlist, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assignments == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class VectorIndex:
+    """
+    Vector index over normalized embeddings using dot-product similarity.
+
+    Flat search is used by default. When built with `nlist > 0`, an IVF
+    (inverted file) layer clusters the vectors so that unrestricted searches
+    only scan the `nprobe` closest clusters.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        keys: List[str],
+        embedder_name: str,
+        source_hash: str,
+        centroids: Optional[np.ndarray] = None,
+        assignments: Optional[np.ndarray] = None,
+    ):
+        self.vectors = vectors
+        self.keys = keys
+        self.embedder_name = embedder_name
+        self.source_hash = source_hash
+        self.centroids = centroids
+        self.assignments = assignments
+        self._row_by_key = {key: row for row, key in enumerate(keys)}
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        keys: List[str],
+        embedder_name: str,
+        source_hash: str,
+        nlist: int = 0,
+    ) -> "VectorIndex":
+        """Build an index from raw embeddings, optionally with an IVF layer."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        centroids = assignments = None
+        if nlist > 0 and len(vectors) > nlist:
+            centroids = _kmeans(vectors, nlist)
+            assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        return cls(vectors, keys, embedder_name, source_hash, centroids, assignments)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        """Load an index saved with `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            centroids = data["centroids"] if "centroids" in data else None
+            assignments = data["assignments"] if "assignments" in data else None
+            return cls(
+                vectors=data["vectors"],
+                keys=[str(key) for key in data["keys"]],
+                embedder_name=str(data["embedder_name"]),
+                source_hash=str(data["source_hash"]),
+                centroids=centroids,
+                assignments=assignments,
+            )
+
+    def save(self, path: str) -> None:
+        """Save the index as an uncompressed .npz file for fast loading."""
+        arrays = {
+            "vectors": self.vectors,
+            "keys": np.asarray(self.keys),
+            "embedder_name": np.asarray(self.embedder_name),
+            "source_hash": np.asarray(self.source_hash),
+        }
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+            arrays["assignments"] = self.assignments
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        candidate_keys: Optional[List[str]] = None,
+        nprobe: int = 4,
+    ) -> List[tuple[str, float]]:
+        """
+        Find the k most similar entries to the query vector.
+
+        Args:
+            query_vector: Query embedding (normalized internally)
+            k: Number of results to return
+            candidate_keys: If given, only these entries are scored
+            nprobe: Number of IVF clusters to scan for unrestricted searches
+
+        Returns:
+            List of (key, similarity) tuples sorted by descending similarity
+        """
+        if len(self.vectors) == 0:
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+        if candidate_keys is not None:
+            rows = np.asarray(
+                [self._row_by_key[key] for key in candidate_keys if key in self._row_by_key],
+                dtype=np.int64,
+            )
+        elif self.centroids is not None:
+            closest = np.argsort(-(self.centroids @ query))[:nprobe]
+            rows = np.flatnonzero(np.isin(self.assignments, closest))
+        else:
+            rows = None
+
+        if rows is not None and len(rows) == 0:
+            return []
+
+        candidates = self.vectors if rows is None else self.vectors[rows]
+        scores = candidates @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if rows is not None:
+            return [(self.keys[rows[i]], float(scores[i])) for i in top]
+        return [(self.keys[i], float(scores[i])) for i in top]
+
+
+def format_passage(spot: Dict[str, Any]) -> str:
+    """Format a tourist spot as passage text (same layout as rag_maker step1)."""
+    return (
+        f"名前: {spot.get('name', 'N/A')}\n"
+        f"住所: {spot.get('address', 'N/A')}\n"
+        f"説明: {spot.get('description', 'N/A')}"
+    )
+
+
+def spot_key(spot: Dict[str, Any]) -> str:
+    """Index key of a spot: its name and coordinates, since spot names are not unique."""
+    return f"{spot.get('name')}@{spot.get('latitude')},{spot.get('longitude')}"
+
+
+def _spots_hash(spots: List[Dict[str, Any]]) -> str:
+    """Content hash of the passages and their keys, used to detect a stale on-disk index."""
+    digest = hashlib.sha256()
+    for spot in spots:
+        digest.update(spot_key(spot).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(format_passage(spot).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LocalRAGEngine:
+    """Local retrieval + remote chat model, returning Sakura-compatible responses."""
+
+    def __init__(
+        self,
+        spots: List[Dict[str, Any]],
+        embedder: Embedder,
+        index_path: Optional[str] = None,
+        nlist: int = 0,
+        chat_model: str = "gpt-oss-120b",
+        chat_base_url: str = SAKURA_API_BASE_URL,
+        location_db: Optional["LocationDBLookup"] = None,
+        radius_km: float = 1.0,
+    ):
+        """
+        Initialize the engine, loading the on-disk index or building it.
+
+        Args:
+            spots: Tourist spots (same records as LocationDBLookup.spots)
+            embedder: Embedder used for passages and queries
+            index_path: Path of the .npz index file. If None, the index is kept in memory only.
+            nlist: Number of IVF clusters (0 disables IVF)
+            chat_model: Chat model used to write the answer from retrieved passages
+            chat_base_url: Base URL of the OpenAI-compatible chat completions API
+            location_db: Location DB used to narrow retrieval to nearby spots
+            radius_km: Geo prefilter radius in kilometers (0 disables the radius prefilter)
+        """
+        self.spots = {spot_key(spot): spot for spot in spots}
+        self.embedder = embedder
+        self.index_path = index_path
+        self.chat_model = chat_model
+        self.chat_base_url = chat_base_url.rstrip("/")
+        self.location_db = location_db
+        self.radius_km = radius_km
+        self.index = self._load_or_build_index(spots, nlist)
+
+    @classmethod
+    def from_env(cls, location_db: "LocationDBLookup") -> "LocalRAGEngine":
+        """
+        Create an engine for the given location DB configured from environment variables.
+
+        LOCAL_RAG_EMBEDDER: "sakura" (default) or "hashing" (offline stub)
+        LOCAL_RAG_INDEX_PATH: Index file path (default: next to the database file)
+        LOCAL_RAG_IVF_NLIST: Number of IVF clusters (default: 0, flat search)
+        LOCAL_RAG_GEO_RADIUS_KM: Geo prefilter radius in kilometers (default: 1.0)
+        """
+        embedder_type = os.getenv("LOCAL_RAG_EMBEDDER", "sakura")
+        if embedder_type == "hashing":
+            embedder: Embedder = HashingEmbedder()
+        elif embedder_type == "sakura":
+            api_token = os.getenv("SAKURA_OPENAI_API_TOKEN")
+            if not api_token:
+                raise ValueError("SAKURA_OPENAI_API_TOKEN is required for the sakura embedder")  # noqa: TRY003
+            embedder = SakuraEmbedder(api_token)
+        else:
+            raise ValueError(f"Unknown LOCAL_RAG_EMBEDDER: {embedder_type}")  # noqa: TRY003
+
+        index_path = os.getenv("LOCAL_RAG_INDEX_PATH") or str(
+            Path(location_db.db_path).with_suffix(f".{embedder.name}.index.npz")
+        )
+        return cls(
+            location_db.spots,
+            embedder,
+            index_path=index_path,
+            nlist=int(os.getenv("LOCAL_RAG_IVF_NLIST", 0)),
+            location_db=location_db,
+            radius_km=float(os.getenv("LOCAL_RAG_GEO_RADIUS_KM", 1.0)),
+        )
+
+    def _load_or_build_index(self, spots: List[Dict[str, Any]], nlist: int) -> VectorIndex:
+        source_hash = _spots_hash(spots)
+
+        if self.index_path and Path(self.index_path).exists():
+            index = VectorIndex.load(self.index_path)
+            if index.source_hash == source_hash and index.embedder_name == self.embedder.name:
+                print(f"Loaded local RAG index: {self.index_path} ({len(index.keys)} passages)")
+                metrics.record_cache("local_rag_index", hit=True)
+                return index
+            print("Local RAG index is stale, rebuilding")
+
+        metrics.record_cache("local_rag_index", hit=False)
+        print(f"Embedding {len(spots)} passages with {self.embedder.name}")
+        vectors = self.embedder.embed_passages([format_passage(spot) for spot in spots])
+        index = VectorIndex.build(
+            vectors,
+            [spot_key(spot) for spot in spots],
+            self.embedder.name,
+            source_hash,
+            nlist=nlist,
+        )
+        if self.index_path:
+            index.save(self.index_path)
+            print(f"Saved local RAG index: {self.index_path}")
+        return index
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 3,
+        candidate_spots: Optional[List[Dict[str, Any]]] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve the passages most similar to the query.
+
+        When coordinates are given and a location DB is attached, candidates are
+        first narrowed to the spots within `radius_km`. If no spot lies within the
+        radius, `candidate_spots` is used instead.
+
+        Args:
+            query: Retrieval query text
+            top_k: Number of passages to return
+            candidate_spots: Geo-prefiltered spots (e.g. LocationDBLookup.find_top_k).
+              If None or empty, the whole index is searched.
+            latitude: User's latitude for the radius prefilter
+            longitude: User's longitude for the radius prefilter
+
+        Returns:
+            List of sources in the Sakura `/documents/chat/` response format
+        """
+        if (
+            self.location_db
+            and self.radius_km > 0
+            and latitude is not None
+            and longitude is not None
+        ):
+            nearby_spots = self.location_db.find_nearby(latitude, longitude, self.radius_km)
+            if nearby_spots:
+                candidate_spots = nearby_spots
+
+        candidate_keys = [spot_key(spot) for spot in candidate_spots] if candidate_spots else None
+        hits = self.index.search(self.embedder.embed_query(query), top_k, candidate_keys)
+        return [
+            {
+                "document": {
+                    "id": key,
+                    "name": self.spots[key]["name"],
+                    "status": "available",
+                    "model": self.embedder.name,
+                },
+                "chunk_index": 0,
+                "distance": round(1.0 - similarity, 4),
+                "content": format_passage(self.spots[key]),
+            }
+            for key, similarity in hits
+        ]
+
+    async def query(
+        self,
+        api_token: str,
+        query: str,
+        retrieval_query: Optional[str] = None,
+        top_k: int = 3,
+        candidate_spots: Optional[List[Dict[str, Any]]] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+    ) -> Optional[dict]:
+        """
+        Retrieve passages locally and generate the answer with the chat model.
+
+        Args:
+            api_token: API token for the chat completions API
+            query: Full prompt for the chat model
+            retrieval_query: Text used for retrieval. Defaults to the query itself.
+            top_k: Number of passages passed to the chat model
+            candidate_spots: Geo-prefiltered spots to restrict retrieval to
+            latitude: User's latitude for the radius prefilter
+            longitude: User's longitude for the radius prefilter
+
+        Returns:
+            Response dict containing answer and sources, or None if error
+        """
+        with metrics.stage("rag_retrieve"):
+            sources = await asyncio.to_thread(
+                self.retrieve,
+                retrieval_query or query,
+                top_k,
+                candidate_spots,
+                latitude,
+                longitude,
+            )
+
+        context = "\n\n".join(
+            f"[{i}] {source['content']}" for i, source in enumerate(sources, 1)
+        )
+        messages = [
+            {
+                "role": "system",
+                "content": "以下の参考文書の情報に基づいて質問に回答してください。\n\n"
+                f"参考文書:\n{context or '(該当なし)'}",
+            },
+            {"role": "user", "content": query},
+        ]
+
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                with metrics.stage("rag_chat"), metrics.UPSTREAM_IN_FLIGHT.track(upstream="rag_chat"):
+                    response = await client.post(
+                        f"{self.chat_base_url}/chat/completions",
+                        json={"model": self.chat_model, "messages": messages},
+                        headers=tracer.inject({
+                            "Authorization": f"Bearer {api_token}",
+                            "Content-Type": "application/json",
+                            "Accept": "application/json",
+                        }),
+                    )
+                metrics.record_upstream("rag_chat", response.status_code)
+
+                if response.status_code == 200:
+                    answer = response.json()["choices"][0]["message"]["content"]
+                    return {"answer": answer, "sources": sources}
+                else:
+                    print(f"Local RAG chat error: Status {response.status_code}")
+                    print(f"Response: {response.text}")
+                    return None
+        except httpx.TimeoutException as e:
+            metrics.record_upstream("rag_chat", "timeout")
+            print(f"Local RAG chat timeout: {e}")
+            return None
+        except httpx.RequestError as e:
+            metrics.record_upstream("rag_chat", "error")
+            print(f"Local RAG chat request error: {e}")
+            return None
+
+
+def main():
+    """Build (or refresh) the on-disk index for the configured database."""
+    import argparse
+
+    from location_db_lookup import LocationDBLookup
+
+    parser = argparse.ArgumentParser(description="Build the local RAG vector index")
+    parser.add_argument("--db-path", default=None, help="Tourist spots database JSON file")
+    args = parser.parse_args()
+
+    location_db = LocationDBLookup(args.db_path)
+    engine = LocalRAGEngine.from_env(location_db)
+    print(json.dumps(
+        {
+            "index_path": engine.index_path,
+            "passages": len(engine.index.keys),
+            "embedder": engine.embedder.name,
+            "ivf": engine.index.centroids is not None,
+        },
+        ensure_ascii=False,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,13 @@ and can work with any regional tourist database.
 import json
 import math
 import os
+import pickle
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 
+# Bump when the artifact layout changes so old artifacts are rejected
+ARTIFACT_FORMAT = 1
+
 
 class LocationDBLookup:
     """Lookup nearest tourist spot based on latitude and longitude."""
@@ -31,6 +35,7 @@ class LocationDBLookup:
                 for db_name in ["GinzaDB", "LocationDB", "TouristSpotsDB"]:
                     for file_name in [
                         f"{db_name.lower()}.json",
+                        f"{db_name[0].lower()}{db_name[1:]}.json",
                         "locations.json",
                         "spots.json",
                     ]:
@@ -49,6 +54,55 @@ class LocationDBLookup:
         self.spots = self._load_database()
         self._default_top_k = int(os.getenv("LOCATION_TOP_K", 5))
 
+    @classmethod
+    def from_artifact(cls, artifact_path: str) -> "LocationDBLookup":
+        """
+        Load the spots from a precompiled artifact (see `save_artifact`), skipping the
+        database search and JSON parsing.
+
+        Args:
+            artifact_path: Artifact file written by `save_artifact`
+
+        Returns:
+            LocationDBLookup with the artifact's spots
+
+        Raises:
+            ValueError: If the artifact has another format or its source database has changed
+        """
+        with open(artifact_path, "rb") as f:
+            artifact = pickle.load(f)
+
+        if not isinstance(artifact, dict) or artifact.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported location DB artifact: {artifact_path}")  # noqa: TRY003
+        source = artifact["source"]
+        # The source may be left out of the deployment; if it is there, it must be unchanged
+        if Path(source["path"]).exists() and _source_stamp(source["path"]) != source:
+            raise ValueError(f"Location DB artifact is stale: {source['path']} has changed")  # noqa: TRY003
+
+        lookup = cls.__new__(cls)
+        lookup.db_path = source["path"]
+        lookup.spots = artifact["spots"]
+        lookup._default_top_k = int(os.getenv("LOCATION_TOP_K", 5))
+        return lookup
+
+    def save_artifact(self, artifact_path: str) -> None:
+        """
+        Write the loaded spots as a binary artifact that `from_artifact` loads
+        faster than the JSON database.
+
+        Args:
+            artifact_path: Output file path
+        """
+        artifact = {
+            "format": ARTIFACT_FORMAT,
+            "source": _source_stamp(self.db_path),
+            "spots": self.spots,
+        }
+        tmp_path = f"{artifact_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, artifact_path)
+
     def _load_database(self) -> List[Dict[str, Any]]:
         """Load tourist spots from JSON file."""
         with open(self.db_path, "r", encoding="utf-8") as f:
@@ -153,7 +207,17 @@ class LocationDBLookup:
         """
         nearby_spots = []
 
+        # Bounding box in degrees, used to skip the haversine for far-away spots
+        lat_margin = radius_km / 111.0
+        lon_margin = radius_km / (111.0 * max(math.cos(math.radians(latitude)), 0.01))
+
         for spot in self.spots:
+            if (
+                abs(spot["latitude"] - latitude) > lat_margin
+                or abs(spot["longitude"] - longitude) > lon_margin
+            ):
+                continue
+
             distance = self._haversine_distance(
                 latitude,
                 longitude,
@@ -232,3 +296,34 @@ class LocationDBLookup:
         # Sort by distance and return top-k
         spots_with_distance.sort(key=lambda x: x["distance_km"])
         return spots_with_distance[:k]
+
+
+def _source_stamp(db_path: str) -> Dict[str, Any]:
+    """Identify a database file version by its absolute path, size and modification time."""
+    path = Path(db_path).resolve()
+    stat = path.stat()
+    return {"path": str(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def main():
+    """Compile the tourist spots database into a binary artifact for fast startup."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the location DB into a binary artifact")
+    parser.add_argument("--db-path", default=None, help="Tourist spots database JSON file")
+    parser.add_argument(
+        "--output", default=None, help="Artifact path (default: next to the database, .lookup.pickle)"
+    )
+    args = parser.parse_args()
+
+    lookup = LocationDBLookup(args.db_path)
+    output = args.output or str(Path(lookup.db_path).with_suffix(".lookup.pickle"))
+    lookup.save_artifact(output)
+    print(json.dumps(
+        {"db_path": lookup.db_path, "artifact_path": output, "spots": len(lookup.spots)},
+        ensure_ascii=False,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,181 @@
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Imported first: the startup timer starts with it, so the imports below are timed
+from startup_timing import startup_timer
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+import asyncio
+import hashlib
 import os
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 from pydantic import BaseModel, Field
 import httpx
-import uvicorn
-import sys
-from pathlib import Path
 from enum import Enum
 import json
 
-# Add src directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent))
-
+import metrics
 from location_db_lookup import LocationDBLookup
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from answer_table import AnswerTable
+
+startup_timer.record_imports()
+
+# Loaded in the lifespan, before the app accepts requests
+location_db: Optional[LocationDBLookup] = None
+local_rag_engine = None
+answer_table: Optional["AnswerTable"] = None
+# Upstream client shared by all requests so connections (and their TLS sessions) are reused
+http_client: Optional[httpx.AsyncClient] = None
+
+
+def load_location_db() -> Optional[LocationDBLookup]:
+    """
+    Load the location DB, from the precompiled artifact (LOCATION_DB_ARTIFACT) if
+    set and fresh, otherwise by searching for and parsing the JSON database.
+    """
+    artifact_path = os.getenv("LOCATION_DB_ARTIFACT")
+    if artifact_path:
+        try:
+            db = LocationDBLookup.from_artifact(artifact_path)
+            metrics.record_cache("location_db_artifact", hit=True)
+            return db
+        except Exception as e:
+            metrics.record_cache("location_db_artifact", hit=False)
+            print(f"Warning: Could not load location DB artifact, loading the JSON database: {e}")
+    try:
+        return LocationDBLookup()
+    except FileNotFoundError as e:
+        print(f"Warning: {e}")
+        return None
+
+
+def load_local_rag_engine(db: Optional[LocationDBLookup]):
+    """Initialize the local RAG engine (RAG_BACKEND=local). Falls back to the Sakura RAG API on failure."""
+    if os.getenv("RAG_BACKEND", "sakura") != "local":
+        return None
+    if not db:
+        print("Warning: RAG_BACKEND=local requires the location DB, using Sakura RAG API")
+        return None
+    try:
+        from local_rag import LocalRAGEngine
+
+        return LocalRAGEngine.from_env(db)
+    except Exception as e:
+        print(f"Warning: Could not initialize local RAG engine: {e}")
+        return None
+
+
+def load_answer_table(path: str, db: LocationDBLookup) -> Optional["AnswerTable"]:
+    """Load the precomputed answer table (ANSWER_TABLE_PATH), keeping the answers that are fresh for the DB."""
+    from answer_table import AnswerTable
+
+    try:
+        table = AnswerTable.load(path, db.spots, rag_prompt_hash())
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not load answer table: {e}")
+        return None
+    print(f"Loaded answer table: {path} ({len(table)} answers for {len(table.spots)} spots)")
+    return table
+
+
+def vlm_base_url() -> Optional[str]:
+    """VLM API base URL: VLM_BASE_URL overrides the ngrok endpoint (e.g. a local stand-in for load tests)."""
+    ngrok_domain = os.getenv("NGROK_DOMAIN")
+    base_url = os.getenv("VLM_BASE_URL") or (f"https://{ngrok_domain}" if ngrok_domain else None)
+    return base_url.rstrip("/") if base_url else None
+
+
+def sakura_api_base_url() -> str:
+    """Sakura AI Engine API base URL: SAKURA_API_BASE_URL overrides the API host."""
+    return os.getenv("SAKURA_API_BASE_URL", "https://api.ai.sakura.ad.jp/v1").rstrip("/")
+
+
+async def prewarm_upstreams(client: httpx.AsyncClient) -> None:
+    """
+    Open connections to the upstream APIs so the first request skips DNS, TCP and
+    TLS setup. Any response counts; failures are only logged.
+    """
+    start = time.perf_counter()
+    urls = [url for url in (vlm_base_url(), sakura_api_base_url()) if url]
+
+    async def touch(url: str) -> str:
+        try:
+            response = await client.get(f"{url}/", timeout=5.0)
+            return f"{url} {response.status_code}"
+        except httpx.HTTPError as e:
+            return f"{url} failed ({type(e).__name__})"
+
+    results = await asyncio.gather(*(touch(url) for url in urls))
+    startup_timer.record("prewarm", time.perf_counter() - start)
+    metrics.STARTUP_PHASE_SECONDS.set(startup_timer.phases["prewarm"], phase="prewarm")
+    print(f"Pre-warmed upstream connections in {startup_timer.phases['prewarm'] * 1000:.0f}ms: {', '.join(results)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Load the location DB and the local RAG engine before accepting requests, and
+    open the shared upstream client. With PREWARM_UPSTREAMS=true, upstream
+    connections are opened in the background while the DB loads.
+    """
+    global location_db, local_rag_engine, answer_table, http_client
+
+    http_client = httpx.AsyncClient(
+        # Keep idle connections long enough to span the app's capture interval
+        limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60.0),
+    )
+    prewarm_task = None
+    if os.getenv("PREWARM_UPSTREAMS", "false").lower() == "true":
+        prewarm_task = asyncio.create_task(prewarm_upstreams(http_client))
+
+    with startup_timer.phase("location_db"):
+        location_db = await asyncio.to_thread(load_location_db)
+    if os.getenv("RAG_BACKEND", "sakura") == "local":
+        with startup_timer.phase("local_rag"):
+            local_rag_engine = await asyncio.to_thread(load_local_rag_engine, location_db)
+    answer_table_path = os.getenv("ANSWER_TABLE_PATH")
+    if answer_table_path and location_db:
+        with startup_timer.phase("answer_table"):
+            answer_table = await asyncio.to_thread(load_answer_table, answer_table_path, location_db)
+
+    startup_timer.mark_ready()
+    for name, seconds in startup_timer.phases.items():
+        metrics.STARTUP_PHASE_SECONDS.set(seconds, phase=name)
+    if startup_timer.ready_seconds is not None:
+        metrics.STARTUP_PHASE_SECONDS.set(startup_timer.ready_seconds, phase="ready")
+    print(startup_timer.summary())
+
+    try:
+        yield
+    finally:
+        if prewarm_task:
+            prewarm_task.cancel()
+        await http_client.aclose()
+        http_client = None
+        tracer.close()
+
+
+@asynccontextmanager
+async def upstream_client() -> AsyncIterator[httpx.AsyncClient]:
+    """The shared upstream client, or a one-off client when the lifespan has not run."""
+    if http_client is not None:
+        yield http_client
+    else:
+        async with httpx.AsyncClient() as client:
+            yield client
 
-app = FastAPI()
 
-# Initialize Location DB lookup
-try:
-    location_db = LocationDBLookup()
-except FileNotFoundError as e:
-    print(f"Warning: {e}")
-    location_db = None
+app = FastAPI(lifespan=lifespan)
 
 
 class AgeGroup(str, Enum):
@@ -106,6 +259,56 @@ def health():
     return {"status": "ok"}
 
 
+# Paths of the app's routes, collected on the first request (every route is registered by then)
+route_paths: Optional[frozenset] = None
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Record request duration and in-flight metrics, and attach the stage timings
+    of the request as a `Server-Timing` header (durations in milliseconds).
+
+    The request runs in a server span that continues the client's `traceparent`
+    header if present; its context is returned in a `traceresponse` header.
+    """
+    global route_paths
+    if route_paths is None:
+        route_paths = frozenset(getattr(route, "path", None) for route in app.routes)
+    path = request.url.path if request.url.path in route_paths else "other"
+    timings = metrics.start_request()
+
+    status = 500
+    try:
+        with metrics.HTTP_REQUESTS_IN_FLIGHT.track(path=path), tracer.span(
+            f"{request.method} {path}",
+            traceparent=request.headers.get("traceparent"),
+            attributes={"http.method": request.method, "http.route": path},
+        ) as span:
+            response = await call_next(request)
+            status = response.status_code
+            span.set_attribute("http.status_code", status)
+    finally:
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - timings.start,
+            path=path,
+            method=request.method,
+            status=str(status),
+        )
+
+    response.headers["Server-Timing"] = timings.server_timing()
+    response.headers["traceresponse"] = span.traceparent
+    return response
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 def build_rag_query_prompt(
     caption: str,
     address: str,
@@ -219,20 +422,39 @@ async def query_rag(
     query: str,
     top_k: int = 3,
     threshold: float = 0.3,
+    retrieval_query: Optional[str] = None,
+    candidate_spots: Optional[list[dict]] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
 ) -> Optional[dict]:
     """
-    Query the Sakura AI Engine RAG API.
+    Query the Sakura AI Engine RAG API, or the local RAG engine if enabled.
 
     Args:
         api_token: API token for authentication
         query: Query string
         top_k: Number of top results to retrieve
-        threshold: Similarity threshold for filtering results
+        threshold: Similarity threshold for filtering results (Sakura RAG API only)
+        retrieval_query: Text used for retrieval by the local engine (defaults to query)
+        candidate_spots: Geo top-k spots the local engine restricts retrieval to
+        latitude: User's latitude for the local engine's radius prefilter
+        longitude: User's longitude for the local engine's radius prefilter
 
     Returns:
         Response JSON containing answer and sources, or None if error
     """
-    url = "https://api.ai.sakura.ad.jp/v1/documents/chat/"
+    if local_rag_engine:
+        return await local_rag_engine.query(
+            api_token,
+            query,
+            retrieval_query=retrieval_query,
+            top_k=top_k,
+            candidate_spots=candidate_spots,
+            latitude=latitude,
+            longitude=longitude,
+        )
+
+    url = f"{sakura_api_base_url()}/documents/chat/"
 
     payload = {
         "model": "multilingual-e5-large",
@@ -243,16 +465,19 @@ async def query_rag(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                json=payload,
-                headers={
-                    "Authorization": f"Bearer {api_token}",
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                },
-            )
+        async with upstream_client() as client:
+            with metrics.UPSTREAM_IN_FLIGHT.track(upstream="sakura_rag"):
+                response = await client.post(
+                    url,
+                    json=payload,
+                    timeout=30.0,
+                    headers=tracer.inject({
+                        "Authorization": f"Bearer {api_token}",
+                        "Content-Type": "application/json",
+                        "Accept": "application/json",
+                    }),
+                )
+            metrics.record_upstream("sakura_rag", response.status_code)
 
             if response.status_code == 200:
                 return response.json()
@@ -261,9 +486,11 @@ async def query_rag(
                 print(f"Response: {response.text}")
                 return None
     except httpx.TimeoutException as e:
+        metrics.record_upstream("sakura_rag", "timeout")
         print(f"RAG API timeout: {e}")
         return None
     except httpx.RequestError as e:
+        metrics.record_upstream("sakura_rag", "error")
         print(f"RAG API request error: {e}")
         return None
 
@@ -332,6 +559,85 @@ def parse_rag_response(rag_answer: str, address: str = "") -> tuple[str, str]:
         return address or "Unknown Facility", rag_answer
 
 
+def rag_prompt_hash() -> str:
+    """Hash of the RAG prompt template, so precomputed answers are dropped when the prompt changes."""
+    samples = [
+        build_rag_query_prompt("{caption}", "{address}", "{age}", "{budget}", ["{interest}"], "{activity}", language)
+        for language in ("japanese", "english")
+    ]
+    return hashlib.sha256("\0".join(samples).encode("utf-8")).hexdigest()
+
+
+async def generate_spot_guide(
+    api_token: str, spot: dict, profile: dict, language: str
+) -> Optional[tuple[str, str]]:
+    """
+    Generate the RAG guide for a spot as if a photo of it had been taken there,
+    using the spot's description in place of the VLM caption.
+
+    Args:
+        api_token: API token for the RAG API
+        spot: Tourist spot record
+        profile: User profile form fields (user_age_group, user_budget_level, user_interests, user_activity_level)
+        language: User language
+
+    Returns:
+        Tuple of (facility_name, guide_description), or None if the RAG query failed
+    """
+    address = spot.get("address", "")
+    caption = spot.get("description", spot["name"])
+    rag_query = build_rag_query_prompt(
+        caption=caption,
+        address=address,
+        user_age_group=profile.get("user_age_group"),
+        user_budget_level=profile.get("user_budget_level"),
+        user_interests=profile.get("user_interests"),
+        user_activity_level=profile.get("user_activity_level"),
+        user_language=language,
+    )
+    # No coordinates: the local engine's radius prefilter would widen retrieval to every nearby spot
+    rag_response = await query_rag(
+        api_token,
+        rag_query,
+        retrieval_query=f"{address} {spot['name']}",
+        candidate_spots=[spot],
+    )
+    if not rag_response or "answer" not in rag_response:
+        return None
+    if not sources_belong_to_spot(rag_response.get("sources", []), spot):
+        print(f"RAG guide for {spot['name']} was built from passages about other spots, not storing it")
+        return None
+    return parse_rag_response(rag_response["answer"], address)
+
+
+def sources_belong_to_spot(sources: list[dict], spot: dict) -> bool:
+    """
+    Check that every retrieved passage is about the spot (the document is named after
+    it, or the passage's name line is the spot's), so a stored guide never quotes
+    another spot.
+    """
+    name_line = f"名前: {spot['name']}"
+    return all(
+        source.get("document", {}).get("name") == spot["name"]
+        or source.get("content", "").startswith(name_line + "\n")
+        or source.get("content", "") == name_line
+        for source in sources
+    )
+
+
+def location_is_confident(top_k_spots: list[dict]) -> bool:
+    """
+    Whether the nearest spot is the only one within ANSWER_TABLE_SKIP_VLM_RADIUS_M,
+    so its precomputed answer can be served without asking the VLM (0 disables).
+    """
+    radius_km = float(os.getenv("ANSWER_TABLE_SKIP_VLM_RADIUS_M", 0)) / 1000
+    if radius_km <= 0 or not top_k_spots:
+        return False
+    return top_k_spots[0]["distance_km"] <= radius_km and (
+        len(top_k_spots) < 2 or top_k_spots[1]["distance_km"] > radius_km
+    )
+
+
 class VLMAgentResponse(BaseModel):
     """
     Response model for VLM inference with RAG-enhanced tourism guide generation.
@@ -454,9 +760,20 @@ async def vlm_inference(
     repetition_penalty: Optional[float] = Form(  # noqa: B008
         1.05, description="Repetition penalty for VLM generation (>1.0 discourages repetition). Used in VLM API calls only."
     ),
+    max_sentences: Optional[int] = Form(  # noqa: B008
+        None,
+        description="Stop VLM generation after this many sentences or lines (0: off). "
+        "Defaults to VLM_MAX_SENTENCES (3, matching the default prompt) when text is omitted.",
+    ),
+    stop: Optional[list[str]] = Form(  # noqa: B008
+        None, description="Stop strings for VLM generation; the output ends before the first one."
+    ),
 ):
-    ngrok_domain = os.getenv("NGROK_DOMAIN")
-    if not ngrok_domain:
+    mode = "custom" if text is not None else "rag"
+    metrics.set_mode(mode)
+
+    vlm_url = vlm_base_url()
+    if not vlm_url:
         raise HTTPException(
             status_code=500, detail="NGROK_DOMAIN environment variable not set"
         )
@@ -468,7 +785,8 @@ async def vlm_inference(
             detail="SAKURA_OPENAI_API_TOKEN environment variable not set",
         )
 
-    image_data = await image.read()
+    with metrics.stage("upload_read"):
+        image_data = await image.read()
 
     # VLMの呼び出し用テキストを準備
     vlm_prompt = text or "画像中のランドマークについて、3行程度で具体的に説明してください。"
@@ -477,10 +795,39 @@ async def vlm_inference(
     top_k_spots = []
     if location_db:
         try:
-            top_k_spots = location_db.find_top_k(latitude, longitude)
+            with metrics.stage("find_top_k"):
+                top_k_spots = location_db.find_top_k(latitude, longitude)
         except Exception as e:
             print(f"Error looking up top-k spots: {e}")
 
+    # The precomputed answer table applies to the default prompt at a known spot
+    answer_key = None
+    if answer_table and text is None and top_k_spots:
+        from answer_table import caption_mentions_spot, profile_key
+
+        answer_key = profile_key(
+            {
+                "user_age_group": user_age_group.value if user_age_group else None,
+                "user_budget_level": user_budget_level.value if user_budget_level else None,
+                "user_interests": [interest.value for interest in user_interests] if user_interests else None,
+                "user_activity_level": user_activity_level.value if user_activity_level else None,
+            },
+            user_language.value,
+        )
+        # Right at an isolated spot, skip the VLM as well
+        if location_is_confident(top_k_spots):
+            answer = answer_table.get(top_k_spots[0]["name"], answer_key)
+            if answer:
+                print(f"Serving precomputed answer for {top_k_spots[0]['name']} (VLM skipped)")
+                metrics.INFERENCE_REQUESTS.inc(mode=mode, result="answer_table")
+                return VLMAgentResponse(
+                    name=answer[0],
+                    facility_description=answer[1],
+                    success=True,
+                    error_message=None,
+                )
+            answer_key = None  # same spot and key below, no need to look it up again
+
     # VLM用プロンプトを作成
     if top_k_spots:
         k_count = len(top_k_spots)
@@ -496,7 +843,7 @@ async def vlm_inference(
         vlm_prompt = f"あなたは今、{address}にいます。\n" + vlm_prompt
     print("VLM Prompt:", vlm_prompt)
 
-    async with httpx.AsyncClient(timeout=300.0) as client:
+    async with upstream_client() as client:
         files = {"image": (image.filename, image_data, image.content_type)}
         data = {
             "text": vlm_prompt,
@@ -504,16 +851,36 @@ async def vlm_inference(
             "top_p": top_p,
             "max_new_tokens": max_new_tokens,
             "repetition_penalty": repetition_penalty,
+            # The default prompt is Japanese; custom text output goes straight to the user
+            "language": user_language.value if text is not None else Language.JAPANESE.value,
         }
+        # Stop decoding once the caption has the lines the prompt asks for
+        if max_sentences is None and text is None:
+            max_sentences = int(os.getenv("VLM_MAX_SENTENCES", 3))
+        if max_sentences is not None:
+            data["max_sentences"] = max_sentences
+        if stop:
+            data["stop"] = stop
 
         # VLM APIの呼び出し
-        response = await client.post(
-            f"https://{ngrok_domain}/inference",
-            files=files,
-            data=data,
-        )
+        try:
+            with metrics.stage("vlm_post"), metrics.UPSTREAM_IN_FLIGHT.track(upstream="vlm"):
+                # Forward the trace context so the VLM server's spans join this trace
+                response = await client.post(
+                    f"{vlm_url}/inference",
+                    files=files,
+                    data=data,
+                    headers=tracer.inject(),
+                    timeout=300.0,
+                )
+        except httpx.HTTPError as e:
+            metrics.record_upstream("vlm", "timeout" if isinstance(e, httpx.TimeoutException) else "error")
+            metrics.INFERENCE_REQUESTS.inc(mode=mode, result="vlm_error")
+            raise
+        metrics.record_upstream("vlm", response.status_code)
 
         if response.status_code != 200:
+            metrics.INFERENCE_REQUESTS.inc(mode=mode, result="vlm_error")
             raise HTTPException(
                 status_code=response.status_code,
                 detail="External inference service error",
@@ -525,6 +892,7 @@ async def vlm_inference(
         # ユーザーがカスタムテキスト指示を入力している場合はRAGをスキップ
         if text is not None:
             print("Custom text instruction provided, skipping RAG")
+            metrics.INFERENCE_REQUESTS.inc(mode=mode, result="ok")
             return VLMAgentResponse(
                 name=address,
                 facility_description=vlm_caption,
@@ -532,6 +900,19 @@ async def vlm_inference(
                 error_message=None,
             )
 
+        # VLMが最寄りの観光地を認識した場合は事前計算済みのガイドを返す
+        if answer_key and caption_mentions_spot(vlm_caption, top_k_spots[0]["name"]):
+            answer = answer_table.get(top_k_spots[0]["name"], answer_key)
+            if answer:
+                print(f"Serving precomputed answer for {top_k_spots[0]['name']}")
+                metrics.INFERENCE_REQUESTS.inc(mode=mode, result="answer_table")
+                return VLMAgentResponse(
+                    name=answer[0],
+                    facility_description=answer[1],
+                    success=True,
+                    error_message=None,
+                )
+
         # textがNoneの場合(デフォルトプロンプト)はRAG処理を実行
         print("Using RAG for tourism guide generation")
 
@@ -553,13 +934,23 @@ async def vlm_inference(
         print("RAG Query:", rag_query)
 
         # RAG APIを呼び出し
-        rag_response = await query_rag(sakura_token, rag_query)
+        with metrics.stage("query_rag"):
+            rag_response = await query_rag(
+                sakura_token,
+                rag_query,
+                retrieval_query=f"{address} {vlm_caption}",
+                candidate_spots=top_k_spots,
+                latitude=latitude,
+                longitude=longitude,
+            )
 
         if rag_response and "answer" in rag_response:
             guide_text = rag_response["answer"]
             # Parse RAG response to extract facility name and description
             # Use address as fallback for facility name when facility is unrecognized
-            facility_name, facility_description = parse_rag_response(guide_text, address)
+            with metrics.stage("parse_rag_response"):
+                facility_name, facility_description = parse_rag_response(guide_text, address)
+            metrics.INFERENCE_REQUESTS.inc(mode=mode, result="ok")
             return VLMAgentResponse(
                 name=facility_name,
                 facility_description=facility_description,
@@ -569,6 +960,7 @@ async def vlm_inference(
         else:
             # RAGが失敗した場合はVLMの出力を返す
             print("RAG query failed, returning VLM output")
+            metrics.INFERENCE_REQUESTS.inc(mode=mode, result="rag_fallback")
             return VLMAgentResponse(
                 name=address,
                 facility_description=vlm_caption,
@@ -0,0 +1,294 @@
+"""
+Metrics Module
+
+This module provides in-process request metrics for the AI backend without
+extra dependencies. Counters, gauges and histograms are kept in memory and
+rendered in the Prometheus text exposition format by the `/metrics`
+endpoint. Each request also collects its own stage timings (upload read,
+geo lookup, VLM call, RAG query, parsing, ...) which are observed into the
+per-stage histograms and sent back to the client in a `Server-Timing`
+response header.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tracing import tracer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, one series per label combination."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (e.g. requests in flight)."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        """Increment the gauge while the block runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds (seconds by default)."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, inf)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together by `/metrics`."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "aibackend_http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ("path", "method", "status"),
+))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "aibackend_http_requests_in_flight",
+    "HTTP requests currently being handled.",
+    ("path",),
+))
+INFERENCE_REQUESTS = REGISTRY.register(Counter(
+    "aibackend_inference_requests_total",
+    "Inference requests by mode (rag: default prompt, custom: custom text) and result.",
+    ("mode", "result"),
+))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "aibackend_stage_duration_seconds",
+    "Time spent in each inference stage.",
+    ("stage", "mode"),
+))
+UPSTREAM_RESPONSES = REGISTRY.register(Counter(
+    "aibackend_upstream_responses_total",
+    "Upstream calls by upstream service and HTTP status (or timeout/error).",
+    ("upstream", "status"),
+))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "aibackend_upstream_requests_in_flight",
+    "Upstream calls currently waiting for a response.",
+    ("upstream",),
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "aibackend_cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"),
+))
+STARTUP_PHASE_SECONDS = REGISTRY.register(Gauge(
+    "aibackend_startup_phase_seconds",
+    "Duration of each startup phase of this process (ready: process start to accepting requests).",
+    ("phase",),
+))
+
+
+class RequestTimings:
+    """Stage timings collected for one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.mode = "none"
+        self.stages: List[Tuple[str, float]] = []
+
+    def server_timing(self) -> str:
+        """Format the timings as a `Server-Timing` header value (milliseconds)."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request() -> RequestTimings:
+    """Start collecting stage timings for the current request."""
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def set_mode(mode: str) -> None:
+    """Set the inference mode label ("rag" or "custom") used for the current request's stages."""
+    timings = _current_timings.get()
+    if timings:
+        timings.mode = mode
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a block as an inference stage.
+
+    The duration is observed into the stage histogram and, inside a request,
+    added to the request's `Server-Timing` header. The block also runs in a
+    tracing span of the same name.
+    """
+    timings = _current_timings.get()
+    mode = timings.mode if timings else "none"
+    start = time.perf_counter()
+    try:
+        with tracer.span(name, attributes={"mode": mode}):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, stage=name, mode=mode)
+        if timings:
+            timings.stages.append((name, elapsed))
+
+
+def record_upstream(upstream: str, status: object) -> None:
+    """Count an upstream response by HTTP status code, or "timeout"/"error"."""
+    UPSTREAM_RESPONSES.inc(upstream=upstream, status=str(status))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup."""
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
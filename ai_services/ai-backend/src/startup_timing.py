@@ -0,0 +1,92 @@
+"""
+Startup Timing Module
+
+This module records where the backend's cold start goes: the time from process
+start until `main` is imported (interpreter and server startup), the module
+imports, and each lifespan phase (location DB, local RAG engine, upstream
+connection pre-warming). The breakdown is printed once the app is ready,
+checked against STARTUP_BUDGET_MS and exported as a gauge on `/metrics`,
+so cold starts on a scale-to-zero platform can be kept under a budget.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+def process_age_seconds() -> Optional[float]:
+    """Seconds since this process started, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Fields after the command name; starttime is field 22 (clock ticks since boot)
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupTimer:
+    """Durations of the startup phases, in the order they were recorded."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ready_seconds: Optional[float] = None
+        # Set when this module is imported, which `main` does before its other imports
+        self.started = time.perf_counter()
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+
+    def record_imports(self) -> None:
+        """
+        Record the imports since this timer was created, and the time before them
+        (interpreter and server startup) when the process age is known.
+        """
+        imports = time.perf_counter() - self.started
+        process_age = process_age_seconds()
+        if process_age is not None:
+            self.record("before_main", max(process_age - imports, 0.0))
+        self.record("imports", imports)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block as a startup phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self) -> None:
+        """Record the process age when the app starts serving (None if unknown)."""
+        self.ready_seconds = process_age_seconds()
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "ready_ms": round(self.ready_seconds * 1000, 1) if self.ready_seconds is not None else None,
+            "budget_ms": startup_budget_ms(),
+        }
+
+    def summary(self) -> str:
+        """One-line breakdown, flagged when the time to ready exceeds the budget."""
+        parts = [f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items()]
+        line = "Startup: " + ", ".join(parts)
+        if self.ready_seconds is not None:
+            line += f" | ready {self.ready_seconds * 1000:.0f}ms after process start"
+            budget = startup_budget_ms()
+            if budget and self.ready_seconds * 1000 > budget:
+                line += f" (over the {budget:.0f}ms budget)"
+        return line
+
+
+def startup_budget_ms() -> Optional[float]:
+    """STARTUP_BUDGET_MS, or None if unset."""
+    value = os.getenv("STARTUP_BUDGET_MS")
+    return float(value) if value else None
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Concurrent, resumable bulk uploader for Sakura AI Engine RAG documents.
+
+Documents are uploaded by a bounded worker pool under a shared rate limit.
+Multipart bodies are streamed part by part (no temp files, no repeated
+bytes concatenation), and a manifest of content hash -> document ID is
+saved after every batch so that reruns only upload new or changed
+documents.
+
+The manifest also drives incremental sync: the current spot DB is diffed
+against it to plan adds, updates and deletes, so sync time and API cost
+scale with what changed rather than with the size of the DB.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from http.client import HTTPException
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'https://api.ai.sakura.ad.jp/v1'
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Statuses where the server did not process the request, so a non-idempotent upload can be resent
+# (after 500/502/504 or a network error the document may already have been created)
+UPLOAD_RETRYABLE_STATUS = {429, 503}
+
+
+def get_base_url():
+    """Return the RAG API base URL (overridable for local mock servers)."""
+    return os.environ.get('SAKURA_API_BASE_URL', DEFAULT_BASE_URL).rstrip('/')
+
+
+def content_hash(text):
+    """Return the SHA-256 hex digest of a document's text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces requests at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        """Block until the next request slot is available."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time)
+            self._next_time = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class MultipartBody:
+    """
+    Iterable multipart/form-data body for a single text file.
+
+    urllib sends iterable request data chunk by chunk when Content-Length is
+    given, so the body is never assembled into one buffer.
+    """
+
+    def __init__(self, file_name, file_data, content_type='text/plain'):
+        self.boundary = '----RagMakerBoundary' + os.urandom(16).hex()
+        self._parts = [
+            (
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'
+            ).encode(),
+            file_data,
+            f'\r\n--{self.boundary}--\r\n'.encode(),
+        ]
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+    def __iter__(self):
+        return iter(self._parts)
+
+
+class Manifest:
+    """
+    Persistent record of uploaded documents keyed by content hash.
+
+    Each entry stores the document ID plus the spot key and file name it was
+    uploaded for. The file is rewritten atomically after every batch of
+    changes so an interrupted run can resume where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('documents', {})
+            logger.info(f"Loaded manifest with {len(self.entries)} documents: {path}")
+
+    def __contains__(self, digest):
+        return digest in self.entries
+
+    def get(self, digest):
+        return self.entries.get(digest)
+
+    def record(self, digest, document_id, spot_key, file_name):
+        """Add an uploaded document (persisted on the next `save`)."""
+        with self._lock:
+            self.entries[digest] = {
+                'document_id': document_id,
+                'spot_key': spot_key,
+                'file_name': file_name,
+                'uploaded_at': datetime.now(timezone.utc).isoformat(),
+            }
+
+    def remove(self, digest):
+        """Remove a document entry (persisted on the next `save`)."""
+        with self._lock:
+            self.entries.pop(digest, None)
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'documents': self.entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def _send_with_retry(make_request, label, retries=3, backoff=1.0, idempotent=True):
+    """
+    Send a request, retrying on 429/5xx and network errors.
+
+    Args:
+        make_request: Callable returning a fresh urllib Request for every attempt
+        label: Description of the request for log messages
+        retries: Number of retries after the first attempt
+        backoff: Base delay in seconds, doubled after every retry
+        idempotent: If False, only retry on UPLOAD_RETRYABLE_STATUS, never after
+            a network error or timeout
+
+    Returns:
+        Tuple of (HTTP status or None on network failure, response JSON or None)
+    """
+    retryable_status = RETRYABLE_STATUS if idempotent else UPLOAD_RETRYABLE_STATUS
+    for attempt in range(retries + 1):
+        try:
+            with urlopen(make_request(), timeout=30) as response:
+                response_data = response.read().decode('utf-8')
+                return response.status, json.loads(response_data) if response_data else None
+        except HTTPError as e:
+            error_body = e.read().decode('utf-8', errors='replace')
+            if e.code not in retryable_status or attempt == retries:
+                logger.error(f"HTTP Error {e.code} {label}: {e.reason}")
+                logger.debug(f"Error response: {error_body}")
+                return e.code, None
+            logger.warning(f"HTTP {e.code} {label}, retrying ({attempt + 1}/{retries})")
+        except (OSError, HTTPException) as e:
+            # URLError, and errors while reading the body, which are not wrapped in URLError:
+            # TimeoutError on a read timeout, IncompleteRead when the connection drops
+            reason = e.reason if isinstance(e, URLError) else e
+            if not idempotent or attempt == retries:
+                logger.error(f"Network error {label}: {reason}")
+                return None, None
+            logger.warning(f"Network error {label}: {reason}, retrying ({attempt + 1}/{retries})")
+
+        time.sleep(backoff * (2 ** attempt))
+
+    return None, None
+
+
+def upload_document(api_token, file_name, text, base_url=None):
+    """
+    Upload a single text document.
+
+    Args:
+        api_token: API token for authentication
+        file_name: Name of the file for the API
+        text: Document text
+        base_url: RAG API base URL (default: SAKURA_API_BASE_URL or Sakura production)
+
+    Returns:
+        Response JSON, or None if the upload failed
+    """
+    url = f"{base_url or get_base_url()}/documents/upload/"
+    file_data = text.encode('utf-8')
+
+    def make_request():
+        body = MultipartBody(file_name, file_data)
+        return Request(
+            url,
+            data=body,
+            headers={
+                'Authorization': f'Bearer {api_token}',
+                'Accept': 'application/json',
+                'Content-Type': body.content_type,
+                'Content-Length': str(len(body)),
+            },
+            method='POST'
+        )
+
+    _, response = _send_with_retry(make_request, f"uploading {file_name}", idempotent=False)
+    return response
+
+
+def delete_document(api_token, document_id, base_url=None):
+    """
+    Delete a document from the RAG database.
+
+    Returns:
+        True if the document was deleted or no longer exists
+    """
+    url = f"{base_url or get_base_url()}/documents/{document_id}/"
+
+    def make_request():
+        return Request(
+            url,
+            headers={
+                'Authorization': f'Bearer {api_token}',
+                'Accept': 'application/json',
+            },
+            method='DELETE'
+        )
+
+    status, _ = _send_with_retry(make_request, f"deleting {document_id}")
+    return status is not None and (200 <= status < 300 or status == 404)
+
+
+class SyncPlan:
+    """Difference between the current documents and the manifest."""
+
+    def __init__(self, add, update, delete, unchanged):
+        """
+        Args:
+            add: Documents for spots that are not in the manifest
+            update: Documents whose spot is in the manifest with a different content hash
+            delete: Manifest entries (with 'hash') to delete: removed spots and
+              the previous versions of updated spots
+            unchanged: Documents whose content hash is already in the manifest
+        """
+        self.add = add
+        self.update = update
+        self.delete = delete
+        self.unchanged = unchanged
+
+    def summary(self):
+        """Return the plan as add/update/delete/unchanged counts."""
+        return {
+            'add': len(self.add),
+            'update': len(self.update),
+            'delete': len(self.delete),
+            'unchanged': len(self.unchanged),
+        }
+
+
+def plan_sync(documents, manifest):
+    """
+    Diff the current documents against the manifest.
+
+    Documents are matched to manifest entries by spot key; a different content
+    hash means the spot was updated. Manifest entries whose spot no longer
+    exists, or whose content was replaced, are deleted.
+
+    Args:
+        documents: List of dicts with spot_key, file_name and text
+        manifest: Manifest of uploaded documents
+
+    Returns:
+        SyncPlan
+    """
+    entries_by_key = {}
+    for digest, entry in manifest.entries.items():
+        entries_by_key.setdefault(entry['spot_key'], []).append(dict(entry, hash=digest))
+
+    add, update, unchanged = [], [], []
+    current_hashes = set()
+    for document in documents:
+        document['hash'] = content_hash(document['text'])
+        current_hashes.add(document['hash'])
+        if document['hash'] in manifest:
+            unchanged.append(document)
+        elif document['spot_key'] in entries_by_key:
+            update.append(document)
+        else:
+            add.append(document)
+
+    delete = [
+        entry
+        for entries in entries_by_key.values()
+        for entry in entries
+        if entry['hash'] not in current_hashes
+    ]
+    return SyncPlan(add, update, delete, unchanged)
+
+
+class BulkUploader:
+    """Upload and delete many documents concurrently, keeping the manifest in sync."""
+
+    def __init__(self, api_token, manifest, max_workers=4, rate=5.0, base_url=None, batch_size=50):
+        """
+        Args:
+            api_token: API token for authentication
+            manifest: Manifest of already uploaded documents
+            max_workers: Maximum number of concurrent requests
+            rate: Maximum number of requests per second across all workers (0 = unlimited)
+            base_url: RAG API base URL
+            batch_size: Number of requests per batch; the manifest is saved after each batch
+        """
+        self.api_token = api_token
+        self.manifest = manifest
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate)
+        self.base_url = base_url or get_base_url()
+        self.batch_size = max(batch_size, 1)
+
+    def _upload_one(self, document):
+        self.rate_limiter.wait()
+        response = upload_document(
+            self.api_token, document['file_name'], document['text'], self.base_url
+        )
+        result = {
+            'spot_name': document['spot_key'],
+            'file_name': document['file_name'],
+            'success': bool(response),
+        }
+        if response:
+            self.manifest.record(
+                document['hash'], response.get('id'), document['spot_key'], document['file_name']
+            )
+            result.update({'document_id': response.get('id'), 'status': response.get('status')})
+        return result
+
+    def _delete_one(self, entry):
+        self.rate_limiter.wait()
+        success = delete_document(self.api_token, entry['document_id'], self.base_url)
+        if success:
+            self.manifest.remove(entry['hash'])
+        return {
+            'spot_name': entry['spot_key'],
+            'file_name': entry['file_name'],
+            'document_id': entry['document_id'],
+            'success': success,
+        }
+
+    def _run_batched(self, func, items, action):
+        """Run func over items in batches on the worker pool, saving the manifest per batch."""
+        results = []
+        if not items:
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                futures = [executor.submit(func, item) for item in batch]
+                try:
+                    for future in as_completed(futures):
+                        result = future.result()
+                        results.append(result)
+                        mark = '✓' if result['success'] else '✗'
+                        logger.info(f"[{action} {len(results)}/{len(items)}] {mark} {result['file_name']}")
+                finally:
+                    # Keep what this batch recorded even if a worker raised, so a rerun does not upload it again
+                    self.manifest.save()
+
+        return results
+
+    def upload_all(self, documents):
+        """
+        Upload documents that are not in the manifest yet.
+
+        Args:
+            documents: List of dicts with spot_key, file_name and text
+
+        Returns:
+            List of result dicts. Documents found in the manifest are reported
+            with skipped=True and their recorded document ID.
+        """
+        results = []
+        pending = []
+        for document in documents:
+            document['hash'] = content_hash(document['text'])
+            entry = self.manifest.get(document['hash'])
+            if entry:
+                results.append({
+                    'spot_name': document['spot_key'],
+                    'file_name': document['file_name'],
+                    'document_id': entry['document_id'],
+                    'success': True,
+                    'skipped': True,
+                })
+            else:
+                pending.append(document)
+
+        logger.info(
+            f"{len(pending)} documents to upload, {len(results)} unchanged "
+            f"(workers={self.max_workers})"
+        )
+        results.extend(self._run_batched(self._upload_one, pending, 'upload'))
+        return results
+
+    def sync(self, plan):
+        """
+        Apply a sync plan: upload added/updated documents, then delete stale ones.
+
+        Uploads run first so an updated spot is never missing from the index.
+        The previous version of an updated spot is deleted only if its new
+        version was uploaded.
+
+        Args:
+            plan: SyncPlan from plan_sync
+
+        Returns:
+            Dict with 'uploaded' and 'deleted' result lists
+        """
+        uploaded = self._run_batched(self._upload_one, plan.add + plan.update, 'upload')
+
+        failed_keys = {result['spot_name'] for result in uploaded if not result['success']}
+        deletions = [entry for entry in plan.delete if entry['spot_key'] not in failed_keys]
+        deleted = self._run_batched(self._delete_one, deletions, 'delete')
+
+        return {'uploaded': uploaded, 'deleted': deleted}
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Sakura AI Engine documents API for offline runs.
+
+Implements the endpoints used by rag_maker so scripts can be exercised
+without an API token or network access:
+
+    POST   /v1/documents/upload/   multipart upload, returns a document record
+    DELETE /v1/documents/{id}/     delete a document
+    POST   /v1/documents/chat/     lexical retrieval over stored documents
+
+Retrieval uses character-bigram overlap instead of embeddings, so distances
+are only comparable between mock runs, not with the real API.
+
+Usage:
+    python3 ai_services/rag_maker/mock_sakura_server.py --port 8765 --db GinzaDB/ginzaDB.json
+    export SAKURA_API_BASE_URL=http://127.0.0.1:8765/v1
+    export SAKURA_OPENAI_API_TOKEN=dummy
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class MockDocumentStore:
+    """In-memory document store shared by all request handlers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = {}
+
+    def add(self, name, content):
+        document = {
+            'id': str(uuid.uuid4()),
+            'status': 'available',
+            'content': content,
+            'name': name,
+            'tags': [],
+            'model': 'multilingual-e5-large',
+        }
+        with self._lock:
+            self.documents[document['id']] = document
+        return document
+
+    def delete(self, document_id):
+        with self._lock:
+            return self.documents.pop(document_id, None) is not None
+
+    def search(self, query, top_k, threshold):
+        """Rank documents by bigram overlap; keep those with similarity >= threshold."""
+        query_grams = _bigrams(query)
+        with self._lock:
+            documents = list(self.documents.values())
+
+        scored = []
+        for document in documents:
+            doc_grams = _bigrams(document['content'])
+            if not query_grams or not doc_grams:
+                continue
+            similarity = len(query_grams & doc_grams) / len(query_grams)
+            if similarity >= threshold:
+                scored.append((1.0 - similarity, document))
+        scored.sort(key=lambda item: item[0])
+
+        return [
+            {
+                'document': {
+                    'id': document['id'],
+                    'status': document['status'],
+                    'name': document['name'],
+                    'model': document['model'],
+                },
+                'chunk_index': 0,
+                'distance': round(distance, 4),
+                'content': document['content'],
+            }
+            for distance, document in scored[:top_k]
+        ]
+
+
+def _bigrams(text):
+    normalized = re.sub(r'\s+|[、。？！?!「」]', '', text.lower())
+    return {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+
+
+def parse_multipart_file(body, content_type):
+    """Extract (filename, text) of the first file part from a multipart body."""
+    match = re.search(r'boundary=(.+)', content_type or '')
+    if not match:
+        return None, None
+    boundary = match.group(1).strip('"').encode()
+    for part in body.split(b'--' + boundary):
+        head, sep, data = part.partition(b'\r\n\r\n')
+        if not sep:
+            continue
+        name_match = re.search(rb'filename="([^"]*)"', head)
+        if name_match:
+            if data.endswith(b'\r\n'):
+                data = data[:-2]
+            return name_match.group(1).decode('utf-8'), data.decode('utf-8')
+    return None, None
+
+
+def make_handler(store, latency=0.0, error_rate=0.0):
+    """Create a request handler class bound to a store and failure settings."""
+
+    class MockSakuraHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _simulate(self):
+            """Apply artificial latency and errors. Returns False if the request failed."""
+            if latency:
+                time.sleep(latency)
+            if error_rate and random.random() < error_rate:
+                self._send_json(503, {'detail': 'Simulated failure'})
+                return False
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                self._send_json(401, {'detail': 'Unauthorized'})
+                return False
+            return True
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length)
+            if not self._simulate():
+                return
+
+            if self.path.rstrip('/') == '/v1/documents/upload':
+                name, content = parse_multipart_file(body, self.headers.get('Content-Type'))
+                if name is None:
+                    self._send_json(415, {'detail': 'Unsupported Media Type'})
+                    return
+                self._send_json(201, store.add(name, content))
+            elif self.path.rstrip('/') == '/v1/documents/chat':
+                payload = json.loads(body or b'{}')
+                sources = store.search(
+                    payload.get('query', ''),
+                    int(payload.get('top_k', 3)),
+                    float(payload.get('threshold', 0.0)),
+                )
+                names = [source['content'].splitlines()[0] for source in sources]
+                answer = '参考文書: ' + ', '.join(names) if names else '該当する情報が見つかりませんでした。'
+                self._send_json(200, {'answer': answer, 'sources': sources})
+            else:
+                self._send_json(404, {'detail': 'Not Found'})
+
+        def do_DELETE(self):
+            if not self._simulate():
+                return
+
+            match = re.fullmatch(r'/v1/documents/([^/]+)/?', self.path)
+            if match and store.delete(match.group(1)):
+                self.send_response(204)
+                self.end_headers()
+            else:
+                self._send_json(404, {'detail': 'Not Found'})
+
+    return MockSakuraHandler
+
+
+def preload_documents(store, db_path):
+    """Load a spot DB into the store using the same document format as step1."""
+    from step1_upload_documents import build_documents, extract_tourist_spots, load_ginza_db
+
+    for document in build_documents(extract_tourist_spots(load_ginza_db(db_path))):
+        store.add(document['file_name'], document['text'])
+    logger.info(f"Preloaded {len(store.documents)} documents from {db_path}")
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, db_path=None):
+    """
+    Start the mock server in a background thread.
+
+    Returns:
+        Tuple of (server, store). The bound port is server.server_address[1].
+    """
+    store = MockDocumentStore()
+    if db_path:
+        preload_documents(store, db_path)
+    server = ThreadingHTTPServer((host, port), make_handler(store, latency, error_rate))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, store
+
+
+def main():
+    """Run the mock server in the foreground."""
+    parser = argparse.ArgumentParser(description='Mock Sakura AI Engine documents API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial latency per request (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--db', help='Spot DB to preload as documents (GinzaDB or makeDB format)')
+    args = parser.parse_args()
+
+    store = MockDocumentStore()
+    if args.db:
+        preload_documents(store, args.db)
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(store, args.latency, args.error_rate)
+    )
+    logger.info(f"Mock Sakura API listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
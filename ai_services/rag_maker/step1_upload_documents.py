@@ -2,15 +2,22 @@
 """
 Step 1: Upload GinzaDB documents to Sakura AI Engine RAG
 This script uploads the ginzaDB.json file to Sakura AI Engine's RAG database.
+
+Documents are uploaded concurrently under a rate limit. A manifest of content
+hashes -> document IDs is kept so that reruns only upload new or changed spots.
+
+With --sync, the spot DB (e.g. a makeDB `*_tourist_spots.json`) is diffed
+against the manifest: added and changed spots are uploaded, and removed spots
+and replaced versions are deleted.
 """
 
+import argparse
 import json
 import os
 import sys
 import logging
-import tempfile
-from urllib.request import Request, urlopen
-from urllib.error import URLError, HTTPError
+
+from bulk_uploader import BulkUploader, Manifest, plan_sync
 
 # Set up logging
 logging.basicConfig(
@@ -36,7 +43,7 @@ def load_ginza_db(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         logger.info(f"Successfully loaded GinzaDB from {file_path}")
-        logger.info(f"Found {len(data.get('ginza_tourist_spots', []))} tourist spots")
+        logger.info(f"Found {len(extract_tourist_spots(data))} tourist spots")
         return data
     except FileNotFoundError:
         logger.error(f"File not found: {file_path}")
@@ -46,6 +53,21 @@ def load_ginza_db(file_path):
         sys.exit(1)
 
 
+def extract_tourist_spots(data):
+    """
+    Return the spot list from a GinzaDB-style dict or a makeDB output list.
+
+    GinzaDB wraps the spots in a `ginza_tourist_spots` key, while makeDB
+    writes `{region}_tourist_spots.json` files containing a bare list.
+    """
+    if isinstance(data, list):
+        return data
+    for key, value in data.items():
+        if key.endswith('tourist_spots') and isinstance(value, list):
+            return value
+    return []
+
+
 def format_document_text(spot):
     """Format a tourist spot as document text for RAG."""
     text = f"""名前: {spot.get('name', 'N/A')}
@@ -56,71 +78,49 @@ def format_document_text(spot):
     return text.strip()
 
 
-def upload_file(api_token, file_path, file_name):
-    """
-    Upload a single file to Sakura AI Engine RAG.
+def parse_args():
+    """Parse command line arguments."""
+    default_dir = os.path.dirname(__file__)
+    parser = argparse.ArgumentParser(description='Upload GinzaDB documents to Sakura AI Engine RAG')
+    parser.add_argument(
+        '--db', default=os.path.join(default_dir, '../../GinzaDB/ginzaDB.json'),
+        help='Tourist spots database JSON file'
+    )
+    parser.add_argument(
+        '--manifest', default=os.path.join(default_dir, 'upload_manifest.json'),
+        help='Manifest of uploaded documents used to skip unchanged spots on rerun'
+    )
+    parser.add_argument('--workers', type=int, default=4, help='Number of concurrent uploads')
+    parser.add_argument('--rate', type=float, default=5.0, help='Maximum requests per second (0 = unlimited)')
+    parser.add_argument(
+        '--batch-size', type=int, default=50,
+        help='Requests per batch; the manifest is saved after each batch'
+    )
+    parser.add_argument(
+        '--sync', action='store_true',
+        help='Diff the DB against the manifest: upload added/changed spots and delete removed ones'
+    )
+    parser.add_argument('--dry-run', action='store_true', help='With --sync, print the plan and exit')
+    return parser.parse_args()
 
-    Args:
-        api_token: API token for authentication
-        file_path: Path to the file to upload
-        file_name: Name of the file for the API
-    """
-    url = "https://api.ai.sakura.ad.jp/v1/documents/upload/"
 
-    try:
-        logger.info(f"Uploading file: {file_name}")
-
-        # Read file
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-
-        # Create multipart form data manually
-        boundary = '----WebKitFormBoundary' + os.urandom(16).hex()
-        body = b''
-        body += f'--{boundary}\r\n'.encode()
-        body += f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'.encode()
-        body += b'Content-Type: text/plain\r\n\r\n'
-        body += file_data
-        body += b'\r\n'
-        body += f'--{boundary}--\r\n'.encode()
-
-        req = Request(
-            url,
-            data=body,
-            headers={
-                'Authorization': f'Bearer {api_token}',
-                'Accept': 'application/json',
-                'Content-Type': f'multipart/form-data; boundary={boundary}'
-            },
-            method='POST'
-        )
-
-        logger.debug(f"Request body size: {len(body)} bytes")
-
-        with urlopen(req, timeout=30) as response:
-            response_data = response.read().decode('utf-8')
-            response_json = json.loads(response_data)
-
-            logger.info(f"Upload successful! Response status: {response.status}")
-            logger.info(f"Response: {json.dumps(response_json, ensure_ascii=False, indent=2)}")
-
-            return response_json
-
-    except HTTPError as e:
-        error_body = e.read().decode('utf-8')
-        logger.exception(f"HTTP Error {e.code}: {e.reason}")
-        logger.debug(f"Error response: {error_body}")
-        return None
-    except URLError as e:
-        logger.exception(f"URL Error: {e.reason}")
-        return None
-    except Exception as e:
-        logger.exception(f"Unexpected error: {e}")
-        return None
+def build_documents(tourist_spots):
+    """Build the upload documents (file name + text) for each tourist spot."""
+    documents = []
+    for i, spot in enumerate(tourist_spots, 1):
+        spot_name = spot.get('name', 'unknown').replace(' ', '_').replace('　', '_')
+        documents.append({
+            'spot_key': spot.get('name'),
+            'file_name': f"{i:02d}_{spot_name}.txt",
+            'text': format_document_text(spot),
+        })
+    return documents
 
 
 def main():
     """Main execution function."""
+    args = parse_args()
+
     logger.info("=" * 60)
     logger.info("Step 1: Upload GinzaDB to Sakura AI Engine RAG")
     logger.info("=" * 60)
@@ -129,54 +129,26 @@ def main():
     api_token = get_api_token()
 
     # Load GinzaDB
-    ginza_db_path = os.path.join(
-        os.path.dirname(__file__),
-        '../../GinzaDB/ginzaDB.json'
-    )
-    db_data = load_ginza_db(ginza_db_path)
+    db_data = load_ginza_db(args.db)
 
     # Prepare documents
-    tourist_spots = db_data.get('ginza_tourist_spots', [])
-
-    logger.info(f"Preparing {len(tourist_spots)} individual document files...")
-
-    # Create temporary directory for files
-    with tempfile.TemporaryDirectory() as tmpdir:
-        upload_results = []
-
-        for i, spot in enumerate(tourist_spots, 1):
-            spot_name = spot.get('name', 'unknown').replace(' ', '_').replace('　', '_')
-            file_name = f"{i:02d}_{spot_name}.txt"
-            file_path = os.path.join(tmpdir, file_name)
-
-            # Format and write individual spot file
-            doc_text = format_document_text(spot)
-
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(doc_text)
-
-            logger.debug(f"[{i}/{len(tourist_spots)}] Created file: {file_name}")
-
-            # Upload individual file
-            logger.info(f"[{i}/{len(tourist_spots)}] Uploading: {file_name}")
-            response = upload_file(api_token, file_path, file_name)
-
-            if response:
-                upload_results.append({
-                    'spot_name': spot.get('name'),
-                    'file_name': file_name,
-                    'document_id': response.get('id'),
-                    'status': response.get('status'),
-                    'success': True
-                })
-                logger.info(f"  ✓ Success! Document ID: {response.get('id')}")
-            else:
-                upload_results.append({
-                    'spot_name': spot.get('name'),
-                    'file_name': file_name,
-                    'success': False
-                })
-                logger.warning(f"  ✗ Failed to upload {file_name}")
+    tourist_spots = extract_tourist_spots(db_data)
+
+    logger.info(f"Preparing {len(tourist_spots)} individual documents...")
+    documents = build_documents(tourist_spots)
+
+    uploader = BulkUploader(
+        api_token,
+        Manifest(args.manifest),
+        max_workers=args.workers,
+        rate=args.rate,
+        batch_size=args.batch_size,
+    )
+
+    if args.sync:
+        return sync(uploader, documents, args.dry_run)
+
+    upload_results = uploader.upload_all(documents)
 
     logger.info("=" * 60)
     logger.info("Upload Summary:")
@@ -184,9 +156,10 @@ def main():
 
     successful = sum(1 for r in upload_results if r.get('success'))
     failed = sum(1 for r in upload_results if not r.get('success'))
+    skipped = sum(1 for r in upload_results if r.get('skipped'))
 
     logger.info(f"Total documents: {len(upload_results)}")
-    logger.info(f"Successful: {successful}")
+    logger.info(f"Successful: {successful} (unchanged, skipped: {skipped})")
     logger.info(f"Failed: {failed}")
 
     if successful > 0:
@@ -196,7 +169,7 @@ def main():
                 logger.info(f"  - {result['spot_name']}: {result['document_id']}")
 
     if failed > 0:
-        logger.warning("\nFailed documents:")
+        logger.warning("\nFailed documents (rerun to retry only these):")
         for result in upload_results:
             if not result.get('success'):
                 logger.warning(f"  - {result['spot_name']}")
@@ -206,5 +179,48 @@ def main():
     return upload_results
 
 
+def sync(uploader, documents, dry_run=False):
+    """Plan and apply an incremental sync of the documents against the manifest."""
+    plan = plan_sync(documents, uploader.manifest)
+    summary = plan.summary()
+
+    logger.info("=" * 60)
+    logger.info("Sync Plan:")
+    logger.info("=" * 60)
+    logger.info(f"Add: {summary['add']}")
+    logger.info(f"Update: {summary['update']}")
+    logger.info(f"Delete: {summary['delete']}")
+    logger.info(f"Unchanged: {summary['unchanged']}")
+    for document in plan.add:
+        logger.info(f"  + {document['spot_key']}")
+    for document in plan.update:
+        logger.info(f"  ~ {document['spot_key']}")
+    for entry in plan.delete:
+        logger.info(f"  - {entry['spot_key']} ({entry['document_id']})")
+
+    if dry_run:
+        logger.info("Dry run, no changes applied")
+        return {'plan': summary}
+
+    results = uploader.sync(plan)
+
+    uploaded_ok = sum(1 for r in results['uploaded'] if r['success'])
+    deleted_ok = sum(1 for r in results['deleted'] if r['success'])
+    failed = [r for r in results['uploaded'] + results['deleted'] if not r['success']]
+
+    logger.info("=" * 60)
+    logger.info("Sync Summary:")
+    logger.info("=" * 60)
+    logger.info(f"Uploaded: {uploaded_ok}/{len(results['uploaded'])}")
+    logger.info(f"Deleted: {deleted_ok}/{len(results['deleted'])}")
+    if failed:
+        logger.warning("\nFailed (rerun --sync to retry only these):")
+        for result in failed:
+            logger.warning(f"  - {result['spot_name']}")
+    logger.info("=" * 60)
+
+    return {'plan': summary, **results}
+
+
 if __name__ == '__main__':
     main()
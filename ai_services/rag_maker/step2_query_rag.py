@@ -2,15 +2,26 @@
 """
 Step 2: Query Sakura AI Engine RAG
 This script queries the uploaded documents using the RAG API.
+
+With --queries, it runs as a batch evaluation tool: queries from a file are
+run concurrently, and latency percentiles, `distance` scores from `sources`
+and recall@k against the expected spots are reported for every
+top_k/threshold combination.
 """
 
+import argparse
 import json
 import os
+import re
 import sys
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
+from bulk_uploader import get_base_url
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,7 +53,7 @@ def query_rag(api_token, query, top_k=3, threshold=0.3):
     Returns:
         Response JSON containing answer and sources
     """
-    url = "https://api.ai.sakura.ad.jp/v1/documents/chat/"
+    url = f"{get_base_url()}/documents/chat/"
 
     # Prepare the request payload
     payload = {
@@ -130,8 +141,184 @@ def format_answer(response_json):
     return output
 
 
+def load_queries(file_path):
+    """
+    Load evaluation queries.
+
+    Supported formats:
+    - JSONL / JSON list of {"query": ..., "expected": "spot" | ["spot", ...]}
+    - Plain text with one query per line (no expected spots)
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    stripped = content.strip()
+    if stripped.startswith('['):
+        items = json.loads(stripped)
+    elif stripped.startswith('{'):
+        items = [json.loads(line) for line in stripped.splitlines() if line.strip()]
+    else:
+        items = [{'query': line.strip()} for line in stripped.splitlines() if line.strip()]
+
+    queries = []
+    for item in items:
+        expected = item.get('expected') or []
+        if isinstance(expected, str):
+            expected = [expected]
+        queries.append({'query': item['query'], 'expected': expected})
+    return queries
+
+
+def source_spot_name(source):
+    """Extract the spot name from a RAG source (document content or file name)."""
+    match = re.match(r'名前:\s*(.+)', source.get('content', ''))
+    if match:
+        return match.group(1).strip()
+    name = source.get('document', {}).get('name', '')
+    return re.sub(r'^\d+_|\.txt$', '', name).replace('_', ' ')
+
+
+def percentile(values, p):
+    """Return the p-th percentile (0-100) using linear interpolation."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def evaluate_query(api_token, item, top_k, threshold):
+    """Run one query and record latency, source distances and retrieval hits."""
+    start = time.perf_counter()
+    response = query_rag(api_token, item['query'], top_k=top_k, threshold=threshold)
+    latency = time.perf_counter() - start
+
+    sources = response.get('sources', []) if response else []
+    retrieved = [source_spot_name(source) for source in sources]
+    found = [name for name in item['expected'] if name in retrieved]
+
+    return {
+        'query': item['query'],
+        'success': response is not None,
+        'latency_s': round(latency, 4),
+        'retrieved': retrieved,
+        'distances': [source.get('distance') for source in sources],
+        'expected': item['expected'],
+        'hit': bool(found) if item['expected'] else None,
+        'recall': len(found) / len(item['expected']) if item['expected'] else None,
+    }
+
+
+def summarize(records, wall_time):
+    """Aggregate per-query records into latency, distance and recall statistics."""
+    latencies = [r['latency_s'] for r in records if r['success']]
+    top1 = [r['distances'][0] for r in records if r['distances']]
+    all_distances = [d for r in records for d in r['distances'] if d is not None]
+    judged = [r for r in records if r['recall'] is not None]
+
+    def rounded(value):
+        return round(value, 4) if value is not None else None
+
+    return {
+        'queries': len(records),
+        'errors': sum(1 for r in records if not r['success']),
+        'throughput_qps': rounded(len(records) / wall_time) if wall_time else None,
+        'latency_s': {
+            'p50': rounded(percentile(latencies, 50)),
+            'p90': rounded(percentile(latencies, 90)),
+            'p95': rounded(percentile(latencies, 95)),
+            'p99': rounded(percentile(latencies, 99)),
+            'mean': rounded(sum(latencies) / len(latencies)) if latencies else None,
+            'max': rounded(max(latencies)) if latencies else None,
+        },
+        'distance': {
+            'top1_mean': rounded(sum(top1) / len(top1)) if top1 else None,
+            'mean': rounded(sum(all_distances) / len(all_distances)) if all_distances else None,
+            'max': rounded(max(all_distances)) if all_distances else None,
+            'sources_per_query': rounded(len(all_distances) / len(records)) if records else None,
+        },
+        'recall_at_k': rounded(sum(r['recall'] for r in judged) / len(judged)) if judged else None,
+        'hit_rate_at_k': rounded(sum(1 for r in judged if r['hit']) / len(judged)) if judged else None,
+    }
+
+
+def run_batch(api_token, queries, top_k, threshold, parallelism):
+    """Run all queries concurrently for one parameter setting."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        records = list(executor.map(
+            lambda item: evaluate_query(api_token, item, top_k, threshold), queries
+        ))
+    wall_time = time.perf_counter() - start
+
+    return {
+        'top_k': top_k,
+        'threshold': threshold,
+        'parallelism': parallelism,
+        'summary': summarize(records, wall_time),
+        'records': records,
+    }
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Query Sakura AI Engine RAG')
+    parser.add_argument('--queries', help='Query file for batch evaluation (JSONL, JSON list or text)')
+    parser.add_argument('--parallelism', type=int, default=4, help='Number of concurrent queries')
+    parser.add_argument('--top-k', type=int, nargs='+', default=[3], help='top_k values to evaluate')
+    parser.add_argument('--threshold', type=float, nargs='+', default=[0.3], help='threshold values to evaluate')
+    parser.add_argument('--output', help='Write full results (summaries and per-query records) as JSON')
+    return parser.parse_args()
+
+
+def run_evaluation(api_token, args):
+    """Run the batch evaluation over every top_k/threshold combination."""
+    queries = load_queries(args.queries)
+    logger.info(f"Loaded {len(queries)} queries from {args.queries}")
+
+    runs = []
+    for top_k in args.top_k:
+        for threshold in args.threshold:
+            logger.info(f"Running top_k={top_k}, threshold={threshold}, parallelism={args.parallelism}")
+            runs.append(run_batch(api_token, queries, top_k, threshold, args.parallelism))
+
+    print(f"\n{'=' * 100}")
+    print(f"{'top_k':>5} {'thresh':>6} {'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8} {'qps':>7} "
+          f"{'top1 dist':>9} {'mean dist':>9} {'recall@k':>8} {'hit@k':>6} {'errors':>6}")
+    print(f"{'=' * 100}")
+
+    def fmt(value, width, digits=3):
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    for run in runs:
+        summary = run['summary']
+        print(
+            f"{run['top_k']:>5} {run['threshold']:>6.2f} "
+            f"{fmt(summary['latency_s']['p50'], 8)} {fmt(summary['latency_s']['p95'], 8)} "
+            f"{fmt(summary['latency_s']['p99'], 8)} {fmt(summary['throughput_qps'], 7, 2)} "
+            f"{fmt(summary['distance']['top1_mean'], 9, 4)} {fmt(summary['distance']['mean'], 9, 4)} "
+            f"{fmt(summary['recall_at_k'], 8)} {fmt(summary['hit_rate_at_k'], 6)} {summary['errors']:>6}"
+        )
+    print(f"{'=' * 100}\n")
+
+    misses = [r for r in runs[-1]['records'] if r['hit'] is False] if runs else []
+    for record in misses:
+        logger.warning(f"Expected spot not retrieved: {record['query']} -> {record['retrieved']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(runs, f, ensure_ascii=False, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+    return runs
+
+
 def main():
     """Main execution function."""
+    args = parse_args()
+
     logger.info("=" * 60)
     logger.info("Step 2: Query RAG")
     logger.info("=" * 60)
@@ -139,6 +326,9 @@ def main():
     # Get API token
     api_token = get_api_token()
 
+    if args.queries:
+        return run_evaluation(api_token, args)
+
     # Example queries
     queries = [
         "銀座の有名な百貨店はどこですか？",
@@ -0,0 +1,390 @@
+"""
+VLM server benchmark with the tiny random-weight model
+
+Measures the serving path of serve_vlm.py on CPU without a GPU or a model download,
+so scheduler, caching and batching changes can be compared by numbers:
+
+- preprocess: image decode, resize and processor time per camera resolution
+- overhead: what an /inference request costs on top of model.generate
+  (HTTP + multipart on the client side, decode/resize/preprocess/queue on the server side)
+- concurrency: throughput, latency and queue wait with N concurrent clients
+  (the server generates on one worker, so this shows how requests queue)
+- batching: model.generate throughput per batch size, i.e. what a batching scheduler could gain
+
+The server runs in a separate process (uvicorn with MODEL_PATH=tiny-random) so the
+client does not compete with it for the GIL. Results are written as JSON and can be
+compared with a baseline run.
+
+Usage:
+    python benchmark.py --output vlm_bench.json
+    python benchmark.py --output current.json --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from PIL import Image, ImageDraw
+
+SERVER_DIR = Path(__file__).resolve().parent
+
+DEFAULT_IMAGE_SIZES = ["640x480", "1280x720", "1920x1080", "4032x3024"]
+PROMPT = "あなたは今、東京都中央区銀座にいます。\n画像中のランドマークについて、3行程度で具体的に説明してください。"
+
+
+def quantile(values, q):
+    """Nearest-rank quantile (0 if empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean of a list of durations, in milliseconds"""
+    return {
+        "p50_ms": round(quantile(seconds, 0.5) * 1000, 3),
+        "p95_ms": round(quantile(seconds, 0.95) * 1000, 3),
+        "p99_ms": round(quantile(seconds, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(seconds) * 1000, 3) if seconds else 0.0,
+    }
+
+
+def make_jpeg(width, height, seed):
+    """Camera-like JPEG (quality 80) with enough detail for a realistic file size"""
+    rng = random.Random(seed)
+    image = Image.effect_noise((width, height), 48).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        x, y = rng.randrange(width), rng.randrange(height)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + rng.randrange(width // 20, width // 4), y + rng.randrange(height // 20, height // 4)), fill=color)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the server functions' per-request prints while measuring"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_preprocess(serve_vlm, processor, images, repeats):
+    """Decode, resize and processor time per image size (in process, no HTTP)"""
+    results = {}
+    for size, data in images.items():
+        decode, resize, process = [], [], []
+        with quiet():
+            for _ in range(repeats):
+                start = time.perf_counter()
+                image = serve_vlm.process_image_binary(data)
+                decoded = time.perf_counter()
+                image = serve_vlm.resize_image_to_target_pixels(image)
+                resized = time.perf_counter()
+                message = [{"role": "user", "content": [{"type": "image", "image": image}, {"type": "text", "text": PROMPT}]}]
+                text_prompt = processor.apply_chat_template(message, add_generation_prompt=True)
+                processor(text=[text_prompt], images=[image], return_tensors="pt")
+                processed = time.perf_counter()
+                decode.append(decoded - start)
+                resize.append(resized - decoded)
+                process.append(processed - resized)
+        totals = [a + b + c for a, b, c in zip(decode, resize, process)]
+        results[size] = {
+            "jpeg_bytes": len(data),
+            "decode_p50_ms": round(quantile(decode, 0.5) * 1000, 3),
+            "resize_p50_ms": round(quantile(resize, 0.5) * 1000, 3),
+            "processor_p50_ms": round(quantile(process, 0.5) * 1000, 3),
+            "total_p50_ms": round(quantile(totals, 0.5) * 1000, 3),
+        }
+        print(
+            f"  preprocess {size:>10s}: decode {results[size]['decode_p50_ms']:7.2f}ms  "
+            f"resize {results[size]['resize_p50_ms']:7.2f}ms  processor {results[size]['processor_p50_ms']:7.2f}ms"
+        )
+    return results
+
+
+def bench_batching(torch, model, processor, image, batch_sizes, max_new_tokens, repeats):
+    """model.generate throughput per batch size (what batching requests together would give)"""
+    message = [{"role": "user", "content": [{"type": "image", "image": image}, {"type": "text", "text": PROMPT}]}]
+    text_prompt = processor.apply_chat_template(message, add_generation_prompt=True)
+    results = {}
+    base_per_item = None
+    for batch_size in batch_sizes:
+        inputs = processor(
+            text=[text_prompt] * batch_size, images=[image] * batch_size, padding=True, return_tensors="pt"
+        ).to(model.device)
+        durations = []
+        with torch.inference_mode():
+            # Warm up once per shape
+            model.generate(**inputs, max_new_tokens=2, do_sample=False)
+            for _ in range(repeats):
+                start = time.perf_counter()
+                model.generate(**inputs, max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens, do_sample=False)
+                durations.append(time.perf_counter() - start)
+        batch_seconds = quantile(durations, 0.5)
+        per_item = batch_seconds / batch_size
+        base_per_item = base_per_item or per_item
+        results[str(batch_size)] = {
+            "batch_p50_ms": round(batch_seconds * 1000, 3),
+            "items_per_second": round(batch_size / batch_seconds, 2),
+            "tokens_per_second": round(batch_size * max_new_tokens / batch_seconds, 1),
+            # Speedup per item against batch size 1 (1.0 = no gain from batching)
+            "efficiency": round(base_per_item / per_item, 3),
+        }
+        print(
+            f"  batch {batch_size:>3}: {results[str(batch_size)]['batch_p50_ms']:8.1f}ms  "
+            f"{results[str(batch_size)]['items_per_second']:8.1f} items/s  "
+            f"efficiency {results[str(batch_size)]['efficiency']:.2f}x"
+        )
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_server(port, threads):
+    """Start serve_vlm.py with the tiny model in a subprocess and wait until it reports ready (after warmup)"""
+    env = dict(os.environ, MODEL_PATH="tiny-random", TRACE_EXPORTER="none")
+    if threads:
+        env["OMP_NUM_THREADS"] = str(threads)
+    # Server output goes to a file so a full pipe can never block the server
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "serve_vlm:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            if process.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(f"Server exited: {log.read().decode(errors='replace')[-2000:]}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not start within 120 seconds")
+            time.sleep(0.2)
+        startup = httpx.get(f"http://127.0.0.1:{port}/health/ready", timeout=1).json()
+        print(f"  startup: ready in {startup['elapsed_seconds']:.2f}s {startup['phase_seconds']}")
+        yield f"http://127.0.0.1:{port}", startup
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        log.close()
+
+
+async def send(client, url, image, max_new_tokens):
+    start = time.perf_counter()
+    response = await client.post(
+        f"{url}/inference",
+        files={"image": ("image.jpg", image, "image/jpeg")},
+        data={"text": PROMPT, "max_new_tokens": str(max_new_tokens), "return_metrics": "true"},
+    )
+    latency = time.perf_counter() - start
+    body = response.json()
+    if response.status_code != 200 or not body.get("success"):
+        raise RuntimeError(f"Inference failed: {response.status_code} {body}")
+    return latency, body["metrics"]
+
+
+async def bench_overhead(url, image, requests, max_new_tokens):
+    """Sequential requests: latency on top of model.generate, split into client and server side"""
+    client_overhead, server_overhead, latencies = [], [], []
+    async with httpx.AsyncClient(timeout=120) as client:
+        await send(client, url, image, max_new_tokens)  # warm-up
+        for _ in range(requests):
+            latency, stats = await send(client, url, image, max_new_tokens)
+            latencies.append(latency)
+            # Server side: decode, resize, processor, queue (everything in the handler but generate)
+            server_overhead.append(stats["total_seconds"] - stats["generation_seconds"])
+            # Client side: HTTP, multipart upload/parsing and response serialization
+            client_overhead.append(latency - stats["total_seconds"])
+    result = {
+        "latency": latency_summary(latencies),
+        "server_overhead": latency_summary(server_overhead),
+        "client_overhead": latency_summary(client_overhead),
+    }
+    print(
+        f"  overhead: latency p50 {result['latency']['p50_ms']:.1f}ms, "
+        f"server (non-generate) p50 {result['server_overhead']['p50_ms']:.1f}ms, "
+        f"HTTP/multipart p50 {result['client_overhead']['p50_ms']:.1f}ms"
+    )
+    return result
+
+
+async def bench_concurrency(url, image, levels, requests_per_client, max_new_tokens):
+    """N closed-loop clients: throughput, latency and queue wait per concurrency level"""
+    results = {}
+    base_throughput = None
+    async with httpx.AsyncClient(timeout=300, limits=httpx.Limits(max_connections=max(levels))) as client:
+        for level in levels:
+            latencies, queue_waits = [], []
+
+            async def worker():
+                for _ in range(requests_per_client):
+                    latency, stats = await send(client, url, image, max_new_tokens)
+                    latencies.append(latency)
+                    queue_waits.append(stats.get("queue_wait_seconds", 0.0))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(level)))
+            elapsed = time.perf_counter() - start
+            throughput = len(latencies) / elapsed
+            base_throughput = base_throughput or throughput
+            results[str(level)] = {
+                "requests": len(latencies),
+                "throughput_rps": round(throughput, 2),
+                # Throughput against one client (1.0 = requests are fully serialized)
+                "speedup": round(throughput / base_throughput, 3),
+                "latency": latency_summary(latencies),
+                "queue_wait": latency_summary(queue_waits),
+            }
+            print(
+                f"  concurrency {level:>3}: {throughput:7.2f} rps  speedup {results[str(level)]['speedup']:.2f}x  "
+                f"p50 {results[str(level)]['latency']['p50_ms']:8.1f}ms  p95 {results[str(level)]['latency']['p95_ms']:8.1f}ms  "
+                f"queue p50 {results[str(level)]['queue_wait']['p50_ms']:8.1f}ms"
+            )
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=SERVER_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args):
+    import torch
+
+    import serve_vlm
+    from tiny_model import build_tiny_model
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    images = {}
+    for size in args.image_sizes:
+        width, height = (int(value) for value in size.split("x"))
+        images[size] = make_jpeg(width, height, args.seed)
+    request_image = images.get("1280x720") or next(iter(images.values()))
+
+    print(f"🧪 Tiny model on CPU ({torch.get_num_threads()} threads)")
+    with quiet():
+        model, processor = build_tiny_model(seed=args.seed)
+        batch_image = serve_vlm.resize_image_to_target_pixels(serve_vlm.process_image_binary(request_image))
+
+    report = {
+        "benchmark": "vlm_server",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "seed": args.seed,
+        "max_new_tokens": args.max_new_tokens,
+        "preprocess": bench_preprocess(serve_vlm, processor, images, args.repeats),
+        "batching": bench_batching(
+            torch, model, processor, batch_image, args.batch_sizes, args.max_new_tokens, args.repeats
+        ),
+    }
+    del model
+
+    with run_server(free_port(), args.threads) as (url, startup):
+        report["startup"] = {
+            "ready_seconds": startup["elapsed_seconds"],
+            "phase_seconds": startup["phase_seconds"],
+        }
+        report["overhead"] = asyncio.run(bench_overhead(url, request_image, args.requests, args.max_new_tokens))
+        report["concurrency"] = asyncio.run(
+            bench_concurrency(url, request_image, args.concurrency, args.requests_per_client, args.max_new_tokens)
+        )
+    return report
+
+
+def headline_metrics(report):
+    """Metrics compared against a baseline: name -> (value, higher is better)"""
+    metrics = {}
+    for size, values in report["preprocess"].items():
+        metrics[f"preprocess {size} total_p50_ms"] = (values["total_p50_ms"], False)
+    metrics["overhead server p50_ms"] = (report["overhead"]["server_overhead"]["p50_ms"], False)
+    metrics["overhead client p50_ms"] = (report["overhead"]["client_overhead"]["p50_ms"], False)
+    for level, values in report["concurrency"].items():
+        metrics[f"concurrency {level} throughput_rps"] = (values["throughput_rps"], True)
+        metrics[f"concurrency {level} p95_ms"] = (values["latency"]["p95_ms"], False)
+    for batch_size, values in report["batching"].items():
+        metrics[f"batch {batch_size} items_per_second"] = (values["items_per_second"], True)
+    return metrics
+
+
+def compare(current, baseline, tolerance):
+    """Print changes against a baseline run; returns False if any metric got worse than the tolerance"""
+    base = headline_metrics(baseline)
+    ok = True
+    print(f"\nComparison with baseline {baseline.get('git_commit', '?')} (tolerance {tolerance:.0%})")
+    for name, (value, higher_is_better) in headline_metrics(current).items():
+        if name not in base or not base[name][0]:
+            continue
+        ratio = value / base[name][0]
+        regressed = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+        ok = ok and not regressed
+        print(f"  {'REGRESSION' if regressed else 'ok':10s} {name:40s} {base[name][0]:10.2f} -> {value:10.2f} ({ratio:.2f}x)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the VLM server with a tiny random-weight model on CPU")
+    parser.add_argument("--image-sizes", nargs="+", default=DEFAULT_IMAGE_SIZES, help="Camera resolutions (WIDTHxHEIGHT)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=30, help="Sequential requests for the overhead measurement")
+    parser.add_argument("--requests-per-client", type=int, default=10, help="Requests per client for each concurrency level")
+    parser.add_argument("--repeats", type=int, default=10, help="Repetitions of the in-process measurements")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads for torch (0: torch default)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="vlm_bench.json", help="Results JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown for --compare")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Inference metrics for the VLM server
+
+Each request records its queue wait, image preprocessing time, prompt token count,
+prefill latency, decode speed, generated token count and peak memory. The last
+METRICS_WINDOW requests are kept to compute rolling p50/p95/p99, which are exposed
+in the Prometheus text format (as summaries) together with lifetime counters.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+# Rolling window size used for the percentiles
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "200"))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Per-request fields: (name, Prometheus metric name, help text)
+FIELDS = (
+    ("queue_wait_seconds", "vlm_queue_wait_seconds", "Time spent waiting for the generation worker."),
+    ("image_preprocess_seconds", "vlm_image_preprocess_seconds",
+     "Image decode, resize and processor preprocessing time."),
+    ("prompt_tokens", "vlm_prompt_tokens", "Prompt tokens (text and image) per request."),
+    ("prefill_seconds", "vlm_prefill_seconds", "Time from the start of generation to the first new token."),
+    ("decode_tokens_per_second", "vlm_decode_tokens_per_second", "Decode speed after the first token."),
+    ("generated_tokens", "vlm_generated_tokens", "Generated tokens per request."),
+    ("generation_seconds", "vlm_generation_seconds", "Total model.generate time."),
+    ("total_seconds", "vlm_request_seconds", "Total time to handle an inference request."),
+    ("peak_memory_bytes", "vlm_peak_memory_bytes",
+     "Peak accelerator memory allocated during the request (process peak RSS on CPU)."),
+    ("tokens_saved", "vlm_tokens_saved",
+     "Tokens below max_new_tokens cut off by early stopping or the language token budget."),
+)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of the values (0 if empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+class InferenceMetrics:
+    """Rolling per-request statistics and lifetime counters for the inference endpoint"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._recent: Dict[str, deque] = {name: deque(maxlen=window) for name, _, _ in FIELDS}
+        self._sums: Dict[str, float] = {name: 0.0 for name, _, _ in FIELDS}
+        self._counts: Dict[str, int] = {name: 0 for name, _, _ in FIELDS}
+        self.requests: Dict[str, int] = {}
+        self.stop_reasons: Dict[str, int] = {}
+        self.in_flight = 0
+        self.queue_depth = 0
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, status: str, stats: Optional[Dict[str, float]] = None):
+        """Record one finished request ("ok" or "error") and its per-request stats"""
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[status] = self.requests.get(status, 0) + 1
+            stop_reason = (stats or {}).get("stop_reason")
+            if stop_reason:
+                self.stop_reasons[stop_reason] = self.stop_reasons.get(stop_reason, 0) + 1
+            for name, value in (stats or {}).items():
+                if name in self._recent and value is not None:
+                    self._recent[name].append(value)
+                    self._sums[name] += value
+                    self._counts[name] += 1
+
+    def queue_entered(self):
+        with self._lock:
+            self.queue_depth += 1
+
+    def queue_left(self):
+        with self._lock:
+            self.queue_depth -= 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Rolling p50/p95/p99 of each field over the last METRICS_WINDOW requests"""
+        with self._lock:
+            recent = {name: list(values) for name, values in self._recent.items()}
+        return {
+            name: {f"p{int(q * 100)}": round(percentile(values, q), 4) for q in QUANTILES}
+            for name, values in recent.items()
+            if values
+        }
+
+    def render_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            recent = {name: list(values) for name, values in self._recent.items()}
+            sums = dict(self._sums)
+            counts = dict(self._counts)
+            requests = dict(self.requests)
+            stop_reasons = dict(self.stop_reasons)
+            in_flight, queue_depth = self.in_flight, self.queue_depth
+
+        lines = [
+            "# HELP vlm_requests_total Inference requests by status.",
+            "# TYPE vlm_requests_total counter",
+        ]
+        lines += [f'vlm_requests_total{{status="{status}"}} {count}' for status, count in sorted(requests.items())]
+        lines += [
+            "# HELP vlm_requests_in_flight Inference requests being handled (queued or generating).",
+            "# TYPE vlm_requests_in_flight gauge",
+            f"vlm_requests_in_flight {in_flight}",
+            "# HELP vlm_queue_depth Requests waiting for the generation worker.",
+            "# TYPE vlm_queue_depth gauge",
+            f"vlm_queue_depth {queue_depth}",
+            "# HELP vlm_stop_reasons_total Generations by why they stopped "
+            "(eos, max_new_tokens, token_budget, sentences, stop_string).",
+            "# TYPE vlm_stop_reasons_total counter",
+        ]
+        lines += [f'vlm_stop_reasons_total{{reason="{reason}"}} {count}' for reason, count in sorted(stop_reasons.items())]
+        for name, metric, help_text in FIELDS:
+            lines += [
+                f"# HELP {metric} {help_text} Quantiles over the last {METRICS_WINDOW} requests.",
+                f"# TYPE {metric} summary",
+            ]
+            lines += [
+                f'{metric}{{quantile="{q}"}} {percentile(recent[name], q):.6g}' for q in QUANTILES
+            ]
+            lines += [f"{metric}_sum {sums[name]:.6g}", f"{metric}_count {counts[name]}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,146 @@
+"""
+Model startup helpers for the VLM server
+
+The model is loaded in the background so the server can answer liveness checks while
+it starts, and startup progress is kept in a LoadState that the readiness endpoint reports.
+
+With MODEL_LOAD_MODE=mmap, the checkpoint is first resolved to local safetensors files
+(downloading them from the Hub if needed, skipping pickle weights), then the shards are
+read sequentially into the page cache with byte-level progress. from_pretrained then
+memory-maps the shards from the cache instead of faulting pages in at random while it
+builds the model.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Weight formats skipped when downloading for the mmap mode (pickle-based, not memory-mappable)
+PICKLE_WEIGHT_PATTERNS = ["*.bin", "*.pt", "*.pth", "*.ckpt", "*.h5", "*.msgpack"]
+
+PREFETCH_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+class LoadState:
+    """Startup phase and progress of the model (starting -> ... -> ready, or failed)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.phase = "starting"
+        self._phase_started = self.started_at
+        self.phase_seconds = {}
+        self.progress: Optional[float] = None
+        self.detail: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def enter(self, phase: str, detail: Optional[str] = None):
+        """Start a new phase, recording how long the previous one took"""
+        now = time.time()
+        with self._lock:
+            self.phase_seconds[self.phase] = round(now - self._phase_started, 3)
+            self.phase = phase
+            self._phase_started = now
+            self.progress = None
+            self.detail = detail
+
+    def set_progress(self, done: float, total: float, detail: Optional[str] = None):
+        with self._lock:
+            self.progress = done / total if total else 1.0
+            if detail is not None:
+                self.detail = detail
+
+    def fail(self, error: Exception):
+        self.enter("failed")
+        with self._lock:
+            self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == "ready"
+
+    @property
+    def failed(self) -> bool:
+        return self.phase == "failed"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "phase": self.phase,
+                "progress": round(self.progress, 4) if self.progress is not None else None,
+                "detail": self.detail,
+                "elapsed_seconds": round(time.time() - self.started_at, 3),
+                "phase_seconds": dict(self.phase_seconds),
+                "error": self.error,
+            }
+
+
+def resolve_checkpoint(model_path: str) -> str:
+    """
+    Local directory of the checkpoint's safetensors files
+
+    A local directory is used as is; a Hub model id is downloaded (or taken from the
+    cache) without pickle weight files.
+
+    Raises:
+        ValueError: If the checkpoint has no safetensors files
+    """
+    if os.path.isdir(model_path):
+        directory = model_path
+    else:
+        from huggingface_hub import snapshot_download
+
+        directory = snapshot_download(model_path, ignore_patterns=PICKLE_WEIGHT_PATTERNS)
+
+    if not any(Path(directory).glob("*.safetensors")):
+        raise ValueError(  # noqa: TRY003
+            f"No safetensors weights in {directory}; use MODEL_LOAD_MODE=default for this checkpoint"
+        )
+    return directory
+
+
+def prefetch_safetensors(directory: str, state: LoadState, chunk_bytes: int = PREFETCH_CHUNK_BYTES) -> int:
+    """
+    Read the safetensors shards sequentially so the page cache holds them before mmap
+
+    Returns:
+        Bytes read
+    """
+    files = sorted(Path(directory).glob("*.safetensors"))
+    total = sum(path.stat().st_size for path in files)
+    done = 0
+    next_report = 0.1
+    buffer = bytearray(chunk_bytes)
+    start = time.time()
+
+    print(f"📦 Prefetching {len(files)} safetensors shard(s), {total / 1e9:.2f} GB")
+    for path in files:
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                done += read
+                state.set_progress(done, total, path.name)
+                if total and done / total >= next_report:
+                    elapsed = time.time() - start
+                    print(f"📦 {done / total:4.0%} ({done / 1e9:.2f} GB, {done / 1e6 / max(elapsed, 1e-6):.0f} MB/s)")
+                    next_report += 0.1
+    return done
+
+
+def parse_image_sizes(value: str) -> List[Tuple[int, int]]:
+    """Parse "640x480,1280x720" into [(640, 480), (1280, 720)] (empty string: no sizes)"""
+    sizes = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        width, _, height = item.lower().partition("x")
+        try:
+            sizes.append((int(width), int(height)))
+        except ValueError:
+            raise ValueError(f"Invalid image size: {item} (expected WIDTHxHEIGHT)") from None  # noqa: TRY003
+    return sizes
@@ -1,16 +1,32 @@
+import asyncio
 import base64
+import contextvars
 import io
+import json
 import os
-from typing import Optional
+import resource
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
 import torch
 import uvicorn
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from PIL import Image
 from pydantic import BaseModel
 from pyngrok import ngrok
-from transformers import AutoModelForCausalLM, AutoProcessor, set_seed
+from transformers import AutoModelForCausalLM, AutoProcessor, StoppingCriteria, StoppingCriteriaList, set_seed
+
+from inference_metrics import InferenceMetrics
+from model_loading import LoadState, parse_image_sizes, prefetch_safetensors, resolve_checkpoint
+from stopping import TextStoppingCriteria, parse_token_budgets, truncate_text
+from tiny_model import TINY_MODEL_PATH, build_tiny_model
+from tracing import tracer
 
 # Configuration
 MODEL_PATH = os.getenv("MODEL_PATH", "sbintuitions/sarashina2.2-vision-3b")
@@ -23,11 +39,27 @@ NGROK_AUTH_TOKEN = os.getenv("NGROK_AUTH_TOKEN", None)
 # 3. Ensure NGROK_AUTH_TOKEN is set for authenticated access
 NGROK_DOMAIN = os.getenv("NGROK_DOMAIN", None)  # Fixed domain for ngrok (e.g., "your-domain.ngrok.app")
 NGROK_HTTPS_ONLY = os.getenv("NGROK_HTTPS_ONLY", "false").lower() == "true"  # HTTPS only tunnel
+# "default": from_pretrained as is. "mmap": resolve to local safetensors, prefetch them with progress, then mmap
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "default")
+# Warmup generations run before the server reports ready (empty to skip)
+WARMUP_IMAGE_SIZES = parse_image_sizes(os.getenv("WARMUP_IMAGE_SIZES", "640x480,1280x720,1920x1080"))
+WARMUP_MAX_NEW_TOKENS = int(os.getenv("WARMUP_MAX_NEW_TOKENS", "16"))
+# Early stopping defaults, used when a request does not set them (0 / empty: off)
+STOP_MAX_SENTENCES = int(os.getenv("STOP_MAX_SENTENCES", "0"))
+STOP_STRINGS = json.loads(os.getenv("STOP_STRINGS", "[]"))  # JSON list, e.g. ["【", "\n\n"]
+# Per-language caps on max_new_tokens, e.g. "japanese:160,english:96"
+TOKEN_BUDGETS = parse_token_budgets(os.getenv("TOKEN_BUDGETS", ""))
 
 # Global variables for model and processor
 model = None
 processor = None
 
+# Generation runs on a single worker thread so requests queue for the model one at a time
+# (and the event loop stays free for /health and /metrics while a request is generating)
+generation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+inference_metrics = InferenceMetrics()
+load_state = LoadState()
+
 class VLMRequest(BaseModel):
     text: str
     temperature: Optional[float] = 0.7
@@ -39,6 +71,7 @@ class VLMResponse(BaseModel):
     generated_text: str
     success: bool
     error_message: Optional[str] = None
+    metrics: Optional[dict] = None
 
 # FastAPI app
 app = FastAPI(
@@ -56,23 +89,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Run each request in a server span that continues the caller's traceparent header"""
+    with tracer.span(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get("traceparent"),
+        attributes={"http.method": request.method, "http.route": request.url.path},
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+    response.headers["traceresponse"] = span.traceparent
+    return response
+
+class FirstTokenTimer(StoppingCriteria):
+    """Records when the first new token is produced, splitting generate() into prefill and decode loop"""
+
+    def __init__(self):
+        self.first_token_time = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_time is None:
+            self.first_token_time = time.time()
+        # Never stops generation by itself
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
 def load_model():
     """Load the VLM model and processor"""
     global model, processor
 
-    print(f"Loading model from: {MODEL_PATH}")
+    print(f"Loading model from: {MODEL_PATH} (load mode: {MODEL_LOAD_MODE})")
+
+    if MODEL_PATH == TINY_MODEL_PATH:
+        # Random-weight model for benchmarks (no download, runs on CPU)
+        load_state.enter("loading")
+        model, processor = build_tiny_model(device="cuda" if torch.cuda.is_available() else "cpu")
+        print("🧪 Tiny random-weight model loaded (benchmark mode, output is meaningless)")
+        return
+
+    if MODEL_LOAD_MODE not in ("default", "mmap"):
+        raise ValueError(f"Unknown MODEL_LOAD_MODE: {MODEL_LOAD_MODE}")
 
     try:
+        model_source = MODEL_PATH
+        if MODEL_LOAD_MODE == "mmap":
+            load_state.enter("resolving", MODEL_PATH)
+            model_source = resolve_checkpoint(MODEL_PATH)
+            load_state.enter("prefetching")
+            prefetch_safetensors(model_source, load_state)
+
+        load_state.enter("loading")
         # Load processor
-        processor = AutoProcessor.from_pretrained(MODEL_PATH, trust_remote_code=True)
+        processor = AutoProcessor.from_pretrained(model_source, trust_remote_code=True)
 
-        # Load model
+        # Load model (safetensors shards are memory-mapped; mmap mode refuses pickle weights)
         model = AutoModelForCausalLM.from_pretrained(
-            MODEL_PATH,
+            model_source,
             device_map="cuda" if torch.cuda.is_available() else "cpu",
             torch_dtype=torch.bfloat16 if torch.cuda.is_available() else torch.float32,
             trust_remote_code=True,
-            attn_implementation='sdpa'
+            attn_implementation='sdpa',
+            use_safetensors=True if MODEL_LOAD_MODE == "mmap" else None,
         )
 
         print("Model loaded successfully!")
@@ -128,15 +205,42 @@ def resize_image_to_target_pixels(image: Image.Image, target_pixels: int = 26214
 
     return resized_image
 
+def reset_peak_memory():
+    """Start a new peak memory measurement (CUDA only; the CPU peak is process-wide)"""
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+def peak_memory_bytes() -> int:
+    """Peak CUDA memory allocated since reset_peak_memory(), or the process peak RSS on CPU"""
+    if torch.cuda.is_available():
+        return int(torch.cuda.max_memory_allocated())
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
 def generate_vlm_response(image: Image.Image, text: str, temperature: float,
-                         top_p: float, max_new_tokens: int, repetition_penalty: float) -> str:
-    """Generate response from VLM model"""
+                         top_p: float, max_new_tokens: int, repetition_penalty: float,
+                         stats: Optional[dict] = None, max_sentences: Optional[int] = None,
+                         stop_strings: Optional[List[str]] = None, language: Optional[str] = None) -> str:
+    """
+    Generate response from VLM model
+
+    If a stats dict is given, it is filled with the processor preprocessing time, prompt token
+    count, prefill latency, decode speed, generated token count and peak memory of this request,
+    and with why generation stopped and how many tokens early stopping saved.
+
+    Generation stops after max_sentences sentences or lines, or at a stop string (the output is
+    cut at that point), and max_new_tokens is capped by the language's token budget.
+    """
     global model, processor
 
+    if stats is None:
+        stats = {}
+
     if model is None or processor is None:
         raise HTTPException(status_code=500, detail="Model not loaded")
 
-
+    try:
         # Prepare message format for chat template
         message = [
             {
@@ -154,30 +258,80 @@ def generate_vlm_response(image: Image.Image, text: str, temperature: float,
             }
         ]
 
-        # Apply chat template
-        text_prompt = processor.apply_chat_template(message, add_generation_prompt=True)
+        reset_peak_memory()
+        preprocess_start = time.time()
+        with tracer.span("preprocess"):
+            # Apply chat template
+            text_prompt = processor.apply_chat_template(message, add_generation_prompt=True)
+
+            # Process inputs
+            inputs = processor(
+                text=[text_prompt],
+                images=[image],
+                return_tensors="pt",
+            )
 
-        # Process inputs
-        inputs = processor(
-            text=[text_prompt],
-            images=[image],
-            return_tensors="pt",
-        )
+            # Move to device
+            inputs = inputs.to(model.device)
+        stats["preprocess_seconds"] = time.time() - preprocess_start
 
-        # Move to device
-        inputs = inputs.to(model.device)
+        input_tokens = int(inputs.input_ids.shape[1])
+        token_budget = TOKEN_BUDGETS.get((language or "").lower())
+        token_limit = min(max_new_tokens, token_budget) if token_budget else max_new_tokens
+        criteria = StoppingCriteriaList()
+        timer = FirstTokenTimer()
+        criteria.append(timer)
+        text_stop = TextStoppingCriteria(processor.tokenizer, input_tokens, max_sentences, stop_strings or ())
+        if text_stop.active:
+            criteria.append(text_stop)
 
         # Generate response
         print("Starting generation...")
+        generate_start = time.time()
         with torch.inference_mode():
             output_ids = model.generate(
                 **inputs,
-                max_new_tokens=max_new_tokens,
+                max_new_tokens=token_limit,
                 temperature=temperature,
                 top_p=top_p,
                 repetition_penalty=repetition_penalty,
                 do_sample=True,
+                stopping_criteria=criteria,
             )
+        generate_end = time.time()
+
+        # Prefill runs until the first new token; the rest is the token-by-token decode loop
+        first_token_time = timer.first_token_time or generate_end
+        generated_tokens = int(output_ids.shape[1]) - input_tokens
+        if text_stop.reason:
+            stop_reason = text_stop.reason
+        elif generated_tokens >= token_limit:
+            stop_reason = "token_budget" if token_limit < max_new_tokens else "max_new_tokens"
+        else:
+            stop_reason = "eos"
+        tracer.record_span("prefill", generate_start, first_token_time, {"input_tokens": input_tokens})
+        tracer.record_span(
+            "decode_loop",
+            first_token_time,
+            generate_end,
+            {"output_tokens": generated_tokens, "max_new_tokens": token_limit, "stop_reason": stop_reason},
+        )
+
+        decode_seconds = generate_end - first_token_time
+        stats.update({
+            "prompt_tokens": input_tokens,
+            "prefill_seconds": first_token_time - generate_start,
+            "generated_tokens": generated_tokens,
+            # The first token is produced by the prefill step
+            "decode_tokens_per_second": (generated_tokens - 1) / decode_seconds
+            if generated_tokens > 1 and decode_seconds > 0 else None,
+            "generation_seconds": generate_end - generate_start,
+            "peak_memory_bytes": peak_memory_bytes(),
+            "stop_reason": stop_reason,
+            # Tokens below the requested max_new_tokens that early stopping or the budget cut off
+            # (an upper bound: without them the model might have ended with EOS sooner)
+            "tokens_saved": max_new_tokens - generated_tokens if stop_reason not in ("eos", "max_new_tokens") else 0,
+        })
 
         # Decode generated text
         generated_ids = [
@@ -188,15 +342,56 @@ def generate_vlm_response(image: Image.Image, text: str, temperature: float,
             generated_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True
         )
 
+        if text_stop.active:
+            return truncate_text(output_text[0], max_sentences, text_stop.stop_strings)
         return output_text[0]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+def warmup_model():
+    """
+    Run short generations over representative image sizes before accepting traffic
+
+    The first generate() of each input shape pays kernel selection, allocator growth and
+    lazy initialization; doing it here keeps that cost off the first real requests. It runs
+    on the generation worker so per-thread state (e.g. cuBLAS handles) is warmed too.
+    """
+    if not WARMUP_IMAGE_SIZES:
+        return
+
+    load_state.enter("warming_up")
+    for i, (width, height) in enumerate(WARMUP_IMAGE_SIZES):
+        image = resize_image_to_target_pixels(Image.new("RGB", (width, height), (128, 128, 128)))
+        start = time.time()
+        generation_executor.submit(
+            generate_vlm_response, image, "画像を説明してください。", 0.7, 0.95, WARMUP_MAX_NEW_TOKENS, 1.2
+        ).result()
+        load_state.set_progress(i + 1, len(WARMUP_IMAGE_SIZES), f"{width}x{height}")
+        print(f"🔥 Warmup {width}x{height}: {time.time() - start:.2f}s")
+
+def start_model():
+    """Load and warm up the model, then mark the server ready (runs in a background thread)"""
+    try:
+        load_model()
+        warmup_model()
+        load_state.enter("ready")
+        snapshot = load_state.snapshot()
+        print(f"✅ Model ready in {snapshot['elapsed_seconds']:.1f}s {snapshot['phase_seconds']}")
+    except BaseException as e:
+        load_state.fail(e)
+        print(f"❌ Model startup failed: {e}")
+        traceback.print_exc()
+
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup"""
-    load_model()
+    """Start loading the model in the background so liveness checks are answered during startup"""
+    threading.Thread(target=start_model, name="model-loader", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the span file of the file exporter"""
+    tracer.close()
 
 @app.get("/")
 async def root():
@@ -209,9 +404,35 @@ async def health_check():
     return {
         "status": "healthy",
         "model_loaded": model is not None and processor is not None,
-        "device": str(model.device) if model else "unknown"
+        "ready": load_state.ready,
+        "startup": load_state.snapshot(),
+        "device": str(model.device) if model else "unknown",
+        "queue_depth": inference_metrics.queue_depth,
+        "recent": inference_metrics.summary(),
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness: the process is serving requests (503 only if model startup failed, so it gets restarted)"""
+    if load_state.failed:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": load_state.error})
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: the model is loaded and warmed up (503 with startup progress until then)"""
+    snapshot = load_state.snapshot()
+    if not load_state.ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready", **snapshot})
+    return {"status": "ready", **snapshot}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Inference metrics in the Prometheus text format (rolling p50/p95/p99 as summaries)"""
+    return PlainTextResponse(
+        inference_metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.post("/inference", response_model=VLMResponse)
 async def vlm_inference(
     image: UploadFile = File(..., description="Image file (PNG, JPG, etc.)"),
@@ -219,7 +440,11 @@ async def vlm_inference(
     temperature: Optional[float] = Form(0.7, description="Temperature for generation"),
     top_p: Optional[float] = Form(0.95, description="Top-p value for generation"),
     max_new_tokens: Optional[int] = Form(512, description="Maximum number of new tokens"),
-    repetition_penalty: Optional[float] = Form(1.2, description="Repetition penalty")
+    repetition_penalty: Optional[float] = Form(1.2, description="Repetition penalty"),
+    max_sentences: Optional[int] = Form(None, description="Stop after this many sentences or lines (0: off)"),
+    stop: Optional[List[str]] = Form(None, description="Stop strings (repeat the field for several)"),
+    language: Optional[str] = Form(None, description="Output language, selects the token budget"),
+    return_metrics: bool = Form(False, description="Include this request's inference metrics in the response")
 ):
     """
     VLM inference endpoint
@@ -233,8 +458,23 @@ async def vlm_inference(
     - **top_p**: Nucleus sampling parameter (0.1-1.0, default: 0.95)
     - **max_new_tokens**: Maximum tokens to generate (1-2048, default: 512)
     - **repetition_penalty**: Penalty for repetition (1.0-2.0, default: 1.2)
+    - **max_sentences**: Stop after N sentences or lines (default: STOP_MAX_SENTENCES)
+    - **stop**: Stop strings; the output ends before the first one (default: STOP_STRINGS)
+    - **language**: Output language; caps max_new_tokens with its TOKEN_BUDGETS entry
+    - **return_metrics**: Include queue wait, token counts, prefill/decode timings and peak memory in the response
     """
 
+    if not load_state.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model is not ready ({load_state.phase})",
+            headers={"Retry-After": "5"},
+        )
+
+    request_start = time.time()
+    stats = {}
+    status = "error"
+    inference_metrics.request_started()
     try:
         # Validate parameters
         if not 0.1 <= temperature <= 2.0:
@@ -245,22 +485,53 @@ async def vlm_inference(
             raise HTTPException(status_code=400, detail="max_new_tokens must be between 1 and 2048")
         if not 1.0 <= repetition_penalty <= 2.0:
             raise HTTPException(status_code=400, detail="repetition_penalty must be between 1.0 and 2.0")
+        if max_sentences is None:
+            max_sentences = STOP_MAX_SENTENCES
+        if max_sentences < 0:
+            raise HTTPException(status_code=400, detail="max_sentences must be 0 or more")
+        stop_strings = stop if stop is not None else STOP_STRINGS
 
         # Read and process image
         image_data = await image.read()
-        processed_image = process_image_binary(image_data)
+        image_start = time.time()
+        with tracer.span("image_decode", attributes={"bytes": len(image_data)}):
+            processed_image = process_image_binary(image_data)
 
         # Resize image to optimal size for VLM processing
-        resized_image = resize_image_to_target_pixels(processed_image)
+        with tracer.span("resize"):
+            resized_image = resize_image_to_target_pixels(processed_image)
+        image_seconds = time.time() - image_start
+
+        # Generate response on the generation worker (copying the context keeps the trace spans)
+        queued_at = time.time()
+
+        def run_generation():
+            stats["queue_wait_seconds"] = time.time() - queued_at
+            inference_metrics.queue_left()
+            return generate_vlm_response(
+                resized_image, text, temperature, top_p, max_new_tokens, repetition_penalty, stats,
+                max_sentences, stop_strings, language,
+            )
 
-        # Generate response
-        generated_text = generate_vlm_response(
-            resized_image, text, temperature, top_p, max_new_tokens, repetition_penalty
-        )
+        inference_metrics.queue_entered()
+        context = contextvars.copy_context()
+        try:
+            generated_text = await asyncio.get_running_loop().run_in_executor(
+                generation_executor, context.run, run_generation
+            )
+        finally:
+            if "queue_wait_seconds" not in stats:
+                inference_metrics.queue_left()
+
+        stats["image_preprocess_seconds"] = image_seconds + stats.pop("preprocess_seconds", 0.0)
+        stats["total_seconds"] = time.time() - request_start
+        status = "ok"
 
         return VLMResponse(
             generated_text=generated_text,
-            success=True
+            success=True,
+            metrics={name: round(value, 4) if isinstance(value, float) else value for name, value in stats.items()}
+            if return_metrics else None
         )
 
     except HTTPException:
@@ -274,13 +545,14 @@ async def vlm_inference(
         )
     except Exception as e:
         # Unexpected errors - log for debugging
-        import traceback
         traceback.print_exc()
         return VLMResponse(
             generated_text="",
             success=False,
             error_message=f"Unexpected error: {str(e)}"
         )
+    finally:
+        inference_metrics.request_finished(status, stats if status == "ok" else None)
 
 def setup_ngrok():
     """Setup ngrok tunnel with optional fixed domain and HTTPS-only configuration"""
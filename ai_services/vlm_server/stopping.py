@@ -0,0 +1,155 @@
+"""
+Early stopping for HUD-sized answers
+
+The HUD shows a few lines, but generate() otherwise runs until EOS or max_new_tokens.
+TextStoppingCriteria stops a generation once the text has N complete sentences (or
+lines) or contains a stop string, and truncate_text cuts the decoded output at the
+same point (the token that ended the sentence may carry a few more characters).
+List markers ("1. ", "a) ") and abbreviations ("Mr. ", "e.g. ") are not sentences.
+The criteria decode only the tokens added since the previous step and keep a running
+sentence count, so checking stays linear in the output length.
+
+Per-language token budgets cap max_new_tokens for languages whose answers need fewer
+tokens (e.g. TOKEN_BUDGETS="japanese:160,english:96").
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence
+
+import torch
+from transformers import StoppingCriteria
+
+# End of a sentence or line: full-width terminators, ASCII terminators followed by
+# whitespace (so "3.5" or "e.g." mid-word do not count), or line breaks
+SENTENCE_END = re.compile(r"[。！？]+[」』）)]*\s*|[.!?]+[\"')]*\s+|\n+")
+
+# Segments that end in "." but are not sentences: list markers and abbreviations
+ENUMERATOR = re.compile(r"[(\[]?(?:\d+|[A-Za-z]|[ivxlcdmIVXLCDM]+|[①-⑳])[)\]]?|[-*•・]")
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "mt", "no", "vs", "approx", "e.g", "i.e", "cf"}
+
+# Tokens decoded together at most while waiting for a complete character
+MAX_PENDING_TOKENS = 16
+
+
+def _is_sentence(segment: str) -> bool:
+    segment = segment.strip()
+    if not segment or ENUMERATOR.fullmatch(segment):
+        return False
+    words = segment.split()
+    return words[-1].rstrip(".").lower() not in ABBREVIATIONS
+
+
+def _scan_sentences(text: str, start: int) -> List[int]:
+    """
+    Offsets just after each complete sentence found from `start` (a previous sentence
+    end or 0), with the position the next scan should start from as the last item
+    """
+    ends = []
+    last = start
+    for match in SENTENCE_END.finditer(text, start):
+        segment = text[last:match.start()]
+        if _is_sentence(segment):
+            ends.append(match.end())
+        elif segment.strip():
+            # A list marker or abbreviation stays part of the sentence that follows it
+            continue
+        last = match.end()
+    return ends + [last]
+
+
+def sentence_ends(text: str) -> List[int]:
+    """Offsets just after each complete sentence or line (empty lines, list markers and abbreviations are not counted)"""
+    return _scan_sentences(text, 0)[:-1]
+
+
+def truncate_text(text: str, max_sentences: Optional[int] = None, stop_strings: Sequence[str] = ()) -> str:
+    """Cut the text before the first stop string and after max_sentences sentences"""
+    positions = [text.find(stop) for stop in stop_strings if stop and stop in text]
+    if positions:
+        text = text[:min(positions)].rstrip()
+    if max_sentences:
+        ends = sentence_ends(text)
+        if len(ends) >= max_sentences:
+            text = text[:ends[max_sentences - 1]].rstrip()
+    return text
+
+
+def parse_token_budgets(value: str) -> Dict[str, int]:
+    """Parse "japanese:160,english:96" into {"japanese": 160, "english": 96}"""
+    budgets = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        language, _, tokens = item.partition(":")
+        try:
+            budgets[language.strip().lower()] = int(tokens)
+        except ValueError:
+            raise ValueError(f"Invalid token budget: {item} (expected LANGUAGE:TOKENS)") from None  # noqa: TRY003
+    return budgets
+
+
+class TextStoppingCriteria(StoppingCriteria):
+    """Stops each sequence after max_sentences sentences or at a stop string, recording why"""
+
+    def __init__(self, tokenizer, prompt_length: int, max_sentences: Optional[int] = None,
+                 stop_strings: Sequence[str] = ()):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.max_sentences = max_sentences
+        self.stop_strings = [stop for stop in stop_strings if stop]
+        self._longest_stop = max((len(stop) for stop in self.stop_strings), default=0)
+        self.reason: Optional[str] = None
+        # Per sequence: decoded tokens, text since the last sentence end, sentence count,
+        # and the end of the text so far (for stop strings spanning two steps)
+        self._rows: List[dict] = []
+
+    @property
+    def active(self) -> bool:
+        return bool(self.max_sentences or self.stop_strings)
+
+    def _decode_new(self, ids, state: dict) -> str:
+        """Text of the tokens added since the last call (one token of context keeps word spacing)"""
+        decoded = state["tokens"]
+        if decoded >= len(ids):
+            return ""
+        context_start = max(decoded - 1, 0)
+        prefix = self.tokenizer.decode(ids[context_start:decoded], skip_special_tokens=True)
+        text = self.tokenizer.decode(ids[context_start:], skip_special_tokens=True)
+        # Wait for the rest of a character split across tokens
+        if (text.endswith("\ufffd") or not text.startswith(prefix)) and len(ids) - decoded < MAX_PENDING_TOKENS:
+            return ""
+        state["tokens"] = len(ids)
+        return text[len(prefix):]
+
+    def _update(self, state: dict, new_text: str) -> Optional[str]:
+        """Add newly decoded text; "stop_string" or "sentences" once the sequence is complete"""
+        if self.stop_strings:
+            window = state["stop_window"] + new_text
+            if any(stop in window for stop in self.stop_strings):
+                return "stop_string"
+            state["stop_window"] = window[len(window) - self._longest_stop + 1:] if self._longest_stop > 1 else ""
+        if self.max_sentences:
+            tail = state["tail"] + new_text
+            *ends, next_start = _scan_sentences(tail, 0)
+            state["sentences"] += len(ends)
+            state["tail"] = tail[next_start:]
+            if state["sentences"] >= self.max_sentences:
+                return "sentences"
+        return None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if not self._rows:
+            self._rows = [
+                {"tokens": 0, "tail": "", "sentences": 0, "stop_window": ""} for _ in range(input_ids.shape[0])
+            ]
+        done = []
+        for row, state in zip(input_ids, self._rows):
+            reason = state.get("reason")
+            if reason is None:
+                new_text = self._decode_new(row[self.prompt_length:], state)
+                reason = state["reason"] = self._update(state, new_text) if new_text else None
+                if reason and self.reason is None:
+                    self.reason = reason
+            done.append(reason is not None)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,122 @@
+"""
+Tiny random-weight vision-language model for benchmarks
+
+Builds a LLaVA-style model (CLIP vision tower + 2-layer Llama decoder) with random
+weights and a byte-level tokenizer, entirely in memory. It runs on CPU in milliseconds
+and needs no model download, so the server's request handling, preprocessing, queueing
+and batching can be measured without a GPU. Its output is meaningless text.
+
+The image path matches the real model's shape of work: the resized image goes through
+the image processor (224x224, 256 image tokens) and the chat template before generate().
+End-of-sequence is disabled so every request generates exactly max_new_tokens, which
+keeps benchmark runs comparable.
+
+Selected in serve_vlm.py with MODEL_PATH=tiny-random.
+"""
+
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from transformers import (
+    CLIPImageProcessor,
+    CLIPVisionConfig,
+    LlamaConfig,
+    LlavaConfig,
+    LlavaForConditionalGeneration,
+    LlavaProcessor,
+    PreTrainedTokenizerFast,
+)
+
+TINY_MODEL_PATH = "tiny-random"
+
+IMAGE_SIZE = 224
+PATCH_SIZE = 14
+IMAGE_TOKEN = "<image>"
+
+CHAT_TEMPLATE = (
+    "{% for message in messages %}"
+    "<s>{{ message['role'] }}: "
+    "{% for content in message['content'] %}"
+    "{% if content['type'] == 'image' %}" + IMAGE_TOKEN + "{% else %}{{ content['text'] }}{% endif %}"
+    "{% endfor %}</s>"
+    "{% endfor %}"
+    "{% if add_generation_prompt %}<s>assistant: {% endif %}"
+)
+
+
+def build_tokenizer():
+    """Byte-level tokenizer (256 byte tokens + special tokens) built without any vocabulary file"""
+    vocab = {symbol: i for i, symbol in enumerate(sorted(pre_tokenizers.ByteLevel.alphabet()))}
+    for token in ("<pad>", "<s>", "</s>", IMAGE_TOKEN):
+        vocab[token] = len(vocab)
+
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        pad_token="<pad>",
+        bos_token="<s>",
+        eos_token="</s>",
+        extra_special_tokens={"image_token": IMAGE_TOKEN},
+    )
+    # Batched generation appends new tokens on the right
+    tokenizer.padding_side = "left"
+    return tokenizer
+
+
+def build_tiny_model(seed: int = 0, device: str = "cpu"):
+    """
+    Build the tiny model and its processor
+
+    Args:
+        seed: Seed for the random weights (same seed, same model)
+        device: Device to put the model on
+
+    Returns:
+        (model, processor)
+    """
+    tokenizer = build_tokenizer()
+    image_processor = CLIPImageProcessor(
+        size={"shortest_edge": IMAGE_SIZE},
+        crop_size={"height": IMAGE_SIZE, "width": IMAGE_SIZE},
+    )
+    processor = LlavaProcessor(
+        image_processor=image_processor,
+        tokenizer=tokenizer,
+        patch_size=PATCH_SIZE,
+        vision_feature_select_strategy="default",
+        num_additional_image_tokens=1,
+        chat_template=CHAT_TEMPLATE,
+    )
+
+    config = LlavaConfig(
+        vision_config=CLIPVisionConfig(
+            hidden_size=64,
+            intermediate_size=128,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            image_size=IMAGE_SIZE,
+            patch_size=PATCH_SIZE,
+        ),
+        text_config=LlamaConfig(
+            vocab_size=len(tokenizer),
+            hidden_size=128,
+            intermediate_size=256,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            num_key_value_heads=2,
+            max_position_embeddings=4096,
+        ),
+        image_token_index=tokenizer.convert_tokens_to_ids(IMAGE_TOKEN),
+        vision_feature_select_strategy="default",
+        vision_feature_layer=-1,
+    )
+
+    torch.manual_seed(seed)
+    model = LlavaForConditionalGeneration(config).to(device).eval()
+    # Always generate max_new_tokens (random weights would stop at a random point)
+    model.generation_config.eos_token_id = None
+    model.generation_config.pad_token_id = tokenizer.pad_token_id
+
+    return model, processor
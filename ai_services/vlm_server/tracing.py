@@ -0,0 +1,285 @@
+"""
+Tracing Module
+
+This module provides lightweight distributed tracing compatible with the W3C
+Trace Context `traceparent` header, without an OpenTelemetry dependency.
+Spans are kept in a context variable so nested stages become child spans,
+incoming `traceparent` headers continue the caller's trace, and the current
+context can be forwarded to upstream services (the VLM server, RAG APIs) so
+one capture can be followed end to end.
+
+This is a copy of ai_services/ai-backend/src/tracing.py (apart from the
+default service name). The backend image only contains ai-backend/src and
+the VLM server runs from its own directory on the GPU host, so neither can
+import the other; change both files together.
+
+Finished spans are exported offline, configured by environment variables:
+
+TRACE_EXPORTER: "none" (default), "console" or "file"
+TRACE_FILE: JSON Lines file for the file exporter (default: traces.jsonl)
+TRACE_SERVICE_NAME: Service name recorded on each span
+
+Spans written by several services to their files can be merged and shown as
+a waterfall:
+
+    python tracing.py traces.jsonl ../ai-backend/traces.jsonl
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_time: Optional[float] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = start_time if start_time is not None else time.time()
+        self.end_time: Optional[float] = None
+        self.status = "ok"
+
+    @property
+    def traceparent(self) -> str:
+        """W3C `traceparent` header value identifying this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self, service: str) -> Dict[str, Any]:
+        end_time = self.end_time if self.end_time is not None else time.time()
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "service": service,
+            "start_time_unix_nano": int(self.start_time * 1e9),
+            "end_time_unix_nano": int(end_time * 1e9),
+            "duration_ms": round((end_time - self.start_time) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Creates spans and exports them when they finish."""
+
+    def __init__(self, service: str, exporter: str = "none", path: str = "traces.jsonl"):
+        """
+        Args:
+            service: Service name recorded on each span
+            exporter: "none", "console" or "file"
+            path: Output path for the file exporter
+        """
+        if exporter not in ("none", "console", "file"):
+            raise ValueError(f"Unknown TRACE_EXPORTER: {exporter}")  # noqa: TRY003
+        self.service = service
+        self.exporter = exporter
+        self.path = path
+        self._lock = threading.Lock()
+        # Span file of the file exporter, opened on the first span and kept open
+        self._file = None
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+            f"current_span_{id(self)}", default=None
+        )
+
+    @classmethod
+    def from_env(cls, default_service: str) -> "Tracer":
+        return cls(
+            service=os.getenv("TRACE_SERVICE_NAME", default_service),
+            exporter=os.getenv("TRACE_EXPORTER", "none"),
+            path=os.getenv("TRACE_FILE", "traces.jsonl"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter != "none"
+
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    def current_traceparent(self) -> Optional[str]:
+        """`traceparent` value to forward to upstream calls, or None outside a trace."""
+        span = self._current.get()
+        return span.traceparent if span else None
+
+    def inject(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Return the headers with the current `traceparent` added."""
+        headers = dict(headers or {})
+        traceparent = self.current_traceparent()
+        if traceparent:
+            headers["traceparent"] = traceparent
+        return headers
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Span]:
+        """
+        Run a block inside a new span.
+
+        The span is a child of the current span. If there is none, it continues
+        the trace in `traceparent` (e.g. an incoming request header) or starts
+        a new trace.
+        """
+        parent = self._current.get()
+        if parent:
+            trace_id, parent_span_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_span_id = parse_traceparent(traceparent) or (secrets.token_hex(16), None)
+
+        span = Span(name, trace_id, parent_span_id, attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set_attribute("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._current.reset(token)
+            span.end_time = time.time()
+            self.export(span)
+
+    def record_span(
+        self,
+        name: str,
+        start_time: float,
+        end_time: float,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Span]:
+        """Export an already finished child span of the current span (times from time.time())."""
+        parent = self._current.get()
+        if not parent:
+            return None
+        span = Span(name, parent.trace_id, parent.span_id, attributes, start_time=start_time)
+        span.end_time = end_time
+        self.export(span)
+        return span
+
+    def export(self, span: Span) -> None:
+        if self.exporter == "none":
+            return
+        record = span.to_dict(self.service)
+        if self.exporter == "console":
+            parent = (record["parent_span_id"] or "-")[:8]
+            print(
+                f"[trace] {record['trace_id'][:8]} {record['span_id'][:8]} <- {parent} "
+                f"{self.service}/{record['name']} {record['duration_ms']:.1f}ms"
+            )
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                # Line-buffered, so each span is a single write and is on disk if the process dies
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)  # noqa: SIM115
+            self._file.write(line)
+
+    def close(self) -> None:
+        """Close the span file (it is reopened if another span is exported)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple[str, str]]:
+    """
+    Parse a W3C `traceparent` header.
+
+    Returns:
+        (trace_id, parent_span_id), or None if the header is missing or invalid
+    """
+    if not header:
+        return None
+    match = TRACEPARENT_PATTERN.match(header.strip().lower())
+    if not match:
+        return None
+    trace_id, span_id, _ = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id
+
+
+tracer = Tracer.from_env("vlm-server")
+
+
+def load_spans(paths: List[str]) -> List[Dict[str, Any]]:
+    spans = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    spans.append(json.loads(line))
+    return spans
+
+
+def print_waterfall(spans: List[Dict[str, Any]]) -> None:
+    """Print the spans of one trace as an indented waterfall (offsets from the trace start)."""
+    spans = sorted(spans, key=lambda span: span["start_time_unix_nano"])
+    trace_start = spans[0]["start_time_unix_nano"]
+    ids = {span["span_id"] for span in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in spans:
+        parent = span["parent_span_id"] if span["parent_span_id"] in ids else None
+        children.setdefault(parent, []).append(span)
+
+    def show(span: Dict[str, Any], depth: int) -> None:
+        offset = (span["start_time_unix_nano"] - trace_start) / 1e6
+        status = "" if span["status"] == "ok" else f" [{span['status']}]"
+        print(
+            f"  {offset:9.1f}ms {span['duration_ms']:9.1f}ms  "
+            f"{'  ' * depth}{span['service']}/{span['name']}{status}"
+        )
+        for child in children.get(span["span_id"], []):
+            show(child, depth + 1)
+
+    print(f"trace {spans[0]['trace_id']}")
+    print(f"  {'start':>11s} {'duration':>11s}")
+    for root in children.get(None, []):
+        show(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show traces exported by the file exporter")
+    parser.add_argument("files", nargs="+", help="Span files (JSON Lines) to merge")
+    parser.add_argument("--trace-id", help="Trace to show (default: the latest trace)")
+    args = parser.parse_args()
+
+    spans = load_spans(args.files)
+    if not spans:
+        print("No spans found")
+        sys.exit(1)
+
+    trace_id = args.trace_id or max(spans, key=lambda span: span["start_time_unix_nano"])["trace_id"]
+    print_waterfall([span for span in spans if span["trace_id"] == trace_id])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+複数地域の一括生成
+
+地域名のリスト、または緯度経度の範囲をタイル状に分割した検索範囲から観光スポットを集め、
+重複を除いた上で1つのJSONにまとめて生成する。
+
+使い方:
+    python batch_generate.py 銀座 有楽町 日本橋 --output chuo_tourist_spots.json
+    python batch_generate.py --bbox 35.65 139.74 35.70 139.79 --tile-km 1 --output chuo_tourist_spots.json
+    python batch_generate.py --regions-file regions.txt --output tokyo_tourist_spots.json --resume
+"""
+
+import argparse
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from tourist_spot_generator import SpotFinder, TouristSpotGenerator, load_config
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """2点間の距離（メートル）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * 1000 * math.asin(math.sqrt(a))
+
+
+def make_tiles(
+    lat_min: float,
+    lng_min: float,
+    lat_max: float,
+    lng_max: float,
+    tile_km: float
+) -> List[Tuple[str, Dict]]:
+    """
+    緯度経度の範囲を約tile_km四方のタイルに分割
+
+    Returns:
+        (タイル名, Places APIのrectangle) のリスト
+    """
+    lat_step = tile_km / 111.0
+    lng_step = tile_km / (111.0 * math.cos(math.radians((lat_min + lat_max) / 2)))
+    rows = max(math.ceil((lat_max - lat_min) / lat_step), 1)
+    cols = max(math.ceil((lng_max - lng_min) / lng_step), 1)
+
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            low_lat = lat_min + row * lat_step
+            low_lng = lng_min + col * lng_step
+            rectangle = {
+                "low": {"latitude": low_lat, "longitude": low_lng},
+                "high": {
+                    "latitude": min(low_lat + lat_step, lat_max),
+                    "longitude": min(low_lng + lng_step, lng_max)
+                }
+            }
+            tiles.append((f"tile_{row}_{col}", rectangle))
+    return tiles
+
+
+def _normalize_name(name: str) -> str:
+    return re.sub(r"[\s・\-（）()]", "", name).lower()
+
+
+def dedupe_spots(spots: List[Dict], radius_m: float = 30) -> List[Dict]:
+    """
+    重複スポットを除去（先に出現したものを残す）
+
+    place_idが一致するもの、または radius_m 以内にあり名称が一致（一方が他方を含む）するものを重複とみなす。
+    近傍判定は約radius_m四方のグリッドで候補を絞ってから距離を計算する。
+    """
+    seen_ids = set()
+    cell_deg = max(radius_m, 1) / 111000.0
+    grid: Dict[Tuple[int, int], List[Dict]] = {}
+    unique = []
+
+    for spot in spots:
+        place_id = spot.get("place_id")
+        if place_id and place_id in seen_ids:
+            continue
+
+        cell = (int(spot["latitude"] // cell_deg), int(spot["longitude"] // cell_deg))
+        name = _normalize_name(spot["name"])
+        duplicate = False
+        for dlat in (-1, 0, 1):
+            for dlng in (-1, 0, 1):
+                for other in grid.get((cell[0] + dlat, cell[1] + dlng), []):
+                    other_name = _normalize_name(other["name"])
+                    if (name in other_name or other_name in name) and haversine_m(
+                        spot["latitude"], spot["longitude"], other["latitude"], other["longitude"]
+                    ) <= radius_m:
+                        duplicate = True
+                        break
+                if duplicate:
+                    break
+            if duplicate:
+                break
+        if duplicate:
+            continue
+
+        if place_id:
+            seen_ids.add(place_id)
+        grid.setdefault(cell, []).append(spot)
+        unique.append(spot)
+
+    return unique
+
+
+def discover_spots(
+    finder: SpotFinder,
+    searches: List[Dict],
+    max_spots_per_search: int,
+    workers: int,
+    dedupe_meters: float
+) -> List[Dict]:
+    """
+    複数の検索を並行実行し、重複を除いたスポット一覧を返す
+
+    Args:
+        finder: SpotFinder（リクエストレートは finder の limiter で全体制限される）
+        searches: find_spots の引数（region_name, query, rectangle）のリスト
+        max_spots_per_search: 検索1件あたりの最大取得数
+        workers: 同時に実行する検索数
+        dedupe_meters: 重複判定の距離（メートル）
+
+    Returns:
+        検索順に並べた重複なしのスポット一覧
+    """
+    def run(search: Dict) -> List[Dict]:
+        try:
+            return finder.find_spots(max_spots=max_spots_per_search, **search)
+        except Exception as e:
+            print(f"  [WARN] 検索失敗: {search['region_name']} - {e}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = list(executor.map(run, searches))
+
+    all_spots = [spot for spots in results for spot in spots]
+    unique = dedupe_spots(all_spots, dedupe_meters)
+    print(f"\n[OK] 検索 {len(searches)}件: {len(all_spots)}箇所 → 重複除去後 {len(unique)}箇所")
+    return unique
+
+
+def build_searches(args: argparse.Namespace) -> List[Dict]:
+    """コマンドライン引数から検索リストを作成"""
+    regions = list(args.regions)
+    if args.regions_file:
+        with open(args.regions_file, "r", encoding="utf-8") as f:
+            regions.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    searches = [{"region_name": region} for region in regions]
+
+    if args.bbox:
+        for name, rectangle in make_tiles(*args.bbox, args.tile_km):
+            searches.append({"region_name": name, "query": args.query, "rectangle": rectangle})
+
+    return searches
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="複数地域の観光スポット一括生成")
+    parser.add_argument("regions", nargs="*", help="地域名（複数指定可）")
+    parser.add_argument("--regions-file", help="地域名を1行1件で記載したファイル")
+    parser.add_argument(
+        "--bbox", nargs=4, type=float, metavar=("LAT_MIN", "LNG_MIN", "LAT_MAX", "LNG_MAX"),
+        help="タイル分割して検索する範囲"
+    )
+    parser.add_argument("--tile-km", type=float, default=1.0, help="タイルの一辺（km）")
+    parser.add_argument("--query", default="観光スポット", help="タイル検索時の検索クエリ")
+    parser.add_argument("--max-spots-per-region", type=int, default=60,
+                        help="地域・タイルごとの最大取得数（APIの上限は60）")
+    parser.add_argument("--region-workers", type=int, default=4, help="同時に検索する地域・タイル数")
+    parser.add_argument("--dedupe-meters", type=float, default=30, help="重複とみなす距離（メートル）")
+    parser.add_argument("--output", required=True, help="出力JSONファイル")
+    parser.add_argument("--config", default="config.yaml", help="設定ファイル")
+    parser.add_argument("--resume", action="store_true", help="前回中断したジャーナルから再開")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    searches = build_searches(args)
+    if not searches:
+        print("地域名、--regions-file、--bbox のいずれかを指定してください。")
+        return
+
+    config = load_config(args.config)
+    generator = TouristSpotGenerator(config=config)
+
+    label = f"一括生成 ({len(searches)}件の地域・タイル)"
+    generator.generate_spots(
+        label,
+        lambda: discover_spots(
+            generator.spot_finder,
+            searches,
+            args.max_spots_per_region,
+            args.region_workers,
+            args.dedupe_meters
+        ),
+        args.output,
+        resume=args.resume
+    )
+
+
+if __name__ == "__main__":
+    main()
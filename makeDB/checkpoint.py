@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+地域生成の途中経過を保存するチェックポイントジャーナル
+
+追記専用のJSONLファイルに、1行目で実行情報（検索したスポット一覧）を、
+以降はスポットの生成が完了するたびに1行ずつ結果を書き込む。
+途中で中断しても、--resume で完了済みスポットを飛ばして再開できる。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+
+def journal_path_for(output_file: str) -> str:
+    """出力ファイルに対応するジャーナルのパス（例: ginza_tourist_spots.journal.jsonl）"""
+    path = Path(output_file)
+    return str(path.with_name(f"{path.stem}.journal.jsonl"))
+
+
+class CheckpointJournal:
+    """追記専用のJSONLジャーナル"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists() and self.path.stat().st_size > 0
+
+    def start(self, region_name: str, found_spots: List[Dict]):
+        """新しいジャーナルを作成（既存の内容は破棄）"""
+        header = {
+            "type": "run",
+            "region": region_name,
+            "started_at": datetime.now().isoformat(),
+            "spots": found_spots
+        }
+        with self._lock:
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(header, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def append(self, spot: Dict, metadata: Optional[Dict] = None):
+        """
+        完了したスポットを追記
+
+        Args:
+            spot: 出力形式のスポットデータ（SpotData.to_output_format()）
+            metadata: 生成時のメタデータ（検証スコアなど）
+        """
+        record = {"type": "spot", "spot": spot, "metadata": metadata or {}}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _records(self) -> Iterator[Dict]:
+        """ジャーナルを1行ずつ読む（書き込み途中で中断した末尾行は無視）"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def load_header(self) -> Optional[Dict]:
+        """実行情報（1行目）を取得"""
+        for record in self._records():
+            return record if record.get("type") == "run" else None
+        return None
+
+    def completed_numbers(self) -> Set[int]:
+        """完了済みスポットの no 一覧"""
+        return {
+            record["spot"]["no"]
+            for record in self._records()
+            if record.get("type") == "spot"
+        }
+
+    def write_output(self, output_file: str, output_format: str = "json") -> int:
+        """
+        ジャーナルから最終JSONを組み立てる
+
+        全件をメモリに載せないよう、各スポット行のファイル内位置だけを集めて no 順に並べ、
+        1件ずつ読み出して書き込む。同じ no が複数ある場合は最後の行を使う。
+
+        Args:
+            output_file: 出力ファイル
+            output_format: "json"（インデント付きの配列）または "ndjson"（1行1スポット）
+
+        Returns:
+            書き出したスポット数
+        """
+        offsets: Dict[int, int] = {}
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("type") == "spot":
+                    offsets[record["spot"]["no"]] = offset
+
+        tmp_path = f"{output_file}.tmp"
+        with open(self.path, "rb") as journal, open(tmp_path, "w", encoding="utf-8") as out:
+            if output_format != "ndjson":
+                out.write("[")
+            for i, no in enumerate(sorted(offsets)):
+                journal.seek(offsets[no])
+                spot = json.loads(journal.readline())["spot"]
+                if output_format == "ndjson":
+                    out.write(json.dumps(spot, ensure_ascii=False) + "\n")
+                    continue
+                body = json.dumps(spot, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                out.write(("," if i else "") + "\n  " + body)
+            if output_format != "ndjson":
+                out.write("\n]" if offsets else "]")
+        os.replace(tmp_path, output_file)
+
+        return len(offsets)
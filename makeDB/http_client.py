@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+外部API呼び出し用の共有HTTPクライアント
+
+1つの requests.Session を使い回して接続をプール（keep-alive）し、既定のタイムアウト、
+429/5xx 時のバックオフ付き再試行（Retry-After を尊重）、ホストごとのリクエストレート制限を適用する。
+ホストごとのリクエスト数・エラー数・レイテンシを集計し、実行終了時に表示できる。
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class RateLimiter:
+    """1秒あたりのリクエスト数を制限（スレッドセーフ）"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        """次のリクエスト枠まで待機"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time)
+            self._next_time = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HttpClient:
+    """接続プール・タイムアウト・再試行・ホスト別レート制限付きのHTTPクライアント"""
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_factor: float = 1.0,
+        pool_maxsize: int = 16,
+        host_rate_limits: Optional[Dict[str, float]] = None
+    ):
+        """
+        Args:
+            connect_timeout: 接続タイムアウト（秒）
+            read_timeout: 読み取りタイムアウト（秒）
+            max_retries: 429/5xx・接続エラー時の最大再試行回数
+            backoff_factor: 再試行の待ち時間の係数（backoff_factor * 2^(n-1) 秒、Retry-After を優先）
+            pool_maxsize: ホストごとに保持する接続数
+            host_rate_limits: ホスト名 → 1秒あたりの最大リクエスト数
+        """
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            # Places の searchText はPOSTだが参照系なので再試行してよい
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._rate_limiters = {
+            host: RateLimiter(rate) for host, rate in (host_rate_limits or {}).items()
+        }
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "HttpClient":
+        """config.yaml の http セクションから生成"""
+        config = config or {}
+        return cls(
+            connect_timeout=config.get("connect_timeout_seconds", 5.0),
+            read_timeout=config.get("read_timeout_seconds", 30.0),
+            max_retries=config.get("max_retries", 3),
+            backoff_factor=config.get("backoff_factor", 1.0),
+            pool_maxsize=config.get("pool_maxsize", 16),
+            host_rate_limits=config.get("host_rate_limits", {})
+        )
+
+    @property
+    def headers(self):
+        """全リクエスト共通のヘッダ"""
+        return self.session.headers
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        リクエストを送信
+
+        timeout を指定しない場合は既定値を使う。再試行を使い切った 429/5xx は
+        そのままレスポンスとして返る（呼び出し側の raise_for_status で例外になる）。
+        """
+        host = urlparse(url).hostname or ""
+        rate_limiter = self._rate_limiters.get(host)
+        if rate_limiter:
+            rate_limiter.wait()
+
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.monotonic()
+        error = False
+        retries = 0
+        try:
+            response = self.session.request(method, url, **kwargs)
+            error = response.status_code >= 400
+            # urllib3 の再試行は session.request の中で行われるため、履歴から回数を数える
+            retry_state = getattr(response.raw, "retries", None)
+            retries = len(retry_state.history) if retry_state is not None else 0
+            return response
+        except requests.exceptions.RequestException:
+            error = True
+            raise
+        finally:
+            self._record(host, time.monotonic() - start, error, retries)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def _record(self, host: str, elapsed: float, error: bool, retries: int):
+        with self._stats_lock:
+            stats = self._stats.setdefault(
+                host, {"requests": 0, "retries": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["requests"] += 1
+            stats["retries"] += retries
+            # 再試行された 429/5xx・接続エラーも失敗した試行として数える
+            stats["errors"] += int(error) + retries
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def print_stats(self):
+        """
+        ホストごとのリクエスト数・レイテンシを表示
+
+        件数は呼び出し単位で、再試行は別に数える。時間は再試行とその待ち時間を含む。
+        """
+        with self._stats_lock:
+            stats = {host: dict(values) for host, values in sorted(self._stats.items())}
+        if not stats:
+            return
+
+        print("\n【HTTP統計】（時間は再試行の待ち時間を含む）")
+        for host, values in stats.items():
+            average = values["total_seconds"] / values["requests"]
+            print(f"  {host:32s} {values['requests']:4d}件 (再試行 {values['retries']} / エラー {values['errors']}) "
+                  f"平均 {average * 1000:.0f}ms / 最大 {values['max_seconds'] * 1000:.0f}ms")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+LLMプロバイダの非同期クライアント
+
+Claude / Gemini / OpenAI を共通のインターフェース（LLMProvider.complete）で呼び出す。
+AsyncLLMClient は専用スレッドでイベントループを1つ動かし、スレッドから呼ばれた生成リクエストを
+同じループ上で並行に実行する。同時実行数・タイムアウト・レート制限時のバックオフもここで扱う。
+
+ローカル確認用に FakeProvider（provider: "fake"）を用意している。
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+import anthropic
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+
+Usage = Dict[str, int]
+
+
+class RateLimitedError(Exception):
+    """プロバイダがレート制限（429）を返した"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientError(Exception):
+    """再試行で回復しうるエラー（5xx、接続エラーなど）"""
+
+
+def _retry_after(response) -> Optional[float]:
+    """HTTP応答の retry-after ヘッダ（秒）"""
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMProvider:
+    """LLMプロバイダの共通インターフェース"""
+
+    name = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    async def complete(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 4096
+    ) -> Tuple[str, Usage]:
+        """
+        テキストを生成
+
+        Args:
+            prompt: ユーザープロンプト
+            system: 共通の指示ブロック（プロンプトキャッシュの対象）
+            max_tokens: 最大出力トークン数
+
+        Returns:
+            (生成テキスト, トークン使用量 {"input_tokens", "cached_input_tokens", "output_tokens"})
+
+        Raises:
+            RateLimitedError: レート制限
+            TransientError: 再試行可能なエラー
+        """
+        raise NotImplementedError
+
+
+class ClaudeProvider(LLMProvider):
+    """Claude（AsyncAnthropic）。共通指示は cache_control 付きのsystemブロックで送る"""
+
+    name = "claude"
+
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None):
+        super().__init__(model)
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url, max_retries=0)
+
+    async def complete(self, prompt, system=None, max_tokens=4096):
+        kwargs = {}
+        if system:
+            kwargs["system"] = [
+                {"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}
+            ]
+        try:
+            message = await self.client.messages.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+                **kwargs
+            )
+        except anthropic.RateLimitError as e:
+            raise RateLimitedError(str(e), _retry_after(e.response)) from e
+        except (anthropic.InternalServerError, anthropic.APIConnectionError) as e:
+            raise TransientError(str(e)) from e
+
+        cache_read = getattr(message.usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(message.usage, "cache_creation_input_tokens", 0) or 0
+        usage = {
+            "input_tokens": message.usage.input_tokens + cache_read + cache_write,
+            "cached_input_tokens": cache_read,
+            "output_tokens": message.usage.output_tokens
+        }
+        return message.content[0].text, usage
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini（generate_content_async）。共通指示を先頭に置き、暗黙的キャッシュを利用"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str):
+        super().__init__(model)
+        genai.configure(api_key=api_key)
+        self.client = genai.GenerativeModel(model)
+
+    async def complete(self, prompt, system=None, max_tokens=4096):
+        contents = f"{system}\n\n{prompt}" if system else prompt
+        try:
+            response = await self.client.generate_content_async(
+                contents,
+                generation_config={"max_output_tokens": max_tokens}
+            )
+        except google_exceptions.ResourceExhausted as e:
+            raise RateLimitedError(str(e)) from e
+        except (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                google_exceptions.DeadlineExceeded) as e:
+            raise TransientError(str(e)) from e
+
+        usage_metadata = response.usage_metadata
+        usage = {
+            "input_tokens": usage_metadata.prompt_token_count,
+            "cached_input_tokens": getattr(usage_metadata, "cached_content_token_count", 0) or 0,
+            "output_tokens": usage_metadata.candidates_token_count
+        }
+        return response.text, usage
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI（openai.AsyncOpenAI）。共通指示をsystemメッセージにし、自動のプレフィックスキャッシュを利用"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None):
+        super().__init__(model)
+        import openai
+        self._openai = openai
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+    async def complete(self, prompt, system=None, max_tokens=4096):
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=max_tokens
+            )
+        except self._openai.RateLimitError as e:
+            raise RateLimitedError(str(e), _retry_after(e.response)) from e
+        except (self._openai.InternalServerError, self._openai.APIConnectionError) as e:
+            raise TransientError(str(e)) from e
+
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        usage = {
+            "input_tokens": response.usage.prompt_tokens,
+            "cached_input_tokens": getattr(details, "cached_tokens", 0) or 0,
+            "output_tokens": response.usage.completion_tokens
+        }
+        return response.choices[0].message.content, usage
+
+
+class FakeProvider(LLMProvider):
+    """
+    ローカル確認用の疑似プロバイダ（APIキー不要）
+
+    プロンプト中のスポット名を含む固定長の文章を返す。遅延・レート制限・エラーを注入できる。
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        model: str = "fake",
+        latency: float = 0.5,
+        output_length: int = 975,
+        rate_limit_rate: float = 0.0,
+        error_rate: float = 0.0
+    ):
+        super().__init__(model)
+        self.latency = latency
+        self.output_length = output_length
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+
+    async def complete(self, prompt, system=None, max_tokens=4096):
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.rate_limit_rate:
+            raise RateLimitedError("fake rate limit", retry_after=self.latency)
+        if random.random() < self.error_rate:
+            raise TransientError("fake server error")
+
+        # 名称を埋め込んだ文章を返す。一括生成のプロンプトにはJSON配列で答える
+        names = re.findall(r"^名称: (.+)$", prompt, re.MULTILINE) or ["観光スポット"]
+        bodies = [
+            (f"{name}は、" + "これは疑似プロバイダが生成した説明文です。" * 100)[:self.output_length]
+            for name in names
+        ]
+        if "### スポット" in prompt:
+            text = json.dumps(
+                [{"id": i, "description": body} for i, body in enumerate(bodies, 1)], ensure_ascii=False
+            )
+        else:
+            text = bodies[0]
+        usage = {
+            "input_tokens": len((system or "") + prompt),
+            "cached_input_tokens": len(system or ""),
+            "output_tokens": len(text)
+        }
+        return text, usage
+
+
+def create_provider(llm_config: Dict) -> LLMProvider:
+    """config.yaml の llm セクションからプロバイダを生成"""
+    provider = llm_config.get("provider", "gemini")
+    provider_config = llm_config.get(provider, {})
+
+    if provider == "fake":
+        return FakeProvider(**provider_config)
+
+    api_key = provider_config.get("api_key")
+    if not api_key:
+        label = {"claude": "Claude", "gemini": "Gemini", "openai": "OpenAI"}.get(provider, provider)
+        raise ValueError(f"{label} APIキーが設定されていません")
+
+    if provider == "claude":
+        return ClaudeProvider(
+            api_key, provider_config.get("model", "claude-3-5-sonnet-20241022"), provider_config.get("base_url")
+        )
+    if provider == "gemini":
+        return GeminiProvider(api_key, provider_config.get("model", "gemini-2.5-flash"))
+    if provider == "openai":
+        return OpenAIProvider(api_key, provider_config.get("model", "gpt-4"), provider_config.get("base_url"))
+    raise ValueError(f"未対応のLLM: {provider}")
+
+
+class AsyncLLMClient:
+    """
+    1つのイベントループ上でLLM呼び出しを並行実行するクライアント
+
+    同期コード（スポットごとのワーカースレッド）からは complete() を、
+    非同期コードからは complete_async() を呼ぶ。
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        max_concurrency: int = 4,
+        timeout: float = 120.0,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0
+    ):
+        """
+        Args:
+            provider: LLMプロバイダ
+            max_concurrency: 同時に送信するリクエスト数
+            timeout: 1リクエストのタイムアウト（秒）
+            max_retries: レート制限・一時的なエラー・タイムアウト時の最大再試行回数
+            backoff_base: 指数バックオフの初期待ち時間（秒）
+            backoff_max: バックオフの最大待ち時間（秒）
+        """
+        self.provider = provider
+        self.max_concurrency = max(max_concurrency, 1)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, llm_config: Dict) -> "AsyncLLMClient":
+        """config.yaml の llm セクション（client 設定を含む）から生成"""
+        client_config = llm_config.get("client", {})
+        return cls(
+            create_provider(llm_config),
+            max_concurrency=client_config.get("max_concurrency", 4),
+            timeout=client_config.get("timeout_seconds", 120.0),
+            max_retries=client_config.get("max_retries", 5),
+            backoff_base=client_config.get("backoff_base_seconds", 1.0),
+            backoff_max=client_config.get("backoff_max_seconds", 60.0)
+        )
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """バックグラウンドのイベントループを起動（初回のみ）"""
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def complete(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 4096
+    ) -> Tuple[str, Usage]:
+        """同期版。イベントループに投入して結果を待つ"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.complete_async(prompt, system, max_tokens), self._ensure_loop()
+        )
+        return future.result()
+
+    async def complete_async(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 4096
+    ) -> Tuple[str, Usage]:
+        """
+        同時実行数を制限し、タイムアウト・再試行付きで生成
+
+        レート制限時は retry-after があればそれに従い、なければ指数バックオフ（ジッター付き）で待つ。
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(
+                        self.provider.complete(prompt, system, max_tokens), self.timeout
+                    )
+            except (RateLimitedError, TransientError, asyncio.TimeoutError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+                delay *= random.uniform(0.5, 1.0)
+                if isinstance(e, RateLimitedError) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                reason = "レート制限" if isinstance(e, RateLimitedError) else type(e).__name__
+                print(f"  [WARN] LLM {reason}、{delay:.1f}秒後に再試行 ({attempt}/{self.max_retries})")
+                await asyncio.sleep(delay)
+
+    def close(self):
+        """イベントループを停止"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
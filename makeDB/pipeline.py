@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+ストリーミング処理パイプライン
+
+ステージ（検索 → 収集 → 検証 → 生成 → 品質検証 → 書き出し）を上限付きキューでつなぎ、
+スポットを1件ずつ流す。各ステージは専用のワーカースレッドで動き、上流が詰まれば
+キューの上限で待たされるため、処理中のスポット数（メモリ使用量）は地域の大きさによらず一定に保たれる。
+
+1件の処理で例外が起きてもそのスポットを捨てて次へ進み、ステージ全体が止まった場合も
+下流には終端を伝え、上流はキューを読み捨てて進むため、他のステージが待ち続けることはない。
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+# ステージの終端を表す目印
+_END = object()
+
+
+class PipelineStage:
+    """パイプラインの1ステージ"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Optional[Any]],
+        workers: int = 1,
+        describe: Optional[Callable[[Any], str]] = None
+    ):
+        """
+        Args:
+            name: ステージ名（ログ・統計表示用）
+            func: 1件を処理して次のステージに渡す値を返す関数（None を返すとその件は破棄）
+            workers: ワーカースレッド数
+            describe: エラー表示用に処理対象を文字列化する関数
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(int(workers), 1)
+        self.describe = describe or str
+        self.stats = {"processed": 0, "dropped": 0, "failed": 0, "busy_seconds": 0.0}
+
+
+class Pipeline:
+    """上限付きキューでステージをつないだパイプライン"""
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = 8):
+        """
+        Args:
+            stages: 実行順のステージ
+            queue_size: ステージ間のキューの上限件数
+        """
+        self.stages = stages
+        self.queue_size = max(int(queue_size), 1)
+        self._stats_lock = threading.Lock()
+        self.source_name = "検索"
+        self.source_stats = {"emitted": 0, "failed": False}
+
+    def run(self, source: Iterable, source_name: str = "検索"):
+        """
+        source から取り出した要素を全ステージに流し、全件の処理が終わるまで待つ
+
+        Args:
+            source: 先頭に流す要素（ジェネレーターを渡すと検索と後続の処理が並行する）
+            source_name: 先頭ステージの名前
+        """
+        self.source_name = source_name
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        # ステージごとの「下流が止まった」フラグ。立っていれば出力を捨てる
+        closed = [threading.Event() for _ in self.stages]
+        threads = []
+
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(index, queues, closed, remaining),
+                    name=f"pipeline-{stage.name}-{worker}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in source:
+                if closed[0].is_set():
+                    break
+                self.source_stats["emitted"] += 1
+                queues[0].put(item)
+        except Exception as e:
+            self.source_stats["failed"] = True
+            print(f"\n[ERROR] {source_name}ステージで失敗しました - {e}")
+        finally:
+            queues[0].put(_END)
+
+        for thread in threads:
+            thread.join()
+
+    def _work(
+        self,
+        index: int,
+        queues: List[queue.Queue],
+        closed: List[threading.Event],
+        remaining: List[int]
+    ):
+        """ステージのワーカー。終端を受け取ったら兄弟ワーカーに回し、最後の1つが下流に伝える"""
+        stage = self.stages[index]
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+
+        try:
+            while True:
+                item = inbox.get()
+                if item is _END:
+                    inbox.put(_END)
+                    break
+
+                start = time.monotonic()
+                try:
+                    result = stage.func(item)
+                except Exception as e:
+                    self._count(stage, "failed", start)
+                    print(f"\n[ERROR] {stage.name}: {stage.describe(item)} - {e}")
+                    continue
+
+                if result is None:
+                    self._count(stage, "dropped", start)
+                    continue
+                self._count(stage, "processed", start)
+                if outbox is not None and not closed[index + 1].is_set():
+                    outbox.put(result)
+        except BaseException as e:
+            # ステージ自体が止まった場合: 上流の出力を捨てるようにして、上流が待ち続けないようにする
+            closed[index].set()
+            print(f"\n[ERROR] {stage.name}ステージが停止しました - {e}")
+            self._drain(inbox)
+        finally:
+            with self._stats_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                if closed[index].is_set() and index > 0:
+                    closed[index - 1].set()
+                if outbox is not None:
+                    outbox.put(_END)
+
+    @staticmethod
+    def _drain(inbox: queue.Queue):
+        """終端が来るまでキューを読み捨てる"""
+        while inbox.get() is not _END:
+            pass
+        inbox.put(_END)
+
+    def _count(self, stage: PipelineStage, key: str, start: float):
+        with self._stats_lock:
+            stage.stats[key] += 1
+            stage.stats["busy_seconds"] += time.monotonic() - start
+
+    def print_stats(self):
+        """ステージごとの処理件数と処理時間を表示（busy時間が長いステージがボトルネック）"""
+        print("\n【パイプライン統計】")
+        print(f"  {self.source_name:8s} 出力 {self.source_stats['emitted']}件"
+              + (" (途中で失敗)" if self.source_stats["failed"] else ""))
+        for stage in self.stages:
+            stats = stage.stats
+            print(f"  {stage.name:8s} 通過 {stats['processed']}件 / 除外 {stats['dropped']}件 / "
+                  f"失敗 {stats['failed']}件 "
+                  f"(処理時間 {stats['busy_seconds']:.1f}秒, ワーカー {stage.workers})")
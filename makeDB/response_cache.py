@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+外部API応答のディスクキャッシュ
+
+(ソース, リクエストパラメータ) のハッシュをキーとして応答をJSONで保存する。
+LLM呼び出しはパラメータにモデル名とプロンプトのハッシュを含めるため、
+プロンプトを変更した呼び出しだけが再実行される。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+def prompt_hash(prompt: str) -> str:
+    """プロンプトのSHA-256ハッシュ"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    コンテンツアドレス方式のディスクキャッシュ
+
+    ファイル配置: <cache_dir>/<source>/<key[:2]>/<key>.json
+    ソースごとにTTLを設定でき、合計サイズが上限を超えると最終アクセスが古い順に削除する。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = ".cache",
+        ttl_hours: Optional[Dict[str, float]] = None,
+        max_size_mb: float = 200,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ
+            ttl_hours: ソース名 → 有効期限（時間）。未設定・0のソースは無期限
+            max_size_mb: キャッシュ全体の最大サイズ（MB）
+            enabled: Falseの場合は常に取得関数を実行する
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl_hours = ttl_hours or {}
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._total_size = self._scan_size() if enabled else 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "ResponseCache":
+        """config.yaml の cache セクションから生成"""
+        config = config or {}
+        return cls(
+            cache_dir=config.get("dir", ".cache"),
+            ttl_hours=config.get("ttl_hours", {}),
+            max_size_mb=config.get("max_size_mb", 200),
+            enabled=config.get("enabled", False)
+        )
+
+    @staticmethod
+    def make_key(source: str, params: Dict[str, Any]) -> str:
+        """ソースとパラメータからキャッシュキーを生成"""
+        payload = json.dumps([source, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, source: str, key: str) -> Path:
+        return self.cache_dir / source / key[:2] / f"{key}.json"
+
+    def _scan_size(self) -> int:
+        if not self.cache_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.cache_dir.rglob("*.json"))
+
+    def _count(self, source: str, field: str):
+        with self._lock:
+            stats = self._stats.setdefault(source, {"hits": 0, "misses": 0})
+            stats[field] += 1
+
+    def get(self, source: str, params: Dict[str, Any]) -> Optional[Any]:
+        """
+        キャッシュから取得
+
+        Returns:
+            キャッシュ済みの値（未登録・期限切れの場合はNone）
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(source, self.make_key(source, params))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        ttl = self.ttl_hours.get(source, 0)
+        if ttl and time.time() - entry["created_at"] > ttl * 3600:
+            return None
+
+        # 最終アクセス時刻を更新（サイズ上限超過時の削除順に使用）
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, source: str, params: Dict[str, Any], value: Any):
+        """キャッシュに保存"""
+        if not self.enabled:
+            return
+
+        path = self._path(source, self.make_key(source, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"source": source, "params": params, "created_at": time.time(), "value": value}
+
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        old_size = path.stat().st_size if path.exists() else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_size += path.stat().st_size - old_size
+            over_limit = self._total_size > self.max_size_bytes
+        if over_limit:
+            self._evict()
+
+    def get_or_fetch(self, source: str, params: Dict[str, Any], fetch: Callable[[], Any]) -> Any:
+        """
+        キャッシュにあれば返し、なければfetchを実行して保存する
+
+        fetchが例外を送出した場合は保存せずにそのまま送出する。
+        """
+        value = self.get(source, params)
+        if value is not None:
+            self._count(source, "hits")
+            return value
+
+        self._count(source, "misses")
+        value = fetch()
+        self.set(source, params, value)
+        return value
+
+    def _evict(self):
+        """最終アクセスが古いエントリから削除してサイズ上限の8割まで減らす"""
+        with self._lock:
+            files = sorted(self.cache_dir.rglob("*.json"), key=lambda p: p.stat().st_mtime)
+            target = int(self.max_size_bytes * 0.8)
+            for path in files:
+                if self._total_size <= target:
+                    break
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                    self._total_size -= size
+                except FileNotFoundError:
+                    continue
+
+    def print_stats(self):
+        """ソースごとのヒット/ミス数を表示"""
+        if not self.enabled:
+            return
+
+        print(f"\n【キャッシュ統計】{self.cache_dir}")
+        with self._lock:
+            stats = {source: dict(counts) for source, counts in sorted(self._stats.items())}
+        if not stats:
+            print("  (キャッシュ対象の呼び出しなし)")
+            return
+        for source, counts in stats.items():
+            total = counts["hits"] + counts["misses"]
+            rate = counts["hits"] / total * 100 if total else 0
+            print(f"  {source:16s} ヒット: {counts['hits']:3d} / ミス: {counts['misses']:3d} (ヒット率 {rate:.0f}%)")
+        print(f"  使用量: {self._total_size / 1024 / 1024:.1f}MB / {self.max_size_bytes / 1024 / 1024:.0f}MB")
@@ -4,16 +4,19 @@
 引数で地域名を指定して実行
 """
 
-import sys
+import argparse
 from tourist_spot_generator import load_config, TouristSpotGenerator
 
 def main():
-    if len(sys.argv) < 2:
-        print("使い方: python test_run.py <地域名>")
-        print("例: python test_run.py 銀座")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="テスト実行用スクリプト",
+        epilog="例: python test_run.py 銀座"
+    )
+    parser.add_argument("region_name", help="地域名")
+    parser.add_argument("--resume", action="store_true", help="前回中断したジャーナルから再開")
+    args = parser.parse_args()
 
-    region_name = sys.argv[1]
+    region_name = args.region_name
 
     try:
         # 設定ファイル読み込み
@@ -29,6 +32,8 @@ def main():
             model = config['llm']['gemini'].get('model', 'gemini-2.5-flash')
         elif provider == "openai":
             model = config['llm']['openai'].get('model', 'gpt-4')
+        elif provider == "fake":
+            model = "fake"
         else:
             model = "unknown"
         print(f"LLM Model: {model}")
@@ -38,7 +43,7 @@ def main():
 
         # 生成実行
         print(f"\n地域名: {region_name}")
-        generator.generate_from_region(region_name=region_name, max_spots=3)
+        generator.generate_from_region(region_name=region_name, max_spots=3, resume=args.resume)
 
     except FileNotFoundError as e:
         print(f"\n[ERROR] {e}")
@@ -2,24 +2,34 @@
 """
 観光スポット説明文自動生成システム
 入力: 地域名のみ
-出力: {地域名}_tourist_spots.json
+出力: {地域名}_tourist_spots.json（ndjson 出力も可）
 
-LLM選択可能: Gemini (デフォルト) / OpenAI
+LLM選択可能: Gemini (デフォルト) / Claude / OpenAI
 """
 
+import argparse
 import json
 import re
+import threading
+import time
 import yaml
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
+from checkpoint import CheckpointJournal, journal_path_for
+from http_client import HttpClient, RateLimiter
+from llm_providers import AsyncLLMClient
+from pipeline import Pipeline, PipelineStage
+from response_cache import ResponseCache, prompt_hash
+from wikipedia_bulk import WikipediaBulkFetcher
+
 # API imports
 import requests
-import google.generativeai as genai
 from wikipediaapi import Wikipedia
-import anthropic
 
 
 def load_config(config_path: str = "config.yaml") -> Dict:
@@ -34,6 +44,38 @@ def load_config(config_path: str = "config.yaml") -> Dict:
     return config
 
 
+class ConcurrencyLimiter:
+    """プロバイダごとの同時実行数・リクエストレート制限（未設定のプロバイダは無制限）"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        rates: Optional[Dict[str, float]] = None
+    ):
+        """
+        Args:
+            limits: プロバイダ名 → 最大同時実行数（例: {"google_places": 4, "wikipedia": 2}）
+            rates: プロバイダ名 → 1秒あたりの最大リクエスト数（全スレッド共通）
+        """
+        self._semaphores = {
+            provider: threading.BoundedSemaphore(max(int(limit), 1))
+            for provider, limit in (limits or {}).items()
+        }
+        self._rate_limiters = {
+            provider: RateLimiter(rate)
+            for provider, rate in (rates or {}).items()
+        }
+
+    @contextmanager
+    def limit(self, provider: str):
+        """プロバイダの実行枠を確保する"""
+        rate_limiter = self._rate_limiters.get(provider)
+        with self._semaphores.get(provider) or nullcontext():
+            if rate_limiter:
+                rate_limiter.wait()
+            yield
+
+
 @dataclass
 class SpotData:
     """観光スポットの構造化データ"""
@@ -74,18 +116,52 @@ class SpotData:
         }
 
 
+@dataclass
+class SpotJob:
+    """パイプラインを流れる1スポット分の処理状態"""
+    spot: SpotData
+    started: float
+    verification: Optional[Dict] = None
+    description: str = ""
+    llm_stats: Optional[Dict] = None
+
+
 class SpotFinder:
     """地域名から観光スポットを自動検索"""
 
-    def __init__(self, api_key: str):
+    PAGE_SIZE = 20  # 1ページあたりのAPI上限
+
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[ResponseCache] = None,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        http: Optional[HttpClient] = None
+    ):
         self.api_key = api_key
         self.base_url = "https://places.googleapis.com/v1/places:searchText"
+        self.cache = cache or ResponseCache(enabled=False)
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.http = http or HttpClient()
 
-    def find_spots(self, region_name: str, max_spots: int = 20) -> List[Dict]:
+    def find_spots(
+        self,
+        region_name: str,
+        max_spots: int = 20,
+        query: Optional[str] = None,
+        rectangle: Optional[Dict] = None
+    ) -> List[Dict]:
         """
         地域名から観光スポットを検索
 
-        Google Places API (New) を使用
+        Google Places API (New) を使用。20件を超える場合は nextPageToken でページを辿る
+        （APIの仕様上、1クエリあたり最大60件）。
+
+        Args:
+            region_name: 地域名（表示および既定の検索クエリに使用）
+            max_spots: 最大取得数
+            query: 検索クエリ（省略時は "{地域名} 観光スポット"）
+            rectangle: 検索範囲の矩形 {"low": {"latitude", "longitude"}, "high": {...}}
         """
         print(f"\n{'='*60}")
         print(f"【観光スポット検索】地域: {region_name}")
@@ -94,32 +170,48 @@ class SpotFinder:
         headers = {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": self.api_key,
-            "X-Goog-FieldMask": "places.displayName,places.formattedAddress,places.location,places.id"
+            "X-Goog-FieldMask": "places.displayName,places.formattedAddress,places.location,places.id,nextPageToken"
         }
 
         data = {
-            "textQuery": f"{region_name} 観光スポット",
+            "textQuery": query or f"{region_name} 観光スポット",
             "languageCode": "ja",
-            "maxResultCount": min(max_spots, 20)  # API上限20
+            "pageSize": min(max_spots, self.PAGE_SIZE)
         }
+        if rectangle:
+            data["locationRestriction"] = {"rectangle": rectangle}
 
-        try:
-            response = requests.post(self.base_url, headers=headers, json=data)
+        def fetch(page_data: Dict) -> Dict:
+            with self.limiter.limit("places_search"):
+                response = self.http.post(self.base_url, headers=headers, json=page_data)
             response.raise_for_status()
-            result = response.json()
+            return response.json()
 
-            places = result.get("places", [])
+        try:
             spots = []
-
-            for place in places:
-                spot = {
-                    "name": place.get("displayName", {}).get("text", ""),
-                    "latitude": place.get("location", {}).get("latitude", 0.0),
-                    "longitude": place.get("location", {}).get("longitude", 0.0),
-                    "address": place.get("formattedAddress", ""),
-                    "place_id": place.get("id", "")
-                }
-                spots.append(spot)
+            page_token = None
+
+            while len(spots) < max_spots:
+                page_data = dict(data, pageToken=page_token) if page_token else data
+                result = self.cache.get_or_fetch(
+                    "places_search", page_data, lambda: fetch(page_data)
+                )
+
+                for place in result.get("places", []):
+                    spot = {
+                        "name": place.get("displayName", {}).get("text", ""),
+                        "latitude": place.get("location", {}).get("latitude", 0.0),
+                        "longitude": place.get("location", {}).get("longitude", 0.0),
+                        "address": place.get("formattedAddress", ""),
+                        "place_id": place.get("id", "")
+                    }
+                    spots.append(spot)
+
+                page_token = result.get("nextPageToken")
+                if not page_token:
+                    break
+
+            spots = spots[:max_spots]
 
             print(f"  [OK] {len(spots)}箇所の観光スポットを発見")
             for i, spot in enumerate(spots, 1):
@@ -135,14 +227,54 @@ class SpotFinder:
 class DataCollector:
     """複数ソースからデータを収集"""
 
-    def __init__(self, google_api_key: str, web_search_config: Optional[Dict] = None):
+    def __init__(
+        self,
+        google_api_key: str,
+        web_search_config: Optional[Dict] = None,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+        wikipedia_config: Optional[Dict] = None,
+        http: Optional[HttpClient] = None
+    ):
         self.google_api_key = google_api_key
         self.web_search_config = web_search_config or {}
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.cache = cache or ResponseCache(enabled=False)
+        self.http = http or HttpClient()
         self.wiki = Wikipedia(
             language='ja',
             user_agent='TouristSpotGenerator/1.0 (https://github.com/fumiya-kume/JL02)'
         )
 
+        # Wikipedia一括取得（bulk: true の場合、prefetch_wikipedia で事前にまとめて取得）
+        wikipedia_config = wikipedia_config or {}
+        self.wiki_offline = wikipedia_config.get("offline", False)
+        self.wiki_bulk = None
+        if wikipedia_config.get("bulk", False) or self.wiki_offline:
+            self.wiki_bulk = WikipediaBulkFetcher(
+                language='ja',
+                snapshot_path=wikipedia_config.get("snapshot_path"),
+                offline=self.wiki_offline,
+                session=self.http
+            )
+        self._wiki_prefetched: Dict[str, Dict] = {}
+
+    def prefetch_wikipedia(self, spot_names: List[str]):
+        """複数スポットのWikipedia概要をまとめて取得（一括取得が無効なら何もしない）"""
+        if not self.wiki_bulk:
+            return
+
+        print(f"\n【Wikipedia一括取得】{len(spot_names)}件")
+        try:
+            self._wiki_prefetched.update(self.wiki_bulk.fetch(spot_names))
+        except Exception as e:
+            print(f"  [WARN] Wikipedia一括取得エラー（スポットごとに取得します）: {e}")
+            return
+
+        stats = self.wiki_bulk.stats
+        print(f"  [OK] スナップショット: {stats['snapshot_hits']}件 / "
+              f"新規取得: {stats['fetched']}件 ({stats['requests']}リクエスト)")
+
     def collect_google_places(self, place_id: str, spot_name: str) -> Dict:
         """Google Places APIから詳細データ収集"""
         print(f"  → Google Places APIからデータ収集: {spot_name}")
@@ -157,10 +289,18 @@ class DataCollector:
             "X-Goog-FieldMask": "rating,userRatingCount,types,regularOpeningHours,internationalPhoneNumber,websiteUri"
         }
 
-        try:
-            response = requests.get(url, headers=headers)
+        def fetch() -> Dict:
+            with self.limiter.limit("google_places"):
+                response = self.http.get(url, headers=headers)
             response.raise_for_status()
-            data = response.json()
+            return response.json()
+
+        try:
+            data = self.cache.get_or_fetch(
+                "google_places",
+                {"place_id": place_id, "fields": headers["X-Goog-FieldMask"]},
+                fetch
+            )
 
             return {
                 "rating": data.get("rating", 0),
@@ -185,15 +325,29 @@ class DataCollector:
         """Wikipedia APIからデータ収集"""
         print(f"  → Wikipediaからデータ収集: {spot_name}")
 
+        def fetch() -> Dict:
+            with self.limiter.limit("wikipedia"):
+                page = self.wiki.page(spot_name)
+                if not page.exists():
+                    return {"exists": False}
+                return {"exists": True, "summary": page.summary, "url": page.fullurl}
+
         try:
-            page = self.wiki.page(spot_name)
+            if spot_name in self._wiki_prefetched:
+                page_data = self._wiki_prefetched[spot_name]
+            elif self.wiki_offline:
+                page_data = {"exists": False}
+            else:
+                page_data = self.cache.get_or_fetch(
+                    "wikipedia", {"title": spot_name, "language": "ja"}, fetch
+                )
 
-            if page.exists():
+            if page_data["exists"]:
                 # HTMLタグを除去してテキストのみ取得
-                summary = re.sub('<[^<]+?>', '', page.summary[:1000])
+                summary = re.sub('<[^<]+?>', '', page_data["summary"][:1000])
                 return {
                     "summary": summary,
-                    "source_url": page.fullurl,
+                    "source_url": page_data["url"],
                     "exists": True
                 }
             else:
@@ -230,10 +384,16 @@ class DataCollector:
             "lr": "lang_ja"
         }
 
-        try:
-            response = requests.get(url, params=params)
+        def fetch() -> Dict:
+            with self.limiter.limit("web_search"):
+                response = self.http.get(url, params=params)
             response.raise_for_status()
-            data = response.json()
+            return response.json()
+
+        try:
+            # APIキーはキャッシュキーに含めない
+            cache_params = {k: v for k, v in params.items() if k != "key"}
+            data = self.cache.get_or_fetch("web_search", cache_params, fetch)
 
             items = data.get("items", [])
             snippets = [item.get("snippet", "") for item in items]
@@ -246,15 +406,27 @@ class DataCollector:
             print(f"  [WARN] Web検索 API エラー: {e}")
             return {"features": [], "snippets": []}
 
-    def collect_all(self, spot: SpotData, place_id: str = "") -> SpotData:
-        """全ソースからデータを収集"""
+    def collect_all(
+        self,
+        spot: SpotData,
+        place_id: str = "",
+        executor: Optional[Executor] = None
+    ) -> SpotData:
+        """
+        全ソースからデータを収集
+
+        executorを渡すと、Google Places詳細の取得を Wikipedia → Web検索 の流れと並行して実行する
+        """
         print(f"\n【データ収集開始】{spot.name}")
 
-        # Google Places詳細情報
+        # Google Places詳細情報（executorがあれば並行実行）
+        google_future = None
+        google_data = {}
         if place_id:
-            google_data = self.collect_google_places(place_id, spot.name)
-        else:
-            google_data = {}
+            if executor:
+                google_future = executor.submit(self.collect_google_places, place_id, spot.name)
+            else:
+                google_data = self.collect_google_places(place_id, spot.name)
 
         # Wikipedia情報
         wiki_data = self.collect_wikipedia(spot.name)
@@ -265,6 +437,9 @@ class DataCollector:
         else:
             web_data = {"features": [], "snippets": []}
 
+        if google_future:
+            google_data = google_future.result()
+
         spot._basic_info = google_data
         spot._history = wiki_data.get("summary", "")
         spot._features = web_data.get("features", [])
@@ -322,97 +497,289 @@ class DataVerifier:
 class AIDescriptionGenerator:
     """LLMを使用した説明文生成（制約付き）"""
 
-    def __init__(self, llm_config: Dict):
+    # 全スポット共通の執筆指示。プロンプトの先頭に置き、プロバイダのプロンプトキャッシュを効かせる
+    # （文字数は min_length / max_length、段落の目安は max_length に比例させて埋め込む）
+    INSTRUCTIONS_TEMPLATE = """あなたは観光情報の専門ライターです。提供された事実データのみを使用して、観光スポットの説明文を正確に{min_length}-{max_length}字で作成してください。
+
+【絶対厳守：文字数制限】
+- **絶対上限**: {max_length}字（1文字でも超過禁止）
+- **目標範囲**: {min_length}-{max_length}字
+- **重要**: 冗長な表現を徹底的に排除し、簡潔に記述してください
+- 「この数値は」「これらの情報は」など、同じ情報を繰り返し説明しない
+- 座標や住所の詳細説明は最小限に（「位置は〜」で1文のみ）
+
+【構成指示（合計{min_length}-{max_length}字）】
+第1段落（{p1}字）: 名称、位置、基本情報（住所・座標は簡潔に1-2文のみ）
+第2段落（{p2}字）: 歴史・背景（ある場合のみ、簡潔に）
+第3段落（{p3}字）: 特徴（ある場合のみ）
+第4段落（{p4}字）: 評価・口コミ・Webサイト情報、情報源
+
+【執筆ルール】
+1. 提供されたデータにない情報は一切追加しない
+2. 推測表現（〜と思われる、〜かもしれない、〜だろう）は使用禁止
+3. 冗長な表現を避ける（例：「この数値は〜を示す」を繰り返さない）
+4. 各段落を書いたら文字数を確認し、超過しないよう調整する
+5. 複数のスポットが提示された場合、各スポットの説明文にはそのスポットのデータのみを使用する"""
+
+    def __init__(
+        self,
+        llm_config: Dict,
+        cache: Optional[ResponseCache] = None,
+        min_length: int = 950,
+        max_length: int = 1000,
+        max_refine_attempts: int = 0,
+        batch_size: int = 1,
+        batch_wait_seconds: float = 5.0
+    ):
         """
         Args:
             llm_config: LLM設定（provider, api_key, modelなど）
+            cache: 応答キャッシュ（プロンプトのハッシュとモデル名がキー）
+            min_length: 説明文の最小文字数
+            max_length: 説明文の最大文字数
+            max_refine_attempts: 文字数が範囲外の場合に短縮・加筆を依頼する最大回数（0で無効）
+            batch_size: 1回のLLM呼び出しで生成するスポット数（1でバッチ無効）
+            batch_wait_seconds: バッチが埋まるまで待つ最大秒数
         """
         self.provider = llm_config.get("provider", "gemini")
         self.config = llm_config
+        self.cache = cache or ResponseCache(enabled=False)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.instructions = self._build_instructions(min_length, max_length)
+        self.max_refine_attempts = max_refine_attempts
+        self.batcher = (
+            DescriptionBatcher(self, batch_size, batch_wait_seconds) if batch_size > 1 else None
+        )
 
-        # Claude初期化
-        if self.provider == "claude":
-            api_key = llm_config.get("claude", {}).get("api_key")
-            if api_key:
-                self.claude_client = anthropic.Anthropic(api_key=api_key)
-                self.claude_model = llm_config.get("claude", {}).get("model", "claude-3-5-sonnet-20241022")
-            else:
-                raise ValueError("Claude APIキーが設定されていません")
-
-        # Gemini初期化
-        elif self.provider == "gemini":
-            api_key = llm_config.get("gemini", {}).get("api_key")
-            if api_key:
-                genai.configure(api_key=api_key)
-                model_name = llm_config.get("gemini", {}).get("model", "gemini-2.5-flash")
-                self.model = genai.GenerativeModel(model_name)
-            else:
-                raise ValueError("Gemini APIキーが設定されていません")
-
-        # OpenAI初期化
-        elif self.provider == "openai":
-            self.openai_config = llm_config.get("openai", {})
-            if not self.openai_config.get("api_key"):
-                raise ValueError("OpenAI APIキーが設定されていません")
+        # プロバイダの非同期クライアント（provider: claude / gemini / openai / fake）
+        # 同時実行数はこのクライアントのセマフォ（llm.client.max_concurrency）で制限する
+        self.llm_client = AsyncLLMClient.from_config(llm_config)
 
     def generate(self, spot: SpotData) -> str:
         """説明文を生成"""
-        print(f"\n【説明文生成】{spot.name} (LLM: {self.provider})")
+        description, _ = self.generate_with_stats(spot)
+        return description
 
-        # プロンプト構築
-        prompt = self._build_prompt(spot)
+    def generate_with_stats(self, spot: SpotData) -> Tuple[str, Dict]:
+        """
+        説明文を生成し、LLM呼び出しの統計も返す
 
-        # LLM呼び出し
-        if self.provider == "claude":
-            description = self._generate_with_claude(prompt)
-        elif self.provider == "gemini":
-            description = self._generate_with_gemini(prompt)
-        elif self.provider == "openai":
-            description = self._generate_with_openai(prompt)
-        else:
-            raise ValueError(f"未対応のLLM: {self.provider}")
+        文字数が範囲外の場合は、max_refine_attempts回まで同じ説明文の短縮・加筆を依頼する
+        （全文の再生成はしない）。それでも上限を超える場合はトリミングする。
+
+        バッチモードでは最初の下書きを他のスポットとまとめて生成する。
+
+        Returns:
+            (説明文, 統計) 統計は llm_calls, refine_attempts, input_tokens, cached_input_tokens,
+            output_tokens, llm_seconds
+        """
+        print(f"\n【説明文生成】{spot.name} (LLM: {self.provider})")
+        stats = self._empty_stats()
+
+        description = self.batcher.generate(spot, stats) if self.batcher else None
+        if description is None:
+            description = self._complete(self._build_prompt(spot), stats, system=self.instructions)
+
+        # 文字数が範囲外なら、その説明文だけを対象に短縮・加筆を依頼
+        while (
+            not self.min_length <= len(description) <= self.max_length
+            and stats["refine_attempts"] < self.max_refine_attempts
+        ):
+            stats["refine_attempts"] += 1
+            print(f"  [WARN] 文字数が範囲外({len(description)}字)、調整を依頼します "
+                  f"({stats['refine_attempts']}/{self.max_refine_attempts})")
+            description = self._complete(self._build_refine_prompt(spot, description), stats)
 
         # 文字数チェックとトリミング
         original_length = len(description)
-        if original_length > 1000:
-            print(f"  [WARN] 生成文字数が1000字を超過({original_length}字)、トリミングします")
-            description = description[:1000]
+        if original_length > self.max_length:
+            print(f"  [WARN] 生成文字数が{self.max_length}字を超過({original_length}字)、トリミングします")
+            description = description[:self.max_length]
             print(f"  トリミング後: {len(description)}字")
 
         print(f"  生成文字数: {len(description)}字")
+        print(f"  トークン: 入力{stats['input_tokens']} / 出力{stats['output_tokens']} "
+              f"(LLM呼び出し{stats['llm_calls']}回, {stats['llm_seconds']:.1f}秒)")
         print(f"  [OK] 説明文生成完了")
 
-        return description
+        return description, stats
 
-    def _build_prompt(self, spot: SpotData) -> str:
-        """プロンプト構築"""
+    def generate_batch(self, spots: List[SpotData]) -> List[Tuple[Optional[str], Dict]]:
+        """
+        複数スポットの説明文を1回のLLM呼び出しで生成
 
-        # 文字数目標を計算（950-1000字の範囲で、データ量に応じて調整）
-        target_length = 975  # 中間値を目標に
+        JSON配列で出力させてスポットごとに分割する。トークン数・時間はスポット数で按分し、
+        呼び出し回数は先頭のスポットに計上する。
 
-        prompt = f"""あなたは観光情報の専門ライターです。以下の事実データのみを使用して、{spot.name}の説明文を正確に950-1000字で作成してください。
+        Returns:
+            スポットごとの (説明文, 統計)。取り出せなかったスポットの説明文はNone
+        """
+        print(f"\n【説明文一括生成】{len(spots)}件 (LLM: {self.provider})")
+        batch_stats = self._empty_stats()
+        text = self._complete(
+            self._build_batch_prompt(spots),
+            batch_stats,
+            system=self.instructions,
+            max_tokens=min(2048 * len(spots), 8192)
+        )
+        descriptions = self._parse_batch_response(text)
 
-【絶対厳守：文字数制限】
-- **絶対上限**: 1000字（1文字でも超過禁止）
-- **目標範囲**: 950-1000字
-- **重要**: 冗長な表現を徹底的に排除し、簡潔に記述してください
-- 「この数値は」「これらの情報は」など、同じ情報を繰り返し説明しない
-- 座標や住所の詳細説明は最小限に（「位置は〜」で1文のみ）
+        results = []
+        for i, spot in enumerate(spots):
+            stats = self._empty_stats()
+            for key in ("input_tokens", "cached_input_tokens", "output_tokens"):
+                stats[key] = batch_stats[key] // len(spots)
+            stats["llm_seconds"] = batch_stats["llm_seconds"] / len(spots)
+            stats["llm_calls"] = batch_stats["llm_calls"] if i == 0 else 0
+
+            description = descriptions.get(i + 1)
+            if description is None:
+                print(f"  [WARN] 一括生成の結果に {spot.name} が含まれていません（個別に生成します）")
+            results.append((description, stats))
+        return results
 
-【構成指示（合計950-1000字）】
-第1段落（200-250字）: 名称、位置、基本情報（住所・座標は簡潔に1-2文のみ）
-第2段落（300-400字）: 歴史・背景（ある場合のみ、簡潔に）
-第3段落（250-300字）: 特徴（ある場合のみ）
-第4段落（150-200字）: 評価・口コミ・Webサイト情報、情報源
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {
+            "llm_calls": 0,
+            "refine_attempts": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "output_tokens": 0,
+            "llm_seconds": 0.0
+        }
 
-【執筆ルール】
-1. 提供されたデータにない情報は一切追加しない
-2. 推測表現（〜と思われる、〜かもしれない、〜だろう）は使用禁止
-3. 冗長な表現を避ける（例：「この数値は〜を示す」を繰り返さない）
-4. 各段落を書いたら文字数を確認し、超過しないよう調整する
+    def _complete(
+        self,
+        prompt: str,
+        stats: Dict,
+        system: Optional[str] = None,
+        max_tokens: int = 4096
+    ) -> str:
+        """
+        LLMを呼び出して統計を加算
+
+        同じモデル・プロンプト・max_tokens ならキャッシュを再利用する（キャッシュヒット時はトークン・時間を加算しない）。
+        """
+        fetched = False
+
+        def fetch() -> Dict:
+            nonlocal fetched
+            fetched = True
+            start = time.monotonic()
+            text, usage = self._call_llm(prompt, system=system, max_tokens=max_tokens)
+            return {"text": text, "usage": usage, "seconds": time.monotonic() - start}
+
+        result = self.cache.get_or_fetch(
+            "llm",
+            {
+                "provider": self.provider,
+                "model": self.model_name,
+                "max_tokens": max_tokens,
+                "prompt_sha256": prompt_hash((system or "") + prompt)
+            },
+            fetch
+        )
+        if fetched:
+            stats["llm_calls"] += 1
+            stats["input_tokens"] += result["usage"].get("input_tokens", 0)
+            stats["cached_input_tokens"] += result["usage"].get("cached_input_tokens", 0)
+            stats["output_tokens"] += result["usage"].get("output_tokens", 0)
+            stats["llm_seconds"] += result["seconds"]
+        return result["text"]
+
+    @property
+    def model_name(self) -> str:
+        """使用中のモデル名"""
+        return self.llm_client.provider.model
+
+    def _call_llm(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 4096
+    ) -> Tuple[str, Dict[str, int]]:
+        """
+        LLMを呼び出す
+
+        呼び出しは AsyncLLMClient のイベントループ上で実行され、タイムアウトとレート制限時の再試行が適用される。
+        systemは共通の指示ブロック。Claudeでは cache_control を付けて明示的にキャッシュし、
+        Gemini/OpenAIではプロンプトの先頭に置いて自動のプレフィックスキャッシュを効かせる。
+
+        Returns:
+            (生成テキスト, トークン使用量 {"input_tokens", "cached_input_tokens", "output_tokens"})
+        """
+        return self.llm_client.complete(prompt, system=system, max_tokens=max_tokens)
+
+    @classmethod
+    def _build_instructions(cls, min_length: int, max_length: int) -> str:
+        """文字数の範囲を埋め込んだ共通の執筆指示（段落の目安は1000字の配分を max_length に比例させる）"""
+        def scaled(low: int, high: int) -> str:
+            return f"{round(low * max_length / 1000, -1):.0f}-{round(high * max_length / 1000, -1):.0f}"
+
+        return cls.INSTRUCTIONS_TEMPLATE.format(
+            min_length=min_length,
+            max_length=max_length,
+            p1=scaled(200, 250),
+            p2=scaled(300, 400),
+            p3=scaled(250, 300),
+            p4=scaled(150, 200),
+        )
+
+    def _build_prompt(self, spot: SpotData) -> str:
+        """プロンプト構築（共通の指示 instructions の後に続くスポット固有部分）"""
+
+        prompt = f"""以下は{spot.name}の事実データです。
+
+【使用可能なデータ】
+{self._format_facts(spot)}
+
+【出力】
+説明文のみを出力してください。前置きや補足は不要です。
+**絶対に{self.max_length}字を超えないでください。**
+"""
+        return prompt
+
+    def _build_batch_prompt(self, spots: List[SpotData]) -> str:
+        """複数スポットをまとめて生成するプロンプト"""
+        sections = "\n\n".join(
+            f"### スポット{i}\n{self._format_facts(spot)}" for i, spot in enumerate(spots, 1)
+        )
+        return f"""以下の{len(spots)}件の観光スポットについて、それぞれ上記の指示に従って説明文を作成してください。
+各説明文は独立して{self.min_length}-{self.max_length}字とし、他のスポットの情報を混ぜないでください。
 
 【使用可能なデータ】
-名称: {spot.name}
+{sections}
+
+【出力】
+次の形式のJSON配列のみを出力してください。前置きや補足、コードブロックは不要です。
+[{{"id": 1, "description": "スポット1の説明文"}}, {{"id": 2, "description": "スポット2の説明文"}}]
+"""
+
+    @staticmethod
+    def _parse_batch_response(text: str) -> Dict[int, str]:
+        """一括生成の応答から id → 説明文 を取り出す（壊れた応答は空のdict）"""
+        start, end = text.find("["), text.rfind("]")
+        if start < 0 or end < start:
+            return {}
+        try:
+            items = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+
+        descriptions = {}
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("description"), str):
+                try:
+                    descriptions[int(item.get("id"))] = item["description"]
+                except (TypeError, ValueError):
+                    continue
+        return descriptions
+
+    def _format_facts(self, spot: SpotData) -> str:
+        """プロンプトに埋め込む事実データ"""
+        return f"""名称: {spot.name}
 住所: {spot.address}
 位置: 緯度{spot.latitude}, 経度{spot.longitude}
 
@@ -428,59 +795,116 @@ class AIDescriptionGenerator:
 - Webサイト: {spot._basic_info.get('website', 'なし')}
 
 情報源:
-{spot._sources}
+{spot._sources}"""
+
+    def _build_refine_prompt(self, spot: SpotData, description: str) -> str:
+        """文字数が範囲外の説明文を短縮・加筆させるプロンプト"""
+        length = len(description)
+        target = (self.min_length + self.max_length) // 2
+
+        if length > self.max_length:
+            instruction = f"""この説明文は{length}字で、上限の{self.max_length}字を超えています。
+内容の順序と構成を保ったまま、冗長な表現や重複を削って約{length - target}字短くしてください。
+新しい情報は追加しないでください。"""
+            facts = ""
+        else:
+            instruction = f"""この説明文は{length}字で、下限の{self.min_length}字に足りません。
+既存の文章を保ったまま、下記の事実データにある情報だけを使って約{target - length}字加筆してください。
+データにない情報や推測表現は追加しないでください。"""
+            facts = f"\n【使用可能なデータ】\n{self._format_facts(spot)}\n"
+
+        return f"""あなたは観光情報の専門編集者です。{spot.name}の説明文の文字数を調整してください。
+
+{instruction}
+調整後の文字数は{self.min_length}-{self.max_length}字にしてください。
+{facts}
+【説明文】
+{description}
 
 【出力】
-説明文のみを出力してください。前置きや補足は不要です。
-**絶対に1000字を超えないでください。**
+調整後の説明文のみを出力してください。前置きや補足は不要です。
 """
-        return prompt
 
-    def _generate_with_claude(self, prompt: str) -> str:
-        """Claude APIで生成"""
-        try:
-            message = self.claude_client.messages.create(
-                model=self.claude_model,
-                max_tokens=4096,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return message.content[0].text
-        except Exception as e:
-            print(f"  [ERROR] Claude API呼び出しエラー: {e}")
-            raise
 
-    def _generate_with_gemini(self, prompt: str) -> str:
-        """Gemini APIで生成"""
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            print(f"  [ERROR] Gemini API呼び出しエラー: {e}")
-            raise
+class DescriptionBatcher:
+    """
+    説明文生成リクエストをまとめて一括生成に回す
+
+    各スポットのワーカースレッドが generate() を呼ぶと、batch_size件そろうか
+    max_wait_seconds経過した時点でまとめてLLMに送る。最初に待ち始めたスレッドが
+    タイムアウト時の送信を担当する。
+    """
+
+    def __init__(self, generator: "AIDescriptionGenerator", batch_size: int, max_wait_seconds: float):
+        self.generator = generator
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[SpotData, Future]] = []
+
+    def generate(self, spot: SpotData, stats: Dict) -> Optional[str]:
+        """
+        バッチに参加して説明文の下書きを取得
+
+        Returns:
+            説明文（一括生成で取り出せなかった場合はNone）。statsに按分した統計を加算する
+        """
+        future = Future()
+        batch = None
+        with self._cond:
+            self._pending.append((spot, future))
+            if len(self._pending) >= self.batch_size:
+                batch = self._take()
+            elif len(self._pending) == 1:
+                # 先頭のスレッドはバッチが埋まるか期限が来るまで待つ
+                deadline = time.monotonic() + self.max_wait_seconds
+                while self._pending and self._pending[0][1] is future:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        batch = self._take()
+                        break
+                    self._cond.wait(remaining)
+
+        if batch:
+            self._run(batch)
+
+        description, batch_stats = future.result()
+        for key, value in batch_stats.items():
+            stats[key] += value
+        return description
 
-    def _generate_with_openai(self, prompt: str) -> str:
-        """OpenAI APIで生成"""
+    def _take(self) -> List[Tuple[SpotData, Future]]:
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        self._cond.notify_all()
+        return batch
+
+    def _run(self, batch: List[Tuple[SpotData, Future]]):
+        spots = [spot for spot, _ in batch]
         try:
-            import openai
-            openai.api_key = self.openai_config.get("api_key")
-            model = self.openai_config.get("model", "gpt-4")
-
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
-            )
-            return response.choices[0].message.content
+            if len(spots) == 1:
+                results = [(None, AIDescriptionGenerator._empty_stats())]
+            else:
+                results = self.generator.generate_batch(spots)
         except Exception as e:
-            print(f"  [ERROR] OpenAI API呼び出しエラー: {e}")
-            raise
+            print(f"  [WARN] 一括生成に失敗しました（個別に生成します）: {e}")
+            results = [(None, AIDescriptionGenerator._empty_stats()) for _ in spots]
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
 
 
 class QualityValidator:
     """生成された説明文の品質検証"""
-    
+
+    def __init__(self, min_length: int = 950, max_length: int = 1000):
+        """
+        Args:
+            min_length: 説明文の最小文字数
+            max_length: 説明文の最大文字数
+        """
+        self.min_length = min_length
+        self.max_length = max_length
+
     def validate(self, description: str, spot: SpotData) -> Dict[str, any]:
         """品質検証"""
         print(f"\n【品質検証】{spot.name}")
@@ -495,10 +919,10 @@ class QualityValidator:
         char_count = len(description)
         result["metrics"]["char_count"] = char_count
         
-        if char_count < 950 or char_count > 1000:
+        if char_count < self.min_length or char_count > self.max_length:
             result["issues"].append(f"文字数が範囲外: {char_count}字")
             result["passed"] = False
-            print(f"  [ERROR] 文字数: {char_count}字 (950-1000字が必要)")
+            print(f"  [ERROR] 文字数: {char_count}字 ({self.min_length}-{self.max_length}字が必要)")
         else:
             print(f"  [OK] 文字数: {char_count}字")
         
@@ -541,131 +965,330 @@ class TouristSpotGenerator:
         # Google Places API設定
         google_api_key = config["data_collection"]["google_places"]["api_key"]
 
+        # 生成設定
+        self.generation_config = config.get("generation", {})
+
+        # 並行処理設定（spot_workers=1 なら各ステージ1件ずつ処理）
+        concurrency_config = self.generation_config.get("concurrency", {})
+        self.spot_workers = max(int(concurrency_config.get("spot_workers", 1)), 1)
+        self.limiter = ConcurrencyLimiter(
+            concurrency_config.get("provider_limits", {}),
+            concurrency_config.get("rate_limits", {})
+        )
+
+        # パイプラインのステージ間キューの上限（処理中としてメモリに載るスポット数の目安）
+        self.queue_size = max(int(concurrency_config.get("queue_size", 2 * self.spot_workers)), 1)
+
+        # 出力形式（json: 完了後にno順のJSON配列 / ndjson: 完了したスポットから1行ずつ追記）
+        self.output_format = self.generation_config.get("output_format", "json")
+        if self.output_format not in ("json", "ndjson"):
+            raise ValueError(f"Unsupported output_format: {self.output_format}")
+
+        # 応答キャッシュ
+        self.cache = ResponseCache.from_config(config.get("cache"))
+
+        # 共有HTTPクライアント（接続プール・タイムアウト・再試行・ホスト別レート制限）
+        self.http = HttpClient.from_config(config.get("http"))
+
         # 各コンポーネント初期化
-        self.spot_finder = SpotFinder(api_key=google_api_key)
+        self.spot_finder = SpotFinder(
+            api_key=google_api_key, cache=self.cache, limiter=self.limiter, http=self.http
+        )
         self.collector = DataCollector(
             google_api_key=google_api_key,
-            web_search_config=config["data_collection"].get("web_search", {})
+            web_search_config=config["data_collection"].get("web_search", {}),
+            limiter=self.limiter,
+            cache=self.cache,
+            wikipedia_config=config["data_collection"].get("wikipedia", {}),
+            http=self.http
         )
         self.verifier = DataVerifier()
-        self.ai_generator = AIDescriptionGenerator(llm_config=config["llm"])
-        self.validator = QualityValidator()
+        refinement_config = self.generation_config.get("refinement", {})
+        batch_config = self.generation_config.get("batch", {})
+        self.ai_generator = AIDescriptionGenerator(
+            llm_config=config["llm"],
+            cache=self.cache,
+            min_length=self.generation_config.get("description_min_length", 950),
+            max_length=self.generation_config.get("description_max_length", 1000),
+            max_refine_attempts=(
+                refinement_config.get("max_attempts", 2) if refinement_config.get("enabled", False) else 0
+            ),
+            # バッチはスポットの並行処理で埋まるため、spot_workersを超える大きさにはしない
+            batch_size=min(int(batch_config.get("size", 1)), self.spot_workers),
+            batch_wait_seconds=batch_config.get("max_wait_seconds", 5.0)
+        )
+        self.validator = QualityValidator(
+            min_length=self.ai_generator.min_length,
+            max_length=self.ai_generator.max_length,
+        )
 
-        # 生成設定
-        self.generation_config = config.get("generation", {})
+        # LLM使用量の集計（今回の実行分）
+        self._usage_lock = threading.Lock()
+        self.usage = {
+            "spots": 0, "quality_passed": 0, "llm_calls": 0, "refine_attempts": 0,
+            "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0,
+            "llm_seconds": 0.0, "wall_seconds": 0.0
+        }
 
     def generate_from_region(
         self,
         region_name: str,
         max_spots: Optional[int] = None,
-        output_file: Optional[str] = None
-    ) -> Dict:
+        output_file: Optional[str] = None,
+        resume: bool = False
+    ) -> Optional[Dict]:
         """
         地域名から観光スポットを自動検索・生成
 
+        完了したスポットはその都度ジャーナル（<出力名>.journal.jsonl）に追記され、
+        最終JSONはジャーナルから組み立てられる。
+
         Args:
             region_name: 地域名（例: "銀座", "京都"）
             max_spots: 最大生成数（省略時は設定ファイルから）
             output_file: 出力ファイル名（省略時は自動命名）
+            resume: Trueの場合、既存のジャーナルから完了済みスポットを飛ばして再開
 
         Returns:
-            生成されたJSONデータ
+            実行結果（出力ファイル名、成功数、スポット数）
         """
         if max_spots is None:
             max_spots = self.generation_config.get("max_spots", 20)
 
         if output_file is None:
             region_key = self._to_english_key(region_name)
-            output_file = f"{region_key}_tourist_spots.json"
+            output_file = f"{region_key}_tourist_spots.{self.output_format}"
+
+        return self.generate_spots(
+            region_name,
+            lambda: self.spot_finder.find_spots(region_name, max_spots),
+            output_file,
+            resume=resume
+        )
 
+    def generate_spots(
+        self,
+        region_name: str,
+        discover: Callable[[], List[Dict]],
+        output_file: str,
+        resume: bool = False
+    ) -> Optional[Dict]:
+        """
+        スポット一覧を検索して説明文を生成
+
+        Args:
+            region_name: 地域名（表示・ジャーナル記録用）
+            discover: スポット一覧（find_spots形式のdictのリスト）を返す関数。再開時は呼ばれない
+            output_file: 出力ファイル名
+            resume: Trueの場合、既存のジャーナルから完了済みスポットを飛ばして再開
+
+        Returns:
+            実行結果（出力ファイル名、成功数、スポット数）
+        """
         print(f"\n{'#'*60}")
         print(f"# 観光スポット自動生成")
         print(f"# 入力: {region_name}")
         print(f"# LLM: {self.ai_generator.provider}")
         print(f"{'#'*60}\n")
 
-        # ステップ1: 観光スポット検索
-        found_spots = self.spot_finder.find_spots(region_name, max_spots)
+        journal = CheckpointJournal(journal_path_for(output_file))
+        header = journal.load_header() if resume and journal.exists() else None
+
+        # ステップ1: 観光スポット検索（再開時はジャーナルに保存した検索結果を使用）
+        if header:
+            found_spots = header["spots"]
+            print(f"[再開] ジャーナルから再開します: {journal.path}")
+        else:
+            if resume:
+                print(f"[WARN] ジャーナルが見つからないため最初から実行します: {journal.path}")
+            found_spots = discover()
 
         if not found_spots:
             print(f"\n[ERROR] {region_name}で観光スポットが見つかりませんでした")
             return None
 
-        # ステップ2: SpotDataオブジェクト作成
-        spots = []
-        for i, spot_info in enumerate(found_spots, 1):
-            spot = SpotData(
-                no=i,
-                name=spot_info["name"],
-                latitude=spot_info["latitude"],
-                longitude=spot_info["longitude"],
-                address=spot_info["address"]
-            )
-            # place_idを保存（内部処理用）
-            spot._metadata = {"place_id": spot_info.get("place_id", "")}
-            spots.append(spot)
-
-        # ステップ3: 各スポットの説明文生成
-        results = []
-        success_count = 0
-
-        for i, spot in enumerate(spots, 1):
-            print(f"\n{'='*60}")
-            print(f"進捗: {i}/{len(spots)}")
-            print(f"{'='*60}")
-
-            try:
-                result_spot = self._generate_spot_info(spot)
-
-                if result_spot:
-                    results.append(result_spot.to_output_format())
-                    success_count += 1
-            except Exception as e:
-                print(f"\n[ERROR] {spot.name} - {e}")
-                continue
+        # ステップ2: 完了済みスポットの確認
+        if header:
+            completed_numbers = journal.completed_numbers()
+            print(f"[再開] 完了済み: {len(completed_numbers)}/{len(found_spots)}")
+        else:
+            journal.start(region_name, found_spots)
+            completed_numbers = set()
+        pending = [
+            (i, spot_info) for i, spot_info in enumerate(found_spots, 1) if i not in completed_numbers
+        ]
+
+        self.collector.prefetch_wikipedia([spot_info["name"] for _, spot_info in pending])
+
+        # ステップ3: 収集 → 検証 → 生成 → 品質検証 → 書き出し をパイプラインで実行
+        # （完了ごとにジャーナルへ追記。ndjson出力の場合は出力ファイルにも追記）
+        ndjson_file = None
+        if self.output_format == "ndjson":
+            if header:
+                # 前回の実行で出力済みの行をジャーナルと揃えてから追記する
+                journal.write_output(output_file, output_format="ndjson")
+                ndjson_file = open(output_file, "a", encoding="utf-8")
+            else:
+                ndjson_file = open(output_file, "w", encoding="utf-8")
 
-        # ステップ4: JSON出力
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        try:
+            self._run_pipeline(pending, journal, ndjson_file)
+        finally:
+            if ndjson_file:
+                ndjson_file.close()
+
+        # ステップ4: JSON出力（ジャーナルから no 順に組み立て。ndjsonは書き出し済み）
+        if self.output_format == "ndjson":
+            success_count = len(journal.completed_numbers())
+        else:
+            success_count = journal.write_output(output_file)
 
         print(f"\n{'#'*60}")
         print(f"# 自動生成完了")
-        print(f"# 成功: {success_count}/{len(spots)}")
+        print(f"# 成功: {success_count}/{len(found_spots)}")
         print(f"# 出力: {output_file}")
+        if success_count < len(found_spots):
+            print(f"# 未完了のスポットは --resume で再実行できます")
         print(f"{'#'*60}\n")
 
-        return results
-
-    def _generate_spot_info(self, spot: SpotData) -> Optional[SpotData]:
-        """個別スポットの説明文を生成"""
-        # データ収集
-        place_id = spot._metadata.get("place_id", "")
-        spot = self.collector.collect_all(spot, place_id=place_id)
+        self._print_usage()
+        self.http.print_stats()
+        self.cache.print_stats()
 
-        # データ検証
-        verification = self.verifier.verify_facts(spot)
-
-        if not verification["verified"]:
-            print(f"\n[ERROR] データ検証失敗")
-            return None
-
-        # AI説明文生成
-        description = self.ai_generator.generate(spot)
+        return {
+            "output_file": output_file,
+            "success_count": success_count,
+            "total_count": len(found_spots)
+        }
 
-        # 品質検証
-        quality = self.validator.validate(description, spot)
+    def _run_pipeline(self, pending: List[Tuple[int, Dict]], journal: CheckpointJournal, ndjson_file=None):
+        """
+        スポットをステージ間の上限付きキューで流して生成
 
-        spot.description = description
-        spot._metadata = {
-            "generated_at": datetime.now().isoformat(),
-            "verification_score": verification["confidence_score"],
-            "quality_check": quality["passed"],
-            "char_count": len(description)
-        }
+        SpotData は検索結果から1件ずつ作り、書き出し後は保持しないため、処理中のスポット数は
+        キューの上限とワーカー数で決まる。収集は spot_workers 個、生成は spot_workers と
+        llm.client.max_concurrency の大きい方の数のワーカーで並行実行し、
+        各スポットのデータ収集もソースごとに並行実行する（API呼び出しはプロバイダごとの上限で制限）。
+        1件の失敗はそのスポットだけを除外し、他のスポット・ステージの処理は続く。
+        """
+        print(f"\n[パイプライン] スポット並行数: {self.spot_workers} / キュー上限: {self.queue_size}")
+        completed = 0
+        progress_lock = threading.Lock()
+
+        def make_jobs():
+            for no, spot_info in pending:
+                spot = SpotData(
+                    no=no,
+                    name=spot_info["name"],
+                    latitude=spot_info["latitude"],
+                    longitude=spot_info["longitude"],
+                    address=spot_info["address"]
+                )
+                # place_idを保存（内部処理用）
+                spot._metadata = {"place_id": spot_info.get("place_id", "")}
+                yield SpotJob(spot=spot, started=time.monotonic())
+
+        def collect(job: SpotJob) -> SpotJob:
+            place_id = job.spot._metadata.get("place_id", "")
+            job.spot = self.collector.collect_all(job.spot, place_id=place_id, executor=fetch_executor)
+            return job
+
+        def verify(job: SpotJob) -> Optional[SpotJob]:
+            job.verification = self.verifier.verify_facts(job.spot)
+            if not job.verification["verified"]:
+                print(f"\n[ERROR] データ検証失敗: {job.spot.name}")
+                return None
+            return job
+
+        def generate(job: SpotJob) -> SpotJob:
+            # LLM呼び出しの同時実行数は AsyncLLMClient のセマフォで制限
+            job.description, job.llm_stats = self.ai_generator.generate_with_stats(job.spot)
+            return job
+
+        def validate(job: SpotJob) -> SpotJob:
+            spot, llm_stats = job.spot, job.llm_stats
+            quality = self.validator.validate(job.description, spot)
+
+            elapsed = time.monotonic() - job.started
+            self._record_usage(llm_stats, elapsed, quality["passed"])
+
+            spot.description = job.description
+            spot._metadata = {
+                "generated_at": datetime.now().isoformat(),
+                "verification_score": job.verification["confidence_score"],
+                "quality_check": quality["passed"],
+                "char_count": len(job.description),
+                "wall_seconds": round(elapsed, 2),
+                **llm_stats,
+                "llm_seconds": round(llm_stats["llm_seconds"], 2)
+            }
 
-        print(f"\n[OK] 生成完了: {spot.name}")
+            print(f"\n[OK] 生成完了: {spot.name}")
+            return job
+
+        def write(job: SpotJob) -> SpotJob:
+            nonlocal completed
+            output = job.spot.to_output_format()
+            journal.append(output, job.spot._metadata)
+            if ndjson_file:
+                ndjson_file.write(json.dumps(output, ensure_ascii=False) + "\n")
+                ndjson_file.flush()
+            with progress_lock:
+                completed += 1
+                print(f"\n進捗: {completed}/{len(pending)} ({job.spot.name})")
+            return job
+
+        def describe(job: SpotJob) -> str:
+            return job.spot.name
+
+        # 生成ワーカーはLLMの応答を待つだけなので、イベントループが max_concurrency 件を
+        # 同時に送信できるだけのワーカーを用意する（スレッド数で同時実行数が頭打ちにならないように）
+        generate_workers = max(self.spot_workers, self.ai_generator.llm_client.max_concurrency)
+        pipeline = Pipeline(
+            [
+                PipelineStage("収集", collect, self.spot_workers, describe),
+                PipelineStage("検証", verify, 1, describe),
+                PipelineStage("生成", generate, generate_workers, describe),
+                PipelineStage("品質検証", validate, 1, describe),
+                PipelineStage("書き出し", write, 1, describe)
+            ],
+            queue_size=self.queue_size
+        )
 
-        return spot
+        # spot_workers=1 ではスポット内のデータ収集も逐次実行
+        fetch_executor = ThreadPoolExecutor(max_workers=self.spot_workers) if self.spot_workers > 1 else None
+        try:
+            pipeline.run(make_jobs())
+        finally:
+            if fetch_executor:
+                fetch_executor.shutdown()
+
+        pipeline.print_stats()
+
+    def _record_usage(self, llm_stats: Dict, elapsed: float, passed: bool):
+        """今回の実行のLLM使用量を集計"""
+        with self._usage_lock:
+            for key in (
+                "llm_calls", "refine_attempts", "input_tokens", "cached_input_tokens", "output_tokens", "llm_seconds"
+            ):
+                self.usage[key] += llm_stats[key]
+            self.usage["wall_seconds"] += elapsed
+            self.usage["spots"] += 1
+            self.usage["quality_passed"] += int(passed)
+
+    def _print_usage(self):
+        """今回の実行のLLM使用量を表示"""
+        usage = self.usage
+        if not usage["spots"]:
+            return
+        print(f"\n【LLM使用量】(今回の実行)")
+        print(f"  スポット数: {usage['spots']} (品質検証合格: {usage['quality_passed']})")
+        print(f"  LLM呼び出し: {usage['llm_calls']}回 (うち文字数調整: {usage['refine_attempts']}回)")
+        print(f"  トークン: 入力{usage['input_tokens']} (うちキャッシュ{usage['cached_input_tokens']}) / "
+              f"出力{usage['output_tokens']} "
+              f"(平均 {(usage['input_tokens'] + usage['output_tokens']) / usage['spots']:.0f}/スポット)")
+        print(f"  LLM時間: {usage['llm_seconds']:.1f}秒 / 処理時間合計: {usage['wall_seconds']:.1f}秒 "
+              f"(平均 {usage['wall_seconds'] / usage['spots']:.1f}秒/スポット)")
 
     def _to_english_key(self, region_name: str) -> str:
         """地域名を英語キーに変換"""
@@ -679,6 +1302,9 @@ class TouristSpotGenerator:
 
 def main():
     """メイン実行"""
+    parser = argparse.ArgumentParser(description="観光スポット説明文 自動生成システム")
+    parser.add_argument("--resume", action="store_true", help="前回中断したジャーナルから再開")
+    args = parser.parse_args()
 
     print("\n" + "="*60)
     print("観光スポット説明文 自動生成システム")
@@ -702,7 +1328,7 @@ def main():
             return
 
         # 生成実行
-        generator.generate_from_region(region_name=region_name)
+        generator.generate_from_region(region_name=region_name, resume=args.resume)
 
     except FileNotFoundError as e:
         print(f"\n[ERROR] {e}")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Wikipedia 記事概要の一括取得
+
+MediaWiki API の複数タイトル指定（titles=A|B|C、redirects=1）で、リダイレクトを解決しながら
+最大20件ずつ記事冒頭の概要（extracts）を取得する。取得結果は SQLite のスナップショットに保存し、
+offline モードではスナップショットのみを参照して Wikipedia にアクセスしない。
+
+スナップショットの事前構築:
+    python wikipedia_bulk.py --db ginza_tourist_spots.json --snapshot wikipedia_snapshot.sqlite
+    python wikipedia_bulk.py --titles-file titles.txt --snapshot wikipedia_snapshot.sqlite
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "TouristSpotGenerator/1.0 (https://github.com/fumiya-kume/JL02)"
+
+# prop=extracts で exintro を指定した場合の1リクエストあたりの上限
+MAX_TITLES_PER_REQUEST = 20
+
+
+class WikipediaSnapshot:
+    """記事概要の SQLite スナップショット（存在しないページも記録する）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                language TEXT NOT NULL,
+                title TEXT NOT NULL,
+                page_exists INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (language, title)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, language: str, titles: List[str]) -> Dict[str, Dict]:
+        """スナップショットにあるタイトルの結果を返す"""
+        results = {}
+        with self._lock:
+            for i in range(0, len(titles), 500):
+                chunk = titles[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT title, page_exists, summary, url FROM pages "
+                    f"WHERE language = ? AND title IN ({placeholders})",
+                    [language, *chunk]
+                ).fetchall()
+                for title, exists, summary, url in rows:
+                    results[title] = {"exists": bool(exists), "summary": summary, "url": url}
+        return results
+
+    def put_many(self, language: str, pages: Dict[str, Dict]):
+        """取得結果を保存"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (language, title, int(page["exists"]), page["summary"], page["url"], now)
+                    for title, page in pages.items()
+                ]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WikipediaBulkFetcher:
+    """複数タイトルの記事概要をまとめて取得"""
+
+    def __init__(
+        self,
+        language: str = "ja",
+        snapshot_path: Optional[str] = None,
+        offline: bool = False,
+        session: Optional[requests.Session] = None,
+        timeout: float = 30.0
+    ):
+        """
+        Args:
+            language: Wikipedia の言語
+            snapshot_path: SQLite スナップショットのパス（省略時は保存しない）
+            offline: Trueの場合、スナップショットのみを参照する
+            session: 共有するHTTPセッション（requests.Session または HttpClient。省略時は接続プール付きのセッションを作成）
+            timeout: 1リクエストのタイムアウト（秒）
+        """
+        self.language = language
+        self.api_url = f"https://{language}.wikipedia.org/w/api.php"
+        self.snapshot = WikipediaSnapshot(snapshot_path) if snapshot_path else None
+        self.offline = offline
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        self.session = session
+
+        self.stats = {"snapshot_hits": 0, "fetched": 0, "requests": 0}
+
+    def fetch(self, titles: Iterable[str]) -> Dict[str, Dict]:
+        """
+        タイトルごとの記事概要を取得
+
+        Returns:
+            タイトル → {"exists", "summary", "url"}（オフラインでスナップショットにない場合は含まれない）
+        """
+        titles = list(dict.fromkeys(t for t in titles if t))
+        results = self.snapshot.get_many(self.language, titles) if self.snapshot else {}
+        self.stats["snapshot_hits"] += len(results)
+
+        missing = [title for title in titles if title not in results]
+        if self.offline or not missing:
+            return results
+
+        for i in range(0, len(missing), MAX_TITLES_PER_REQUEST):
+            batch = missing[i:i + MAX_TITLES_PER_REQUEST]
+            pages = self._fetch_batch(batch)
+            if self.snapshot:
+                self.snapshot.put_many(self.language, pages)
+            results.update(pages)
+            self.stats["fetched"] += len(pages)
+
+        return results
+
+    def _fetch_batch(self, titles: List[str]) -> Dict[str, Dict]:
+        """1回のクエリ（継続リクエストを含む）で最大20タイトルを取得"""
+        params = {
+            "action": "query",
+            "format": "json",
+            "formatversion": "2",
+            "prop": "extracts|info",
+            "exintro": "1",
+            "explaintext": "1",
+            "exlimit": "max",
+            "inprop": "url",
+            "redirects": "1",
+            "titles": "|".join(titles)
+        }
+
+        aliases: Dict[str, str] = {}
+        pages: Dict[str, Dict] = {}
+        continue_params: Dict = {}
+        while True:
+            response = self.session.get(
+                self.api_url,
+                params={**params, **continue_params},
+                # 共有セッションの既定UA（python-requests）ではなく Wikimedia のポリシーに沿ったUAを送る
+                headers={"User-Agent": USER_AGENT},
+                timeout=self.timeout
+            )
+            self.stats["requests"] += 1
+            response.raise_for_status()
+            data = response.json()
+            query = data.get("query", {})
+
+            for mapping in query.get("normalized", []) + query.get("redirects", []):
+                aliases[mapping["from"]] = mapping["to"]
+            for page in query.get("pages", []):
+                entry = pages.setdefault(page["title"], {"exists": False, "summary": "", "url": ""})
+                if not page.get("missing") and not page.get("invalid"):
+                    entry["exists"] = True
+                    entry["summary"] = entry["summary"] or page.get("extract", "")
+                    entry["url"] = entry["url"] or page.get("fullurl", "")
+
+            if "continue" not in data:
+                break
+            continue_params = data["continue"]
+
+        # 入力タイトル → 正規化 → リダイレクト先 の順に辿って結果を対応付ける
+        results = {}
+        for title in titles:
+            resolved = title
+            for _ in range(3):
+                if resolved not in aliases:
+                    break
+                resolved = aliases[resolved]
+            results[title] = pages.get(resolved, {"exists": False, "summary": "", "url": ""})
+        return results
+
+
+def main():
+    """スナップショットを事前構築"""
+    parser = argparse.ArgumentParser(description="Wikipedia 記事概要のスナップショットを構築")
+    parser.add_argument("--db", help="スポット名を読み込むJSON（makeDBの出力形式）")
+    parser.add_argument("--titles-file", help="タイトルを1行1件で記載したファイル")
+    parser.add_argument("--snapshot", default="wikipedia_snapshot.sqlite", help="SQLite スナップショットのパス")
+    parser.add_argument("--language", default="ja")
+    args = parser.parse_args()
+
+    titles = []
+    if args.db:
+        with open(args.db, "r", encoding="utf-8") as f:
+            titles.extend(spot["name"] for spot in json.load(f))
+    if args.titles_file:
+        with open(args.titles_file, "r", encoding="utf-8") as f:
+            titles.extend(line.strip() for line in f if line.strip())
+    if not titles:
+        parser.error("--db または --titles-file を指定してください")
+
+    fetcher = WikipediaBulkFetcher(language=args.language, snapshot_path=args.snapshot)
+    results = fetcher.fetch(titles)
+    found = sum(1 for page in results.values() if page["exists"])
+    print(f"[OK] {len(results)}件 (記事あり: {found}件) → {args.snapshot}")
+    print(f"  スナップショット: {fetcher.stats['snapshot_hits']}件 / "
+          f"新規取得: {fetcher.stats['fetched']}件 ({fetcher.stats['requests']}リクエスト)")
+
+
+if __name__ == "__main__":
+    main()